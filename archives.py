@@ -0,0 +1,179 @@
+import bisect
+import collections
+import concurrent.futures
+import gzip
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import time
+import zlib
+
+try:
+   import zstandard
+except ImportError:
+   zstandard = None
+
+FRAME_SIZE = 4 * 1024 * 1024
+LEVEL = 3
+# Region data is already zlib compressed per chunk, recompressing it burns CPU for nothing
+STORED = ('.mca', '.mcc', '.jar', '.gz', '.zip', '.png')
+
+def codec():
+   return 'zstd' if zstandard is not None else 'gzip'
+
+def extension():
+   return 'tar.zst' if zstandard is not None else 'tar.gz'
+
+def compress(data, codec, level):
+   if codec == 'zstd':
+       return zstandard.ZstdCompressor(level=level, write_content_size=True).compress(data)
+   return gzip.compress(data, compresslevel=level, mtime=0)
+
+def decompress(data, codec):
+   if codec == 'zstd':
+       return zstandard.ZstdDecompressor().decompress(data)
+   return zlib.decompress(data, 31)
+
+class FrameWriter:
+   def __init__(self, file, codec, level, workers, frame_size=FRAME_SIZE):
+       self.file = file
+       self.codec = codec
+       self.level = level
+       self.frame_size = frame_size
+       self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='compress')
+       self.limit = workers * 2
+       self.pending = collections.deque()
+       self.buffer = bytearray()
+       self.position = 0
+       self.start = 0
+       self.stored = False
+       self.frames = []
+       self.written = 0
+
+   def write(self, data):
+       self.buffer += data
+       self.position += len(data)
+       while len(self.buffer) >= self.frame_size:
+           self.cut(self.frame_size)
+       return len(data)
+
+   def tell(self):
+       return self.position
+
+   def cut(self, size=None):
+       size = len(self.buffer) if size is None else size
+       if not size:
+           return
+       data = bytes(self.buffer[:size])
+       del self.buffer[:size]
+
+       # The fastest setting each codec has stands in for storing incompressible data
+       level = (0 if self.codec == 'gzip' else -5) if self.stored else self.level
+       self.pending.append((self.start, len(data), self.pool.submit(compress, data, self.codec, level)))
+       self.start += len(data)
+       while len(self.pending) > self.limit:
+           self.drain()
+
+   def store(self, stored):
+       if stored != self.stored:
+           self.cut()
+           self.stored = stored
+
+   def drain(self):
+       start, size, future = self.pending.popleft()
+       frame = future.result()
+       self.file.write(frame)
+       self.frames.append([start, size, self.written, len(frame)])
+       self.written += len(frame)
+
+   def close(self):
+       self.cut()
+       while self.pending:
+           self.drain()
+       self.pool.shutdown()
+
+def pack(files, dest, level=LEVEL, workers=None, frame_size=FRAME_SIZE, log=logging):
+   workers = workers or os.cpu_count() or 2
+   name = codec()
+   started = time.monotonic()
+   index = {'codec': name, 'frames': [], 'files': {}}
+
+   directory = os.path.dirname(dest)
+   os.makedirs(directory, exist_ok=True)
+   with tempfile.NamedTemporaryFile(dir=directory, suffix='.part', delete=False) as temp:
+       writer = FrameWriter(temp, name, level, workers, frame_size)
+       with tarfile.open(fileobj=writer, mode='w', format=tarfile.PAX_FORMAT) as tar:
+           for key, path in files:
+               try:
+                   info = tar.gettarinfo(path, arcname=key.replace(os.sep, '/'))
+                   with open(path, 'rb') as file:
+                       writer.store(path.endswith(STORED))
+                       tar.addfile(info, file)
+               except FileNotFoundError:
+                   continue
+               padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+               index['files'][info.name] = {'offset': tar.offset - padded, 'size': info.size, 'mode': info.mode, 'mtime': info.mtime}
+           writer.store(False)
+       writer.close()
+       index['frames'] = writer.frames
+   os.replace(temp.name, dest)
+
+   with open(f'{dest}.index.json', 'w') as file:
+       json.dump(index, file)
+
+   elapsed = time.monotonic() - started
+   log.info(f'Archived {len(index["files"])} files to {os.path.basename(dest)} ({writer.position / 1048576:.1f} MB -> {writer.written / 1048576:.1f} MB {name}) in {elapsed:.1f}s')
+   return dest
+
+def load_index(archive):
+   with open(f'{archive}.index.json', 'r') as file:
+       return json.load(file)
+
+def read_file(archive, name, index=None):
+   index = index or load_index(archive)
+   entry = index['files'][name]
+   begin = entry['offset']
+   end = begin + entry['size']
+
+   # Only the frames overlapping this member are decompressed
+   frames = index['frames']
+   first = bisect.bisect_right(frames, begin, key=lambda frame: frame[0]) - 1
+   data = bytearray()
+   with open(archive, 'rb') as file:
+       for start, size, offset, length in frames[max(first, 0):]:
+           if start >= end:
+               break
+           file.seek(offset)
+           block = decompress(file.read(length), index['codec'])
+           data += block[max(begin - start, 0):end - start]
+   return bytes(data)
+
+def extract(archive, dest, paths=None, log=logging):
+   index = load_index(archive)
+   if paths:
+       names = [name for name in index['files'] if any(name == path or name.startswith(path.rstrip('/') + '/') for path in paths)]
+       for name in names:
+           entry = index['files'][name]
+           target = os.path.join(dest, *name.split('/'))
+           os.makedirs(os.path.dirname(target), exist_ok=True)
+           with open(target, 'wb') as file:
+               file.write(read_file(archive, name, index))
+           os.chmod(target, entry['mode'])
+           os.utime(target, (entry['mtime'], entry['mtime']))
+       log.info(f'Restored {len(names)} files from {os.path.basename(archive)}')
+       return names
+
+   with open(archive, 'rb') as file:
+       if index['codec'] == 'zstd':
+           stream = zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True)
+       else:
+           stream = gzip.GzipFile(fileobj=file)
+       with tarfile.open(fileobj=stream, mode='r|') as tar:
+           if hasattr(tarfile, 'data_filter'):
+               tar.extractall(dest, filter='data')
+           else:
+               tar.extractall(dest)
+   log.info(f'Restored {os.path.basename(archive)}')
+   return list(index['files'])
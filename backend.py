@@ -1,110 +1,253 @@
 import logging
-import subprocess
 import os
 import sys
 import requests
-import urllib
+import urllib.parse
 import time
-import threading
 import json
-import shutil
-import tempfile
+import atexit
+
+import archives
+import isolation
+import jvm
+import properties
+import serverlog
+from backups import BackupEngine
+from cache import ArtifactCache
+from config import ConfigStore
+from downloads import AGENT, downloader
+from maintenance import Scheduler
+from metadata import MetadataClient
+from metrics import Exporter
+from pregen import PregenRunner
+from recovery import Watchdog
+from supervisor import STOP_TIMEOUT, ServerSupervisor
+from telemetry import GC_LOG, TelemetryMonitor
 
 cwd = os.path.dirname(os.path.abspath(__file__))
-process = None
-running = True
 
 logging.basicConfig(
    level=logging.DEBUG,
    format='%(asctime)s - %(levelname)s - %(message)s',
    handlers=[
        logging.StreamHandler(),
-       logging.FileHandler('app.log')
+       serverlog.rotating_handler(os.path.join(cwd, 'app.log'))
    ]
 )
 
-lock = threading.Lock()
-
-def output():
-   global process
-   while running:
-       with lock:
-           line = process.stdout.readline()
-       if line == '' and process.poll() is not None:
-           break
-       if line:
-           logging.info(line.strip())
+supervisor = ServerSupervisor()
+configs = ConfigStore()
+telemetry = TelemetryMonitor(supervisor)
+telemetry.start()
+cache = ArtifactCache(os.path.join(os.getcwd(), 'cache'))
+metadata = MetadataClient(os.path.join(os.getcwd(), 'cache', 'metadata'))
+backups = BackupEngine(os.path.join(os.getcwd(), 'backups'))
+watchdog = Watchdog(supervisor, lambda server: launch(server))
+watchdog.start()
+pregen = PregenRunner(supervisor, telemetry, configs)
+scheduler = Scheduler(supervisor, configs, lambda: servers(), {
+   'start': lambda server: start(server),
+   'restart': lambda server: restart(server),
+   'backup': lambda server: hotBackup(server),
+   'available': lambda server: updateAvailable(server),
+   'update': lambda server: update(server),
+})
+scheduler.start()
+exporter = Exporter(supervisor, telemetry, downloader, backups, watchdog)
+
+PLAYIT = 'https://github.com/playit-cloud/playit-minecraft-plugin/releases/latest/download/playit-minecraft-plugin.jar'
+
+def start_metrics(port=9225, host='127.0.0.1'):
+   return exporter.start(port, host)
+
+def progress(task, percent, message):
+   # Long running calls get an optional task from the GUI executor, it raises if the user cancelled
+   if task is not None:
+       task.progress(percent, message)
 
 def start(server):
-   global process, thread, running
-   logging.info(f'Server {server} starting')
-
-   with open(os.path.join(os.getcwd(), server, 'backend.json'), 'r') as file:
-       data = json.load(file)
-
-   if process is None:
-       try:
-           process = subprocess.Popen(
-               ['java', f'-Xmx{data["maximum"]}M', f'-Xms{data["minimum"]}M', '-jar', f'{os.path.join(os.getcwd(), server)}/{server}.jar', 'nogui'],
-               cwd=os.path.join(os.getcwd(), server),
-               stdout=subprocess.PIPE,
-               stderr=subprocess.STDOUT,  # Combine stderr with stdout
-               stdin=subprocess.PIPE,
-               text=True,
-               bufsize=1
-           )
-       except FileNotFoundError as e:
-           logging.critical(f'Java not found on your system or in your system path: {e}')
-           return
-
-       running = True
-       thread = threading.Thread(target=output)
-       thread.start()
-   else:
-       logging.info(f'Server {server} is already running.')
+   data = configs.get(server).snapshot()
+
+   # Watch before launching so an immediate exit still counts as a crash
+   if data.get('auto_restart', True):
+       watchdog.watch(server)
+   started = launch(server, data)
+   if not started and not supervisor.get(server).is_running():
+       watchdog.unwatch(server)
+   return started
+
+def launch(server, data=None):
+   if data is None:
+       data = configs.get(server).snapshot()
+
+   # The JVM refuses to start if the GC log directory is missing
+   os.makedirs(os.path.join(os.getcwd(), server, os.path.dirname(GC_LOG)), exist_ok=True)
+   telemetry.get(server)
+
+   args = launchCommand(server, data)
+   limit = isolation.options(data)['memory']
+   if limit and int(limit) < jvm.heap(data, len(servers()))[1] + jvm.OVERHEAD:
+       serverlog.logger(server).warning(f'Memory limit of {limit} MB leaves no room for the heap and JVM overhead, the server may be OOM killed')
+
+   names = sorted(servers())
+   log = serverlog.logger(server)
+   prefix, preexec = isolation.prepare(server, data, names.index(server) if server in names else 0, log)
+   started = supervisor.start(server, prefix + args, preexec, lambda: isolation.remove_cgroup(server, log))
+   if started:
+       pregen.restore(server)
+   return started
+
+def launchCommand(server, data=None):
+   if data is None:
+       data = configs.get(server).snapshot()
+   return jvm.command(server, data, os.path.join(os.getcwd(), server), len(servers()))
+
+def isolationMode():
+   # Reported by the daemon, the cgroup that matters is the one the servers are started from
+   return isolation.mode()
+
+def config(server):
+   return configs.get(server).snapshot()
+
+def configure(server, changes):
+   return configs.get(server).update(changes)
+
+def configChanged(server, changes):
+   # Pre-generation progress is saved as it goes, it would flood the log
+   changes = {key: value for key, value in changes.items() if key != 'pregen'}
+   if not changes:
+       return
+   serverlog.logger(server).info(f'Settings changed: {", ".join(f"{key}={value}" for key, value in changes.items())}')
+   if changes.get('auto_restart') is False:
+       watchdog.unwatch(server)
+
+configs.subscribe(configChanged)
+atexit.register(configs.flush)
+
+def saveProperties(server, changes):
+   log = serverlog.logger(server)
+   changed = properties.update(os.path.join(os.getcwd(), server), changes)
+   instance = supervisor.get(server)
+   applied = []
+   restart = []
+   for key, value in changed.items():
+       # A stopped server reads the file on its next start, a running one takes what it can over the console
+       if not instance.is_running():
+           continue
+       if key in properties.LIVE and instance.command(properties.LIVE[key](value)):
+           applied.append(key)
+       else:
+           restart.append(key)
+   if changed:
+       log.info(f'server.properties changed: {", ".join(f"{key}={value}" for key, value in changed.items())}')
+   return {'changed': changed, 'applied': applied, 'restart': restart}
 
-def stop(server=None):
+def stop(server=None, timeout=STOP_TIMEOUT):
    try:
-       global process, running, thread
-       if process is not None:
-           logging.warning(f'Server {server} stopping')
-           try:
-               process.stdin.write(f'stop\n')
-               process.stdin.flush()
-               running = False
-               if thread.is_alive():
-                   thread.join()
-               process = None
-               logging.info(f'Server {server} stopped')
-           except Exception as e:
-               logging.error(f'An error closing, terminating: {e}')
-               if process is not None:
-                   process.terminate()
-                   process = None
-       else:
-           logging.info(f'Server {server} not running')
+       if server is None:
+           return stop_all(timeout)
+       watchdog.unwatch(server)
+       return supervisor.stop(server, timeout)
    except Exception as e:
        logging.error(e)
 
+def stop_all(timeout=STOP_TIMEOUT):
+   for server in list(watchdog.watches):
+       watchdog.unwatch(server)
+   supervisor.stop_all(timeout)
+
+def restart(server):
+   stop(server)
+   return start(server)
+
 def command(server=None, command=None):
-   global process
    if command:
-       if process is not None:
-           logging.info(f"Running command: {command}")
-           process.stdin.write(f'{command}\n')
-           process.stdin.flush()
-       else:
-           logging.error(f'Server {server} is not running. Cannot run command.')
+       serverlog.logger(server).info(f"Running command: {command}")
+       return supervisor.command(server, command)
    else:
        logging.error('Command not found')
 
-def create(server = None, type = 'paper'):
+def status(server=None):
+   if server is None:
+       return {name: state | {'watchdog': watchdog.state(name)} for name, state in supervisor.states().items()}
+   return supervisor.state(server) | {'watchdog': watchdog.state(server)}
+
+def crashes(server):
+   return watchdog.crashes(server)
+
+def servers():
+   subfolders = [os.path.basename(f.path) for f in os.scandir(os.getcwd()) if f.is_dir()]
+   return [folder for folder in subfolders if os.path.exists(os.path.join(os.getcwd(), folder, 'backend.json'))]
+
+def backup(server):
+   return backups.backup(server, log=serverlog.logger(server))
+
+def hotBackup(server, timeout=60):
+   log = serverlog.logger(server)
+   instance = supervisor.get(server)
+
+   if not instance.is_running():
+       return {'point': backups.backup(server, log=log), 'frozen': 0.0}
+
+   log.info('Hot backup: pausing world saves')
+   frozen = time.monotonic()
+   instance.command('save-off')
+   try:
+       if instance.wait_for(r'Saved the game|Saved the world', send='save-all flush', timeout=timeout) is None:
+           log.error(f'Hot backup: server did not confirm the save within {timeout}s, skipping backup')
+           return None
+       point = backups.backup(server, log=log)
+   finally:
+       instance.command('save-on')
+       frozen = time.monotonic() - frozen
+       log.info(f'Hot backup: world saves resumed after {frozen:.2f}s')
+
+   return {'point': point, 'frozen': frozen}
+
+def schedule(server):
+   return scheduler.status(server)
+
+def runScheduled(server, job):
+   return scheduler.trigger(server, job)
+
+def updateAvailable(server, type='paper'):
+   current = getCurrentVersion(type)
+   if current is None:
+       raise RuntimeError('Could not look up the latest version')
+   latest = current[0]
+   return latest if latest != configs.get(server)['version'] else None
+
+def archive(server):
+   log = serverlog.logger(server)
+   source = os.path.join(os.getcwd(), server)
+   dest = os.path.join(os.getcwd(), 'backups', 'archives', server, f"{time.strftime('%Y%m%d-%H%M%S')}.{archives.extension()}")
+   return archives.pack(backups.walk(source), dest, log=log)
+
+def restore(server, point=None, paths=None):
+   return backups.restore(server, point, paths=paths, log=serverlog.logger(server))
+
+def history(server):
+   return serverlog.history(server)
+
+def search(server, pattern, regex=False, start=None, end=None, limit=1000, ignore_case=False):
+   store = history(server)
+   return store.search(pattern, regex, start, end, limit, ignore_case) if store is not None else []
+
+def between(server, start=None, end=None):
+   store = history(server)
+   return store.between(start, end) if store is not None else []
+
+def levels(server, level=logging.WARNING, start=None, end=None, limit=1000):
+   store = history(server)
+   return store.levels(level, start, end, limit) if store is not None else []
+
+def create(server = None, type = 'paper', task = None):
     logging.info(f'Creating server {server}')
     url = f"https://api.github.com/repos/ColinDemers/Minecraft-Server-Manager/releases/latest"
-    response = requests.get(url)
-    if response.status_code == 200:
-        response = response.json()
-    else:
+    try:
+        response = metadata.get(url, ttl=3600)
+    except requests.RequestException:
+        response = None
         logging.error("Failed to fetch the latest release, are you connected to the internet with access to Github.com?")
 
     if response:
@@ -114,25 +257,22 @@ def create(server = None, type = 'paper'):
     url = None
 
     if type == 'paper':
-        latest, headers = getCurrentVersion(type)
+        progress(task, 10, 'Looking up latest version')
+        current = getCurrentVersion(type)
 
-        if latest == None:
+        if current == None:
             logging.critical('Error: Could not find latest version')
             return
+
+        latest, headers = current
         
-        build_url = f"https://fill.papermc.io/v3/projects/{type}/versions/{latest}/builds"
-        response = requests.get(build_url, headers=headers)
-        response.raise_for_status()
-        
-        stable = [build for build in response.json() if build['channel'] == 'STABLE']
+        build = paperBuild(latest, type)
         
-        if not stable:
-            logging.debug("No stable build found.")
+        if not build:
             return
         
-        latestStable = stable[0]
-        
-        url = latestStable['downloads']['server:default']['url']
+        url = build['url']
+        hashes = build.get('checksums')
 
     if url:
         os.makedirs(os.path.join(os.getcwd(), server), exist_ok=True)
@@ -140,202 +280,172 @@ def create(server = None, type = 'paper'):
         with open(os.path.join(os.getcwd(), server, 'eula.txt'), 'w') as eula:
             eula.write('eula=true')
 
-        with open(os.path.join(os.getcwd(), server, 'backend.json'), 'w') as backend:
-                    backend.write(json.dumps({"version": latest,"maximum": "2048","minimum": "1024", "playit": "False", "bedrock": "False"}))
+        configs.create(server, {"version": latest, "maximum": 2048, "minimum": 1024, "playit": False, "bedrock": False, "jvm": dict(jvm.RECOMMENDED)})
 
-        logging.info(f"Downloading from {url}")
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-
-        with open(os.path.join(os.path.join(os.getcwd(), server), f'{server}.jar'), 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
+        progress(task, 40, 'Downloading server jar')
+        cache.fetch(url, os.path.join(os.getcwd(), server, f'{server}.jar'), hashes)
         
         logging.info("Download completed")
 
-def update(server, type='paper'):
+def update(server, type='paper', backup_all=False, task=None):
+   log = serverlog.logger(server)
   
-   stop(server)
-
-   logging.warning('Updating Server')
+   progress(task, 5, 'Checking for updates')
 
-   latest, headers = getCurrentVersion('paper')
+   # Looked up before stopping, an offline check leaves the server running
+   current = getCurrentVersion('paper')
+   if current is None:
+       log.error('Could not look up the latest version, not updating')
+       raise RuntimeError('Could not look up the latest version')
+   latest, headers = current
 
-   with open(os.path.join(os.getcwd(), server, 'backend.json'), 'r') as file:
-       data = json.load(file)
-   version = data['version']
-   playit = data['playit']
-   Bbedrock = data['bedrock']
+   config = configs.get(server)
+   version = config['version']
+   playit = config['playit']
+   Bbedrock = config['bedrock']
 
    if latest == version:
-       logging.info('Server already on latest version')
-       return
+       log.info('Server already on latest version')
+       return False
 
-   logging.info(f'Version mismatch of: Current {version} to Latest {latest}, updating')
-   logging.critical(f'NOT UPDATING PLUGINS THAT WERE MANUALLY INSTALLED, PLEASE UPDATE THOSE MANUALLY')
+   progress(task, 15, 'Stopping server')
+   stop(server)
 
-   logging.info('Backing up servers')
+   log.warning('Updating Server')
 
-   servers = []
-   subfolders = [os.path.basename(f.path) for f in os.scandir(os.getcwd()) if f.is_dir()]
-   for folder in subfolders:
-       if folder != '__pycache__':
-           if folder != 'backups':
-               servers.append(folder)
+   log.info(f'Version mismatch of: Current {version} to Latest {latest}, updating')
+   log.critical(f'NOT UPDATING PLUGINS THAT WERE MANUALLY INSTALLED, PLEASE UPDATE THOSE MANUALLY')
 
-   if len(servers) == 0:
-       logging.error('No servers found, this should not be possible and if you are seeing this message something very bad has happened')
+   progress(task, 25, 'Backing up')
+   if backup_all:
+       log.info('Backing up servers')
+       for Bserver in servers():
+           backups.backup(Bserver, log=log)
    else:
-       for Bserver in servers:
-           os.makedirs(os.path.join(os.getcwd(), 'backups'), exist_ok=True)
-           shutil.copytree(os.path.join(os.getcwd(), Bserver), os.path.join(os.getcwd(), 'backups', Bserver), dirs_exist_ok=True)
+       log.info('Backing up server')
+       backups.backup(server, log=log)
 
-   logging.info('Downloading latest version')
+   log.info('Downloading latest version')
+   progress(task, 50, 'Downloading')
 
-   build_url = f"https://fill.papermc.io/v3/projects/{type}/versions/{latest}/builds"
-   response = requests.get(build_url, headers=headers)
-   response.raise_for_status()
-  
-   stable = [build for build in response.json() if build['channel'] == 'STABLE']
-  
-   if not stable:
-       logging.debug("No stable build found.")
-       return
-  
-   latestStable = stable[0]
-  
-   url = latestStable['downloads']['server:default']['url']
-
-   with tempfile.NamedTemporaryFile(delete=False) as temp:
-       logging.info(f"Downloading from {url}")
-       response = requests.get(url, stream=True)
-       response.raise_for_status()
-
-       if response.status_code == 200:
-           for chunk in response.iter_content(chunk_size=8192):
-               temp.write(chunk)
-           tempPath = temp.name
-           logging.debug(f'Temporary file created at: {tempPath}')
-       else:
-           logging.debug(f'Failed to download file: {response.status_code}')
+   build = paperBuild(latest, type)
 
-   shutil.move(tempPath, os.path.join(os.getcwd(), server, f"{server}.jar"))
-   logging.debug(f'File moved to permanent location: {os.path.join(os.getcwd(), server, f"{server}.jar")}')
+   if not build:
+       log.error(f'No stable build of {latest} to download, not updating')
+       return False
 
-   if os.path.exists(tempPath):
-       os.remove(tempPath)
-       logging.debug(f'Temporary file deleted: {tempPath}')
+   # The server jar and every managed plugin download side by side
+   downloads = {os.path.join(os.getcwd(), server, f"{server}.jar"): (build['url'], build.get('checksums'))}
 
-   if playit == True:
-       url = 'https://github.com/playit-cloud/playit-minecraft-plugin/releases/latest/download/playit-minecraft-plugin.jar'
-       with tempfile.NamedTemporaryFile(delete=False) as temp:
-               logging.info(f"Downloading from {url}")
-               response = requests.get(url, stream=True)
-               response.raise_for_status()
+   if playit:
+       downloads[os.path.join(os.getcwd(), server, 'plugins', 'playit.jar')] = PLAYIT
 
-               if response.status_code == 200:
-                   for chunk in response.iter_content(chunk_size=8192):
-                       temp.write(chunk)
-                   tempPath = temp.name
-                   logging.debug(f'Temporary file created at: {tempPath}')
-               else:
-                   logging.debug(f'Failed to download file: {response.status_code}')
+   if Bbedrock:
+       downloads.update(bedrockPlugins(server))
 
-               shutil.move(tempPath, os.path.join(os.getcwd(), server, 'plugins', 'playit.jar'))
-               logging.debug(f'File moved to permanent location: {os.path.join(os.getcwd(), server, "plugins", "playit.jar")}')
+   if config['chunky']:
+       chunky = modrinthFile('chunky', ['paper'])
+       if chunky:
+           downloads[os.path.join(os.getcwd(), server, 'plugins', 'Chunky.jar')] = chunky
 
-               if os.path.exists(tempPath):
-                   os.remove(tempPath)
-                   logging.debug(f'Temporary file deleted: {tempPath}')
+   cache.fetch_all(downloads, log)
+   progress(task, 90, 'Saving version')
 
-   if Bbedrock == True:
-       bedrock(server)
+   config.set('version', latest)
 
-   with open(os.path.join(os.getcwd(), server, 'backend.json'), 'r') as file:
-       data = json.load(file)
+   log.info('Server updated')
+   return True
 
-   data['version'] = latest
+def downloadPlayit(server, task=None):
+   log = serverlog.logger(server)
 
-   with open(os.path.join(os.getcwd(), server, 'backend.json'), 'w') as file:
-       json.dump(data, file, indent=4)
+   configs.get(server).set('playit', True)
 
-   logging.info('Server updated')
+   log.info(f"Downloading playit {PLAYIT}")
+   progress(task, 20, 'Downloading playit')
+   cache.fetch(PLAYIT, os.path.join(os.getcwd(), server, 'plugins', 'playit.jar'), log=log)
+  
+   log.info('Playit downloaded')
 
-def downloadPlayit(server):
-   url = 'https://github.com/playit-cloud/playit-minecraft-plugin/releases/latest/download/playit-minecraft-plugin.jar'
+def installChunky(server, task=None):
+   log = serverlog.logger(server)
+   progress(task, 10, 'Looking up Chunky')
+   chunky = modrinthFile('chunky', ['paper'])
+   if not chunky:
+       raise RuntimeError('Could not find a Chunky build for Paper')
+   progress(task, 30, 'Downloading Chunky')
+   cache.fetch(chunky[0], os.path.join(os.getcwd(), server, 'plugins', 'Chunky.jar'), chunky[1], log=log)
+   configs.get(server).set('chunky', True)
+   log.info('Chunky downloaded, it loads on the next server start')
 
-   with open(os.path.join(os.getcwd(), server, 'backend.json'), 'r') as file:
-       data = json.load(file)
+def pregenerate(server, radius, center_x=0, center_z=0, world='world', mode=None, pause_for_players=False):
+   return pregen.start(server, radius, (int(center_x), int(center_z)), world, mode, pause_for_players)
 
-   data['playit'] = True
+def pregenPause(server):
+   return pregen.pause(server)
 
-   with open(os.path.join(os.getcwd(), server, 'backend.json'), 'w') as file:
-       json.dump(data, file, indent=4)
+def pregenResume(server):
+   return pregen.resume(server)
 
-   logging.info(f"Downloading playit {url}")
-   response = requests.get(url, stream=True)
-   response.raise_for_status()
+def pregenCancel(server):
+   return pregen.cancel(server)
 
-   os.makedirs(os.path.join(os.getcwd(), server, 'plugins'), exist_ok=True)
+def pregenStatus(server):
+   return pregen.status(server)
 
-   with open(os.path.join(os.path.join(os.getcwd(), server, 'plugins'), f'playit.jar'), 'wb') as file:
-       for chunk in response.iter_content(chunk_size=8192):
-           file.write(chunk)
-  
-   logging.info('Playit downloaded')
+def bedrockPlugins(server):
+   geyserLatest = geyserBuild('geyser')
+   floodgateLatest = geyserBuild('floodgate')
+   viaversionLatest = modrinthFile('viaversion')
 
-def bedrock(server):
+   bedrockPlugins = {'geyser': geyserLatest, 'floodgate': floodgateLatest, 'viaversion': viaversionLatest}
 
-   with open(os.path.join(os.getcwd(), server, 'backend.json'), 'r') as file:
-       data = json.load(file)
+   return {os.path.join(os.getcwd(), server, "plugins", f"{plugin}.jar"): source for plugin, source in bedrockPlugins.items() if source}
 
-   data['bedrock'] = True
+def geyserBuild(project):
+   url = f'https://download.geysermc.org/v2/projects/{project}/versions/latest/builds/latest'
 
-   with open(os.path.join(os.getcwd(), server, 'backend.json'), 'w') as file:
-       json.dump(data, file, indent=4)
-  
-   geyserLatest = 'https://download.geysermc.org/v2/projects/geyser/versions/latest/builds/latest/downloads/spigot'
-   floodgateLatest = 'https://download.geysermc.org/v2/projects/floodgate/versions/latest/builds/latest/downloads/spigot'
-   viaversionLatest = modrinth('viaversion')
+   try:
+       build = metadata.get(url)
+       # Pin the download to the build the checksum belongs to, the cached "latest" may be a little behind
+       pinned = f"https://download.geysermc.org/v2/projects/{project}/versions/{build['version']}/builds/{build['build']}/downloads/spigot"
+       sha256 = build['downloads']['spigot'].get('sha256')
+       return pinned, {'sha256': sha256} if sha256 else None
+   except (requests.RequestException, KeyError, ValueError) as e:
+       logging.error(f"Error fetching build for {project}: {e}")
 
-   bedrockPlugins = {'geyser': geyserLatest, 'floodgate': floodgateLatest, 'viaversion': viaversionLatest}
+   return f'{url}/downloads/spigot', None
 
-   os.makedirs(os.path.join(os.getcwd(), server, 'plugins'), exist_ok=True)
-   for plugin, url in bedrockPlugins.items():
-       logging.critical(url)
-       with tempfile.NamedTemporaryFile(delete=False) as temp:
-           logging.info(f"Downloading from {url}")
-           response = requests.get(url, stream=True)
-           response.raise_for_status()
-
-           if response.status_code == 200:
-               for chunk in response.iter_content(chunk_size=8192):
-                   temp.write(chunk)
-               tempPath = temp.name
-               logging.debug(f'Temporary file created at: {tempPath}')
-           else:
-               logging.debug(f'Failed to download file: {response.status_code}')
+def bedrock(server, task=None):
+   log = serverlog.logger(server)
 
-           shutil.move(tempPath, os.path.join(os.getcwd(), server, "plugins", f"{plugin}.jar"))
-           logging.debug(f'File moved to permanent location: {os.path.join(os.getcwd(), server, "plugins", f"{plugin}.jar")}')
+   configs.get(server).set('bedrock', True)
 
-           if os.path.exists(tempPath):
-               os.remove(tempPath)
-               logging.debug(f'Temporary file deleted: {tempPath}')
-          
-           logging.info(f'Downloaded {plugin}')
+   progress(task, 10, 'Looking up plugins')
+   plugins = bedrockPlugins(server)
+   progress(task, 30, 'Downloading plugins')
+   cache.fetch_all(plugins, log)
 
-def getCurrentVersion(type='paper', agent="cool-project/1.0.0 (contact@me.com)"):
+def paperBuild(latest, type='paper'):
+   build_url = f"https://fill.papermc.io/v3/projects/{type}/versions/{latest}/builds"
+   stable = [build for build in metadata.get(build_url) if build['channel'] == 'STABLE']
+
+   if not stable:
+       logging.debug("No stable build found.")
+       return None
+
+   return stable[0]['downloads']['server:default']
+
+def getCurrentVersion(type='paper', agent=AGENT):
    version_url = f"https://fill.papermc.io/v3/projects/{type}"
    headers = {"User-Agent": agent}
   
-   response = requests.get(version_url, headers=headers)
-   if response.status_code != 200:
-       logging.error(f"Received status code {response.status_code}")
-       logging.debug(response.text)
+   try:
+       data = metadata.get(version_url)
+   except requests.RequestException as e:
+       logging.error(f"Could not fetch versions: {e}")
        return None
   
-   data = response.json()
    latest = max(max(data['versions'].values(), key=lambda v: list(map(int, v[0].split('.')))), key=lambda v: list(map(int, v.split('.'))))
 
    if 'versions' not in data or not data['versions']:
@@ -345,19 +455,24 @@ def getCurrentVersion(type='paper', agent="cool-project/1.0.0 (contact@me.com)")
    return latest, headers
 
 def modrinth(id):
+   file = modrinthFile(id)
+   if file:
+       return file[0]
+
+def modrinthFile(id, loaders=None):
    url = f"https://api.modrinth.com/v2/project/{id}/version"
+   if loaders:
+       url += f"?loaders={urllib.parse.quote(json.dumps(loaders))}"
   
    try:
-       response = requests.get(url)
-       response.raise_for_status()
-       data = response.json()
+       data = metadata.get(url)
 
        if data:
            latest_version = data[0]
            files = latest_version.get('files', [])
            if files:
                download_url = files[0].get('url')
-               return download_url
+               return download_url, files[0].get('hashes')
            else:
                logging.error(f"No files found for {id}.")
        else:
@@ -0,0 +1,196 @@
+import concurrent.futures
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+CHUNK_SIZE = 1024 * 1024
+# Region files are rewritten in 4 KiB sectors, smaller chunks keep an unchanged sector range deduplicated
+REGION_CHUNK_SIZE = 64 * 1024
+EXCLUDE = ('cache', 'logs', 'manager.log*', 'history.log', 'history.idx', 'session.lock')
+KEEP = 10
+
+class BackupEngine:
+   def __init__(self, root, exclude=EXCLUDE, keep=KEEP, workers=4):
+       self.root = root
+       self.objects = os.path.join(root, 'objects')
+       self.exclude = exclude
+       self.keep = keep
+       self.workers = workers
+       # Backups run side by side, garbage collection waits for all of them since they write chunks not referenced yet
+       self.lock = threading.Condition()
+       self.active = 0
+       self.stats = {}
+
+   def snapshots(self, server):
+       return os.path.join(self.root, 'snapshots', server)
+
+   def restore_points(self, server):
+       directory = self.snapshots(server)
+       if not os.path.isdir(directory):
+           return []
+       return sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+
+   def manifest(self, server, point=None):
+       points = self.restore_points(server)
+       if not points:
+           return None
+       point = point or points[-1]
+       with open(os.path.join(self.snapshots(server), f'{point}.json'), 'r') as file:
+           return json.load(file)
+
+   def object_path(self, digest):
+       return os.path.join(self.objects, digest[:2], digest)
+
+   def excluded(self, relative):
+       top = relative.split(os.sep, 1)[0]
+       return any(fnmatch.fnmatch(top, pattern) for pattern in self.exclude)
+
+   def walk(self, source):
+       for directory, folders, files in os.walk(source):
+           relative = os.path.relpath(directory, source)
+           if relative != '.' and self.excluded(relative):
+               folders[:] = []
+               continue
+           for name in files:
+               path = os.path.join(directory, name)
+               key = os.path.relpath(path, source)
+               if not self.excluded(key):
+                   yield key, path
+
+   def store_file(self, path):
+       size = CHUNK_SIZE if not path.endswith('.mca') else REGION_CHUNK_SIZE
+       chunks = []
+       written = 0
+       with open(path, 'rb') as file:
+           while True:
+               block = file.read(size)
+               if not block:
+                   break
+               digest = hashlib.sha256(block).hexdigest()
+               chunks.append(digest)
+               target = self.object_path(digest)
+               if not os.path.exists(target):
+                   os.makedirs(os.path.dirname(target), exist_ok=True)
+                   with tempfile.NamedTemporaryFile(dir=os.path.dirname(target), delete=False) as temp:
+                       temp.write(block)
+                   os.replace(temp.name, target)
+                   written += len(block)
+       return chunks, written
+
+   def backup(self, server, source=None, log=logging):
+       source = source or os.path.join(os.getcwd(), server)
+       with self.lock:
+           self.active += 1
+       try:
+           point = self.snapshot(server, source, log)
+       finally:
+           with self.lock:
+               self.active -= 1
+               self.lock.notify_all()
+       self.prune(server)
+       return point
+
+   def snapshot(self, server, source, log):
+       started = time.monotonic()
+       previous = self.manifest(server) or {'files': {}}
+
+       files = {}
+       changed = {}
+       for key, path in self.walk(source):
+           try:
+               stat = os.stat(path)
+           except FileNotFoundError:
+               continue
+           entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'mode': stat.st_mode & 0o777}
+           old = previous['files'].get(key)
+           if old and old['size'] == entry['size'] and old['mtime_ns'] == entry['mtime_ns']:
+               entry['chunks'] = old['chunks']
+           else:
+               changed[key] = path
+           files[key] = entry
+
+       written = 0
+       with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+           futures = {pool.submit(self.store_file, path): key for key, path in changed.items()}
+           for future in concurrent.futures.as_completed(futures):
+               key = futures[future]
+               try:
+                   files[key]['chunks'], size = future.result()
+                   written += size
+               except FileNotFoundError:
+                   del files[key]
+
+       point = time.strftime('%Y%m%d-%H%M%S') + f'-{time.time_ns() // 1000000 % 1000:03d}'
+       manifest = {'server': server, 'created': time.time(), 'files': files}
+       directory = self.snapshots(server)
+       os.makedirs(directory, exist_ok=True)
+       with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as temp:
+           json.dump(manifest, temp)
+       os.replace(temp.name, os.path.join(directory, f'{point}.json'))
+
+       elapsed = time.monotonic() - started
+       stats = self.stats.setdefault(server, {'count': 0, 'seconds': 0.0, 'last': 0.0, 'bytes': 0})
+       stats['count'] += 1
+       stats['seconds'] += elapsed
+       stats['last'] = elapsed
+       stats['bytes'] += written
+       log.info(f'Backed up {server} to {point}: {len(files)} files, {len(changed)} changed, {written / 1048576:.1f} MB new in {elapsed:.1f}s')
+       return point
+
+   def restore(self, server, point=None, dest=None, paths=None, log=logging):
+       manifest = self.manifest(server, point)
+       if manifest is None:
+           raise FileNotFoundError(f'No backups found for {server}')
+       dest = dest or os.path.join(os.getcwd(), server)
+
+       for key, entry in manifest['files'].items():
+           if paths and not any(key == path or key.startswith(path.rstrip(os.sep) + os.sep) for path in paths):
+               continue
+           target = os.path.join(dest, key)
+           os.makedirs(os.path.dirname(target), exist_ok=True)
+           with tempfile.NamedTemporaryFile(dir=os.path.dirname(target), delete=False) as temp:
+               for digest in entry['chunks']:
+                   with open(self.object_path(digest), 'rb') as chunk:
+                       shutil.copyfileobj(chunk, temp)
+           os.chmod(temp.name, entry['mode'])
+           os.replace(temp.name, target)
+           os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']))
+
+       log.info(f'Restored {server} from {point or self.restore_points(server)[-1]}')
+
+   def prune(self, server, keep=None):
+       keep = self.keep if keep is None else keep
+       points = self.restore_points(server)
+       if len(points) <= keep:
+           return
+       for point in points[:len(points) - keep]:
+           os.remove(os.path.join(self.snapshots(server), f'{point}.json'))
+       self.collect()
+
+   def collect(self):
+       with self.lock:
+           self.lock.wait_for(lambda: self.active == 0)
+           self.collect_unreferenced()
+
+   def collect_unreferenced(self):
+       referenced = set()
+       snapshots = os.path.join(self.root, 'snapshots')
+       if os.path.isdir(snapshots):
+           for server in os.listdir(snapshots):
+               for point in self.restore_points(server):
+                   for entry in self.manifest(server, point)['files'].values():
+                       referenced.update(entry['chunks'])
+
+       if not os.path.isdir(self.objects):
+           return
+       for prefix in os.listdir(self.objects):
+           directory = os.path.join(self.objects, prefix)
+           for digest in os.listdir(directory):
+               if digest not in referenced:
+                   os.remove(os.path.join(directory, digest))
@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archives
+from backups import BackupEngine
+
+def region(path, size, rng):
+   # Region files hold individually zlib compressed chunks in 4 KiB sectors
+   with open(path, 'wb') as file:
+       file.write(bytes(8192))
+       written = 8192
+       while written < size:
+           chunk = zlib.compress(rng.randbytes(6000) + bytes(6000))
+           padded = chunk + bytes(-len(chunk) % 4096)
+           file.write(padded)
+           written += len(padded)
+
+def world(root, size_mb, seed=1):
+   rng = random.Random(seed)
+   regions = os.path.join(root, 'world', 'region')
+   os.makedirs(regions, exist_ok=True)
+   region_size = 8 * 1024 * 1024
+   for n in range(max(size_mb * 1024 * 1024 // region_size, 1)):
+       region(os.path.join(regions, f'r.{n % 32}.{n // 32}.mca'), region_size, rng)
+
+   players = os.path.join(root, 'world', 'playerdata')
+   os.makedirs(players, exist_ok=True)
+   for n in range(200):
+       with open(os.path.join(players, f'{n:08x}.dat'), 'wb') as file:
+           file.write(b'{"Pos":[0.0,64.0,0.0],"Inventory":[]}' * 200)
+
+   with open(os.path.join(root, 'server.properties'), 'w') as file:
+       file.write('motd=A Minecraft Server\n' * 100)
+
+def size(path):
+   total = 0
+   for directory, _, files in os.walk(path):
+       for name in files:
+           total += os.path.getsize(os.path.join(directory, name))
+   return total
+
+def timed(label, function, source_size, output):
+   started = time.monotonic()
+   function()
+   elapsed = time.monotonic() - started
+   throughput = f'{source_size / 1048576 / elapsed:9.1f} MB/s' if source_size else f'{"-":>14}'
+   print(f'{label:<28} {elapsed:8.3f}s {throughput} {size(output) / 1048576:10.1f} MB')
+
+def main():
+   parser = argparse.ArgumentParser(description='Compare copytree backups with parallel compressed archives')
+   parser.add_argument('--size-mb', type=int, default=2048)
+   parser.add_argument('--workers', type=int, default=os.cpu_count())
+   args = parser.parse_args()
+
+   with tempfile.TemporaryDirectory() as root:
+       source = os.path.join(root, 'server')
+       world(source, args.size_mb)
+       source_size = size(source)
+       files = list(BackupEngine(root).walk(source))
+       print(f'Synthetic world: {len(files)} files, {source_size / 1048576:.1f} MB, {args.workers} workers')
+       print(f'{"method":<28} {"time":>9} {"throughput":>14} {"output":>13}')
+
+       timed('copytree', lambda: shutil.copytree(source, os.path.join(root, 'copy')), source_size, os.path.join(root, 'copy'))
+
+       codecs = [('zstd', archives.zstandard)] if archives.zstandard is not None else []
+       codecs.append(('gzip', None))
+       for name, module in codecs:
+           archives.zstandard = module
+           output = os.path.join(root, name)
+           dest = os.path.join(output, f'server.{archives.extension()}')
+           timed(f'archive {name} x{args.workers}', lambda: archives.pack(files, dest, workers=args.workers), source_size, output)
+           timed(f'archive {name} x1', lambda: archives.pack(files, dest, workers=1), source_size, output)
+           timed(f'restore one file ({name})', lambda: archives.read_file(dest, 'server.properties'), 0, output)
+
+if __name__ == '__main__':
+   main()
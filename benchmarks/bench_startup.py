@@ -0,0 +1,84 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def fleet(root, count):
+   for n in range(count):
+       directory = os.path.join(root, f'server{n:03d}')
+       os.makedirs(directory)
+       with open(os.path.join(directory, 'backend.json'), 'w') as file:
+           json.dump({'minimum': '1024', 'maximum': '4096', 'version': '1.21'}, file)
+       with open(os.path.join(directory, 'server.properties'), 'w') as file:
+           file.write('#Minecraft server properties\n' + ''.join(f'key{i}=value{i}\n' for i in range(60)))
+
+def measure(app, window_module, count, lazy):
+   from PySide6.QtCore import QCoreApplication, QEvent, QObject, QThreadPool
+
+   class FirstPaint(QObject):
+       def __init__(self):
+           super().__init__()
+           self.at = None
+
+       def eventFilter(self, watched, event):
+           if self.at is None and event.type() == QEvent.Type.Paint:
+               self.at = time.perf_counter()
+           return False
+
+   paint = FirstPaint()
+   app.installEventFilter(paint)
+   started = time.perf_counter()
+   window = window_module.MainWindow(lazy=lazy)
+   window.show()
+   deadline = time.monotonic() + 60
+   while (paint.at is None or len(window.servers) < count) and time.monotonic() < deadline:
+       app.processEvents()
+   listed = time.perf_counter()
+   app.removeEventFilter(paint)
+   # close() would ask about stopping the servers, tear the window down directly once its background calls are back
+   window.hide()
+   QThreadPool.globalInstance().waitForDone()
+   app.processEvents()
+   window.deleteLater()
+   QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+   return paint.at - started, listed - started
+
+def main():
+   parser = argparse.ArgumentParser(description='Time to first paint of the main window against the number of servers')
+   parser.add_argument('--counts', default='1,10,30,100')
+   args = parser.parse_args()
+
+   os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+   cwd = os.getcwd()
+   with tempfile.TemporaryDirectory() as root:
+       # No daemon behind this socket, the window has to paint without one
+       os.environ['MSM_SOCKET'] = os.path.join(root, 'missing.sock')
+       started = time.perf_counter()
+       from PySide6.QtWidgets import QApplication
+       app = QApplication(sys.argv)
+       window_module = importlib.import_module('main')
+       print(f'Imports and QApplication: {time.perf_counter() - started:.3f}s')
+       print(f'{"servers":>8} {"mode":>6} {"first paint":>12} {"all listed":>11}')
+
+       try:
+           for count in [int(value) for value in args.counts.split(',')]:
+               for lazy in (False, True):
+                   directory = os.path.join(root, f'{count}-{lazy}')
+                   fleet(directory, count)
+                   os.chdir(directory)
+                   paint, listed = measure(app, window_module, count, lazy)
+                   print(f'{count:>8} {"lazy" if lazy else "eager":>6} {paint:11.3f}s {listed:10.3f}s')
+       finally:
+           # The application goes before the directory it ran in, and the directory is left before it is removed
+           os.chdir(cwd)
+           app.shutdown()
+           del app
+   return 0
+
+if __name__ == '__main__':
+   sys.exit(main())
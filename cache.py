@@ -0,0 +1,232 @@
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from downloads import downloader as default_downloader
+
+MAX_BYTES = 2 * 1024 * 1024 * 1024
+FICLONE = 0x40049409
+
+def file_hashes(path, algorithms=('sha256',)):
+   digests = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+   with open(path, 'rb') as file:
+       while True:
+           block = file.read(1024 * 1024)
+           if not block:
+               break
+           for digest in digests.values():
+               digest.update(block)
+   return {algorithm: digest.hexdigest() for algorithm, digest in digests.items()}
+
+def reflink(source, dest):
+   import fcntl
+   with open(source, 'rb') as src, open(dest, 'wb') as dst:
+       fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+class ArtifactCache:
+   def __init__(self, root, max_bytes=MAX_BYTES, downloader=None):
+       self.root = root
+       self.max_bytes = max_bytes
+       self.downloader = downloader or default_downloader
+       self.index_path = os.path.join(root, 'index.json')
+       self.lock = threading.Lock()
+       self.fetching = {}
+       self.index = None
+
+   def load(self):
+       if self.index is None:
+           try:
+               with open(self.index_path, 'r') as file:
+                   self.index = json.load(file)
+           except (FileNotFoundError, ValueError):
+               self.index = {'objects': {}, 'aliases': {}}
+       return self.index
+
+   def save(self):
+       os.makedirs(self.root, exist_ok=True)
+       with tempfile.NamedTemporaryFile('w', dir=self.root, suffix='.tmp', delete=False) as temp:
+           json.dump(self.index, temp)
+       os.replace(temp.name, self.index_path)
+
+   def path(self, sha256):
+       return os.path.join(self.root, 'objects', sha256[:2], sha256)
+
+   def lookup(self, hashes):
+       if not hashes:
+           return None
+       with self.lock:
+           index = self.load()
+           sha256 = hashes.get('sha256')
+           if sha256 is None:
+               for algorithm, value in hashes.items():
+                   sha256 = index['aliases'].get(f'{algorithm}:{value}')
+                   if sha256:
+                       break
+           if sha256 and sha256 in index['objects'] and os.path.exists(self.path(sha256)):
+               index['objects'][sha256]['used'] = time.time()
+               return sha256
+       return None
+
+   def fetch(self, url, dest, hashes=None, log=logging):
+       sha256 = self.lookup(hashes)
+       if sha256 and self.verify(sha256, log):
+           log.info(f'Using cached {os.path.basename(dest)} ({sha256[:12]})')
+           self.link(sha256, dest)
+           with self.lock:
+               self.save()
+           return dest
+
+       # Concurrent requests for the same artifact wait on the first download instead of repeating it
+       key = url if not hashes else min(f'{algorithm}:{value}' for algorithm, value in hashes.items())
+       with self.lock:
+           pending = self.fetching.get(key)
+           owner = pending is None
+           if owner:
+               pending = self.fetching[key] = threading.Event()
+       if not owner:
+           pending.wait()
+           sha256 = self.lookup(hashes)
+           if sha256:
+               self.link(sha256, dest)
+               return dest
+
+       try:
+           sha256 = self.download(url, os.path.basename(dest), hashes, log)
+       finally:
+           if owner:
+               with self.lock:
+                   del self.fetching[key]
+               pending.set()
+
+       self.link(sha256, dest)
+       return dest
+
+   def download(self, url, name, hashes, log):
+       staging = os.path.join(self.root, 'staging')
+       os.makedirs(staging, exist_ok=True)
+       temp = os.path.join(staging, f'{time.monotonic_ns()}-{name}')
+
+       self.downloader.fetch(url, temp, log)
+       try:
+           algorithms = {'sha256'} | set(hashes or {})
+           actual = file_hashes(temp, sorted(algorithms))
+           for algorithm, expected in (hashes or {}).items():
+               if actual[algorithm] != expected.lower():
+                   raise ValueError(f'{algorithm} mismatch for {url}: expected {expected}, got {actual[algorithm]}')
+
+           sha256 = actual['sha256']
+           target = self.path(sha256)
+           os.makedirs(os.path.dirname(target), exist_ok=True)
+           os.replace(temp, target)
+           os.chmod(target, 0o444)
+       except BaseException:
+           if os.path.exists(temp):
+               os.remove(temp)
+           raise
+
+       with self.lock:
+           index = self.load()
+           index['objects'][sha256] = {'size': os.path.getsize(target), 'used': time.time(), 'url': url}
+           for algorithm, value in actual.items():
+               if algorithm != 'sha256':
+                   index['aliases'][f'{algorithm}:{value}'] = sha256
+           self.evict(keep=sha256)
+           self.save()
+
+       log.info(f'Cached {os.path.basename(url)} ({sha256[:12]})')
+       return sha256
+
+   def link(self, sha256, dest):
+       source = self.path(sha256)
+       directory = os.path.dirname(dest)
+       os.makedirs(directory, exist_ok=True)
+       temp = os.path.join(directory, f'.{os.path.basename(dest)}.{sha256[:12]}.link')
+       if os.path.exists(temp):
+           os.remove(temp)
+
+       # A copy-on-write clone is a separate inode, a write to one server's jar cannot reach the cache or its siblings
+       try:
+           reflink(source, temp)
+       except (OSError, ImportError):
+           if os.path.exists(temp):
+               os.remove(temp)
+           try:
+               # A hard link shares the inode, the object is kept read-only so nothing can change it in place
+               os.chmod(source, 0o444)
+               os.link(source, temp)
+           except OSError:
+               shutil.copyfile(source, temp)
+       os.replace(temp, dest)
+
+   def verify(self, sha256, log=logging):
+       # Objects are only trusted while they still hash to their name
+       path = self.path(sha256)
+       with self.lock:
+           entry = self.load()['objects'].get(sha256)
+       try:
+           intact = entry is not None and os.path.getsize(path) == entry['size'] and file_hashes(path)['sha256'] == sha256
+       except FileNotFoundError:
+           intact = False
+       if not intact:
+           log.warning(f'Cached object {sha256[:12]} was modified, downloading it again')
+           with self.lock:
+               self.forget(sha256)
+               self.save()
+       return intact
+
+   def evict(self, keep=None):
+       objects = self.load()['objects']
+       total = sum(entry['size'] for entry in objects.values())
+       if total <= self.max_bytes:
+           return
+
+       def order(item):
+           sha256, entry = item
+           try:
+               linked = os.stat(self.path(sha256)).st_nlink > 1
+           except FileNotFoundError:
+               linked = False
+           # Objects no server links to free real disk space, drop those first
+           return (linked, entry['used'])
+
+       for sha256, entry in sorted(objects.items(), key=order):
+           if total <= self.max_bytes:
+               break
+           if sha256 == keep:
+               continue
+           total -= entry['size']
+           self.forget(sha256)
+
+   def forget(self, sha256):
+       try:
+           os.remove(self.path(sha256))
+       except FileNotFoundError:
+           pass
+       index = self.load()
+       index['objects'].pop(sha256, None)
+       aliases = index['aliases']
+       for alias in [alias for alias, target in aliases.items() if target == sha256]:
+           del aliases[alias]
+
+   def fetch_all(self, downloads, log=logging):
+       futures = {}
+       for dest, source in downloads.items():
+           url, hashes = source if isinstance(source, tuple) else (source, None)
+           futures[self.downloader.pool.submit(self.fetch, url, dest, hashes, log)] = dest
+
+       failed = None
+       for future in concurrent.futures.as_completed(futures):
+           try:
+               future.result()
+           except Exception as e:
+               log.error(f'Failed to download {os.path.basename(futures[future])}: {e}')
+               failed = failed or e
+       if failed is not None:
+           raise failed
+       return list(futures.values())
@@ -0,0 +1,125 @@
+import argparse
+import datetime
+import json
+import logging
+import sys
+import time
+
+import rpc
+from client import Client
+
+def show(value):
+   if isinstance(value, (dict, list)):
+       print(json.dumps(value, indent=4, default=str))
+   elif value is not None:
+       print(value)
+
+def progress(percent, message):
+   print(f'[{percent:3d}%] {message}', file=sys.stderr)
+
+def moment(text):
+   # Epoch seconds or a local date and time, 2024-05-01 or 2024-05-01T18:30
+   try:
+       return float(text)
+   except ValueError:
+       pass
+   try:
+       return datetime.datetime.fromisoformat(text).timestamp()
+   except ValueError:
+       raise argparse.ArgumentTypeError(f'{text!r} is neither epoch seconds nor an ISO date and time')
+
+def show_lines(results):
+   for created, line in results:
+       stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)) if created is not None else '-'
+       print(f'{stamp} {line}')
+
+def main(argv=None):
+   parser = argparse.ArgumentParser(description='Minecraft Server Manager command line client')
+   parser.add_argument('--socket', default=None)
+   commands = parser.add_subparsers(dest='action', required=True)
+
+   daemon = commands.add_parser('daemon', help='Run the daemon in the foreground')
+   daemon.add_argument('--metrics-port', type=int, default=None)
+   daemon.add_argument('--metrics-host', default='127.0.0.1')
+   commands.add_parser('list', help='List servers')
+   commands.add_parser('stop-all', help='Stop every running server')
+   commands.add_parser('shutdown', help='Stop every server and the daemon')
+   for name in ('start', 'stop', 'restart', 'status', 'crashes', 'backup'):
+       commands.add_parser(name).add_argument('server', nargs='?' if name in ('status',) else None)
+   command = commands.add_parser('command', help='Send a console command')
+   command.add_argument('server')
+   command.add_argument('text', nargs='+')
+   logs = commands.add_parser('logs', help='Show the console, -f keeps following it')
+   logs.add_argument('server')
+   logs.add_argument('-n', '--lines', type=int, default=100)
+   logs.add_argument('-f', '--follow', action='store_true')
+   history = commands.add_parser('history', help='Search the stored console history, without a pattern print a time range')
+   history.add_argument('server')
+   history.add_argument('pattern', nargs='?')
+   history.add_argument('-e', '--regex', action='store_true')
+   history.add_argument('-i', '--ignore-case', action='store_true')
+   history.add_argument('--since', type=moment, default=None)
+   history.add_argument('--until', type=moment, default=None)
+   history.add_argument('--level', choices=('warning', 'error', 'critical'), default=None, help='Without a pattern, only lines at this level or above')
+   history.add_argument('-n', '--limit', type=int, default=1000)
+   update = commands.add_parser('update', help='Update the server jar and plugins')
+   update.add_argument('server')
+   update.add_argument('--type', default='paper')
+   update.add_argument('--backup-all', action='store_true')
+   schedule = commands.add_parser('schedule', help='Show scheduled maintenance, --run starts a job now')
+   schedule.add_argument('server')
+   schedule.add_argument('--run', choices=('restart', 'backup', 'update'), default=None)
+   kind = commands.choices['backup'].add_mutually_exclusive_group()
+   kind.add_argument('--hot', action='store_true', help='Back up a running server without stopping it')
+   kind.add_argument('--archive', action='store_true', help='Pack the server folder into one compressed archive under backups/archives')
+   args = parser.parse_args(argv)
+
+   if args.action == 'daemon':
+       import daemon as daemon_module
+       options = ['--metrics-port', str(args.metrics_port), '--metrics-host', args.metrics_host] if args.metrics_port else []
+       return daemon_module.main((['--socket', args.socket] if args.socket else []) + options)
+
+   # A terminal can be interrupted, every call waits for the daemon
+   client = Client(args.socket, timeout=None)
+   try:
+       if args.action == 'list':
+           show(client.call('servers'))
+       elif args.action == 'stop-all':
+           client.call('stop_all')
+       elif args.action == 'shutdown':
+           client.call('shutdown')
+       elif args.action in ('start', 'stop', 'restart', 'crashes'):
+           show(client.call(args.action, args.server))
+       elif args.action == 'status':
+           show(client.call('status', args.server))
+       elif args.action == 'command':
+           show(client.call('command', args.server, ' '.join(args.text)))
+       elif args.action == 'backup':
+           show(client.call('hot_backup' if args.hot else 'archive' if args.archive else 'backup', args.server))
+       elif args.action == 'update':
+           show(client.call('update', args.server, args.type, args.backup_all, progress=progress))
+       elif args.action == 'schedule':
+           show(client.call('runScheduled', args.server, args.run) if args.run else client.call('schedule', args.server))
+       elif args.action == 'history':
+           if args.pattern is not None:
+               show_lines(client.call('search', args.server, args.pattern, args.regex, args.since, args.until, args.limit, args.ignore_case))
+           elif args.level is not None:
+               show_lines(client.call('levels', args.server, getattr(logging, args.level.upper()), args.since, args.until, args.limit))
+           else:
+               for line in client.call('between', args.server, args.since, args.until):
+                   print(line)
+       elif args.action == 'logs':
+           for params in client.stream('logs', server=args.server, lines=args.lines, follow=args.follow):
+               print(params['line'], flush=True)
+   except (ConnectionRefusedError, FileNotFoundError):
+       print(f'No daemon is listening on {rpc.describe(client.path)}, start one with: python cli.py daemon', file=sys.stderr)
+       return 1
+   except rpc.RpcError as e:
+       print(e, file=sys.stderr)
+       return 1
+   except KeyboardInterrupt:
+       return 130
+   return 0
+
+if __name__ == '__main__':
+   sys.exit(main())
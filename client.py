@@ -0,0 +1,245 @@
+import itertools
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import rpc
+from telemetry import CAPACITY, INTERVAL, RingSeries
+
+SPAWN_TIMEOUT = 15
+# Quick calls give up after this long, a wedged daemon must not hang the window
+TIMEOUT = 10
+# Calls that wait on servers (stopping, downloads) have no reply deadline
+LONG = ('start', 'stop', 'stop_all', 'restart', 'create', 'update', 'downloadPlayit', 'bedrock', 'installChunky', 'backup', 'hot_backup', 'archive', 'restore')
+
+class Client:
+   def __init__(self, path=None, timeout=TIMEOUT):
+       self.path = rpc.address(path)
+       self.timeout = timeout
+       self.ids = itertools.count(1)
+
+   def connect(self):
+       connection = socket.socket(rpc.family(self.path), socket.SOCK_STREAM)
+       connection.settimeout(self.timeout)
+       try:
+           connection.connect(self.path)
+       except OSError:
+           connection.close()
+           raise
+       return connection
+
+   def alive(self):
+       try:
+           self.connect().close()
+           return True
+       except OSError:
+           return False
+
+   def spawn(self, timeout=SPAWN_TIMEOUT):
+       if self.alive():
+           return False
+       # A new session so the daemon and its servers survive the GUI or the shell that started it
+       subprocess.Popen(
+           [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'daemon.py'), '--socket', str(self.path[1]) if isinstance(self.path, tuple) else self.path],
+           cwd=os.getcwd(),
+           stdin=subprocess.DEVNULL,
+           stdout=subprocess.DEVNULL,
+           stderr=subprocess.DEVNULL,
+           start_new_session=True,
+           creationflags=getattr(subprocess, 'DETACHED_PROCESS', 0)
+       )
+       deadline = time.monotonic() + timeout
+       while time.monotonic() < deadline:
+           if self.alive():
+               return True
+           time.sleep(0.1)
+       raise ConnectionError(f'Daemon did not come up on {rpc.describe(self.path)}')
+
+   def messages(self, method, params, timeout=None):
+       # Every call gets its own connection, so calls from several threads never interleave
+       id = next(self.ids)
+       with self.connect() as connection:
+           connection.sendall(rpc.request(id, method, params))
+           connection.settimeout(timeout)
+           with connection.makefile('rb') as stream:
+               for line in stream:
+                   yield rpc.decode(line)
+
+   def call(self, method, *args, progress=None, timeout=False, **kwargs):
+       # timeout=False picks the default for the method, None waits as long as the daemon takes
+       if timeout is False:
+           timeout = None if method in LONG else self.timeout
+       for message in self.messages(method, kwargs or list(args), timeout):
+           if 'error' in message:
+               raise rpc.RpcError(f"{message['error']['type']}: {message['error']['message']}")
+           if 'result' in message:
+               return message['result']
+           if message.get('method') == 'progress' and progress is not None:
+               # Raising here closes the connection, which cancels the call in the daemon
+               progress(message['params']['percent'], message['params']['message'])
+       raise ConnectionError(f'Daemon closed the connection during {method}')
+
+   def stream(self, method, **params):
+       for message in self.messages(method, params):
+           if 'error' in message:
+               raise rpc.RpcError(f"{message['error']['type']}: {message['error']['message']}")
+           if 'result' in message:
+               return
+           yield message['params']
+
+class LogFollower(threading.Thread):
+   def __init__(self, client, server, handler, lines=500):
+       threading.Thread.__init__(self, name=f'{server}-follow', daemon=True)
+       self.client = client
+       self.server = server
+       self.handler = handler
+       self.lines = lines
+
+   def run(self):
+       # The daemon sends formatted lines, the handler only has to show them
+       self.handler.setFormatter(logging.Formatter('%(message)s'))
+       while True:
+           try:
+               for params in self.client.stream('logs', server=self.server, lines=self.lines):
+                   self.handler.handle(logging.makeLogRecord({'msg': params['line'], 'levelno': logging.INFO, 'levelname': 'INFO'}))
+           except (OSError, rpc.RpcError):
+               pass
+           # Reconnecting after a daemon restart must not replay the backlog
+           self.lines = 0
+           time.sleep(1)
+
+class RemoteTelemetry:
+   def __init__(self, server, capacity=CAPACITY):
+       self.server = server
+       self.series = {name: RingSeries(capacity) for name in ('cpu', 'rss', 'tps', 'mspt', 'gc_pause', 'heap', 'players')}
+       self.since = 0
+
+   def sync(self, client):
+       points = client.call('telemetry', server=self.server, since=self.since)
+       for name, values in points.items():
+           for when, value in values:
+               if when > self.since:
+                   self.series[name].append(value, when)
+       latest = [series.points[-1][0] for series in self.series.values() if series.points]
+       if latest:
+           self.since = max(latest)
+
+class RemoteTelemetryMonitor:
+   def __init__(self, client, interval=INTERVAL):
+       self.client = client
+       self.interval = interval
+       self.telemetry = {}
+       self.lock = threading.Lock()
+       self.thread = None
+
+   def get(self, server):
+       with self.lock:
+           telemetry = self.telemetry.get(server)
+           if telemetry is None:
+               telemetry = self.telemetry[server] = RemoteTelemetry(server)
+       if self.thread is None:
+           self.thread = threading.Thread(target=self.run, name='telemetry', daemon=True)
+           self.thread.start()
+       return telemetry
+
+   def run(self):
+       while True:
+           with self.lock:
+               remotes = list(self.telemetry.values())
+           for telemetry in remotes:
+               try:
+                   telemetry.sync(self.client)
+               except (OSError, rpc.RpcError):
+                   pass
+           time.sleep(self.interval)
+
+class RemoteBackend:
+   # Same call surface the GUI used on the backend module, every call goes to the daemon
+   def __init__(self, client=None):
+       self.client = client or Client()
+       self.telemetry = RemoteTelemetryMonitor(self.client)
+       self.followers = {}
+
+   def call(self, method, *args, task=None, timeout=False):
+       return self.client.call(method, *args, progress=task.progress if task is not None else None, timeout=timeout)
+
+   def attach(self, server, handler):
+       follower = self.followers[server] = LogFollower(self.client, server, handler)
+       follower.start()
+       return handler
+
+   def servers(self):
+       return self.call('servers')
+
+   def status(self, server=None):
+       return self.call('status', server)
+
+   def start(self, server):
+       return self.call('start', server)
+
+   def stop(self, server=None):
+       return self.call('stop', server)
+
+   def stop_all(self):
+       return self.call('stop_all')
+
+   def restart(self, server):
+       return self.call('restart', server)
+
+   def command(self, server, command):
+       return self.call('command', server, command)
+
+   def create(self, server, type='paper', task=None):
+       return self.call('create', server, type, task=task)
+
+   def update(self, server, type='paper', backup_all=False, task=None):
+       return self.call('update', server, type, backup_all, task=task)
+
+   def downloadPlayit(self, server, task=None):
+       return self.call('downloadPlayit', server, task=task)
+
+   def bedrock(self, server, task=None):
+       return self.call('bedrock', server, task=task)
+
+   def launchCommand(self, server):
+       return self.call('launchCommand', server)
+
+   def isolationMode(self):
+       return self.call('isolationMode')
+
+   def schedule(self, server):
+       return self.call('schedule', server)
+
+   def runScheduled(self, server, job):
+       return self.call('runScheduled', server, job)
+
+   def config(self, server):
+       return self.call('config', server)
+
+   def configure(self, server, changes):
+       return self.call('configure', server, changes)
+
+   def saveProperties(self, server, changes):
+       return self.call('saveProperties', server, changes)
+
+   def installChunky(self, server, task=None):
+       return self.call('installChunky', server, task=task)
+
+   def pregenerate(self, server, radius, center_x=0, center_z=0, world='world', mode=None, pause_for_players=False):
+       return self.call('pregenerate', server, radius, center_x, center_z, world, mode, pause_for_players)
+
+   def pregenPause(self, server):
+       return self.call('pregenPause', server)
+
+   def pregenResume(self, server):
+       return self.call('pregenResume', server)
+
+   def pregenCancel(self, server):
+       return self.call('pregenCancel', server)
+
+   def pregenStatus(self, server):
+       return self.call('pregenStatus', server)
@@ -0,0 +1,223 @@
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import cron
+
+DELAY = 0.5
+FILENAME = 'backend.json'
+
+# Older files store numbers and flags as strings, loading converts them so callers only ever see these types
+SCHEMA = {
+   'version': (str, None),
+   'minimum': (int, 1024),
+   'maximum': (int, 2048),
+   'playit': (bool, False),
+   'bedrock': (bool, False),
+   'chunky': (bool, False),
+   'auto_restart': (bool, True),
+   'jvm': (dict, {}),
+   'limits': (dict, {}),
+   'pregen': (dict, {}),
+   'schedule': (dict, {}),
+}
+SCHEDULED = ('restart', 'backup', 'update')
+# Numbers in the limits section, checked here so isolation never multiplies a string
+LIMITS = {'cpus': float, 'memory': int, 'nice': int, 'io_level': int}
+
+class ConfigError(ValueError):
+   pass
+
+def coerce(key, value):
+   kind, default = SCHEMA.get(key, (None, None))
+   if kind is None or value is None or isinstance(value, kind) and not (kind is int and isinstance(value, bool)):
+       return value
+   if kind is bool:
+       if isinstance(value, str) and value.strip().lower() in ('true', 'false', '1', '0', 'yes', 'no'):
+           return value.strip().lower() in ('true', '1', 'yes')
+       if isinstance(value, int):
+           return bool(value)
+   elif kind is int:
+       try:
+           return int(str(value).strip())
+       except ValueError:
+           pass
+   elif kind is str:
+       return str(value)
+   raise ConfigError(f'{key} must be {kind.__name__}, got {value!r}')
+
+def validate(data):
+   data = {key: coerce(key, value) for key, value in data.items()}
+   for key, (kind, default) in SCHEMA.items():
+       if key not in data:
+           data[key] = copy.deepcopy(default)
+   for key in ('minimum', 'maximum'):
+       if data[key] <= 0:
+           raise ConfigError(f'{key} must be a positive number of MB, got {data[key]}')
+   limits = data['limits']
+   for key, kind in LIMITS.items():
+       value = limits.get(key)
+       if value is None:
+           continue
+       try:
+           if isinstance(value, bool):
+               raise ValueError
+           limits[key] = kind(str(value).strip()) if isinstance(value, str) else kind(value)
+       except ValueError:
+           raise ConfigError(f'limits {key} must be a number, got {value!r}')
+       if key in ('cpus', 'memory') and limits[key] < 0:
+           raise ConfigError(f'limits {key} must not be negative, got {value!r}')
+   cores = limits.get('cores')
+   if isinstance(cores, str) and cores.strip().isdigit():
+       limits['cores'] = int(cores)
+   elif not (cores is None or isinstance(cores, int) and not isinstance(cores, bool) or isinstance(cores, list) and all(isinstance(cpu, int) for cpu in cores)):
+       raise ConfigError(f'limits cores must be a number of cores or a list of CPUs, got {cores!r}')
+   for key in SCHEDULED:
+       expression = data['schedule'].get(key)
+       if expression:
+           try:
+               cron.parse(expression).next(time.time())
+           except ValueError as e:
+               raise ConfigError(f'schedule {key}: {e}')
+   warnings = data['schedule'].get('warnings', [])
+   if not isinstance(warnings, list) or not all(isinstance(seconds, int) and not isinstance(seconds, bool) and seconds > 0 for seconds in warnings):
+       raise ConfigError(f'schedule warnings must be a list of seconds, got {warnings!r}')
+   return data
+
+def read(path):
+   with open(path, 'r') as file:
+       return validate(json.load(file))
+
+def write(path, data):
+   # Written next to the target and renamed over it, a crash leaves either the old or the new file, never half of one
+   handle, temp = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', dir=os.path.dirname(path))
+   try:
+       with os.fdopen(handle, 'w') as file:
+           json.dump(data, file, indent=4)
+           file.flush()
+           os.fsync(file.fileno())
+       os.replace(temp, path)
+   except BaseException:
+       if os.path.exists(temp):
+           os.unlink(temp)
+       raise
+
+class ServerConfig:
+   def __init__(self, server, path, delay=DELAY):
+       self.server = server
+       self.path = path
+       self.delay = delay
+       self.lock = threading.RLock()
+       self.listeners = []
+       self.timer = None
+       self.dirty = False
+       self.data = read(path)
+
+   def __getitem__(self, key):
+       with self.lock:
+           return copy.deepcopy(self.data[key])
+
+   def get(self, key, default=None):
+       with self.lock:
+           return copy.deepcopy(self.data.get(key, default))
+
+   def snapshot(self):
+       with self.lock:
+           return copy.deepcopy(self.data)
+
+   def subscribe(self, listener):
+       self.listeners.append(listener)
+
+   def update(self, changes):
+       # Dict valued keys (jvm, limits) are merged so one setting can change without resending its section
+       with self.lock:
+           data = copy.deepcopy(self.data)
+           for key, value in changes.items():
+               if isinstance(value, dict) and isinstance(data.get(key), dict):
+                   data[key].update(value)
+               else:
+                   data[key] = value
+           data = validate(data)
+           changed = {key: data[key] for key in changes if data.get(key) != self.data.get(key)}
+           if not changed:
+               return {}
+           self.data = data
+           self.schedule()
+
+       for listener in list(self.listeners):
+           try:
+               listener(self.server, changed)
+           except Exception as e:
+               logging.error(f'Config listener for {self.server} failed: {e}')
+       return changed
+
+   def set(self, key, value):
+       return self.update({key: value})
+
+   def schedule(self):
+       # Every change within the delay lands in one write
+       self.dirty = True
+       if self.timer is not None:
+           self.timer.cancel()
+       self.timer = threading.Timer(self.delay, self.flush)
+       self.timer.daemon = True
+       self.timer.start()
+
+   def flush(self):
+       with self.lock:
+           if self.timer is not None:
+               self.timer.cancel()
+               self.timer = None
+           if not self.dirty:
+               return
+           data = copy.deepcopy(self.data)
+           self.dirty = False
+           try:
+               write(self.path, data)
+           except OSError as e:
+               self.dirty = True
+               logging.error(f'Could not save {self.path}: {e}')
+
+class ConfigStore:
+   def __init__(self, root=None, delay=DELAY):
+       self.root = root
+       self.delay = delay
+       self.configs = {}
+       self.listeners = []
+       self.lock = threading.Lock()
+
+   def path(self, server):
+       return os.path.join(self.root or os.getcwd(), server, FILENAME)
+
+   def get(self, server):
+       with self.lock:
+           config = self.configs.get(server)
+           if config is None:
+               config = self.configs[server] = ServerConfig(server, self.path(server), self.delay)
+               for listener in self.listeners:
+                   config.subscribe(listener)
+           return config
+
+   def create(self, server, data):
+       path = self.path(server)
+       write(path, validate(data))
+       with self.lock:
+           self.configs.pop(server, None)
+       return self.get(server)
+
+   def subscribe(self, listener):
+       with self.lock:
+           self.listeners.append(listener)
+           configs = list(self.configs.values())
+       for config in configs:
+           config.subscribe(listener)
+
+   def flush(self):
+       with self.lock:
+           configs = list(self.configs.values())
+       for config in configs:
+           config.flush()
@@ -0,0 +1,94 @@
+import datetime
+
+# minute hour day-of-month month day-of-week, the usual crontab order and ranges
+FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+NAMES = {
+   'month': ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'],
+   'weekday': ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'],
+}
+ALIASES = {
+   '@hourly': '0 * * * *',
+   '@daily': '0 0 * * *',
+   '@midnight': '0 0 * * *',
+   '@weekly': '0 0 * * 0',
+   '@monthly': '0 0 1 * *',
+   '@yearly': '0 0 1 1 *',
+   '@annually': '0 0 1 1 *',
+}
+# Far enough for any expression that can match at all, 29 February on a Monday recurs within 28 years
+HORIZON = 366 * 28
+
+def value(text, name):
+   names = NAMES.get(name)
+   if names and text.lower() in names:
+       return names.index(text.lower()) + (1 if name == 'month' else 0)
+   try:
+       return int(text)
+   except ValueError:
+       raise ValueError(f'{name}: {text!r} is not a number')
+
+def field(text, name, low, high):
+   values = set()
+   for part in text.split(','):
+       step = 1
+       if '/' in part:
+           part, step = part.split('/', 1)
+           step = value(step, name)
+           if step < 1:
+               raise ValueError(f'{name}: step must be at least 1')
+       if part == '*':
+           start, end = low, high
+       elif '-' in part:
+           start, end = (value(bound, name) for bound in part.split('-', 1))
+       else:
+           start = value(part, name)
+           end = high if step > 1 else start
+       if not low <= start <= end <= high:
+           raise ValueError(f'{name}: {part} is outside {low}-{high}')
+       values.update(range(start, end + 1, step))
+   if name == 'weekday' and 7 in values:
+       values.discard(7)
+       values.add(0)
+   return frozenset(values)
+
+class Cron:
+   def __init__(self, expression):
+       self.expression = expression.strip()
+       text = ALIASES.get(self.expression.lower(), self.expression)
+       parts = text.split()
+       if len(parts) != len(FIELDS):
+           raise ValueError(f'{expression!r} needs {len(FIELDS)} fields: minute hour day month weekday')
+       self.minutes, self.hours, self.days, self.months, self.weekdays = (field(part, name, low, high) for part, (name, low, high) in zip(parts, FIELDS))
+       # As in crontab, a restricted day of month and day of week match either one
+       self.any_day = parts[2] == '*'
+       self.any_weekday = parts[4] == '*'
+
+   def day_matches(self, date):
+       day = date.day in self.days
+       weekday = date.isoweekday() % 7 in self.weekdays
+       if self.any_day or self.any_weekday:
+           return day and weekday
+       return day or weekday
+
+   def matches(self, moment):
+       return moment.minute in self.minutes and moment.hour in self.hours and moment.month in self.months and self.day_matches(moment)
+
+   def next(self, after):
+       # Local wall clock time, the first whole minute strictly after the given epoch seconds
+       moment = datetime.datetime.fromtimestamp(after).replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+       date = moment.date()
+       for _ in range(HORIZON):
+           if date.month in self.months and self.day_matches(date):
+               for hour in sorted(self.hours):
+                   for minute in sorted(self.minutes):
+                       candidate = datetime.datetime.combine(date, datetime.time(hour, minute))
+                       if candidate >= moment:
+                           return candidate.timestamp()
+           date += datetime.timedelta(days=1)
+       raise ValueError(f'{self.expression!r} never matches')
+
+   def __repr__(self):
+       return f'Cron({self.expression!r})'
+
+def parse(expression):
+   return Cron(expression)
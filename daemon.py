@@ -0,0 +1,229 @@
+import argparse
+import logging
+import os
+import queue
+import select
+import signal
+import socket
+import socketserver
+import threading
+
+import rpc
+import serverlog
+
+class StreamHandler(logging.Handler):
+   def __init__(self):
+       logging.Handler.__init__(self)
+       self.lines = queue.Queue()
+
+   def emit(self, record):
+       try:
+           self.lines.put(self.format(record))
+       except Exception:
+           self.handleError(record)
+
+class RemoteTask:
+   # Stands in for the GUI task object, progress goes back over the socket and a closed socket cancels the call
+   def __init__(self, connection, id):
+       self.connection = connection
+       self.id = id
+
+   def progress(self, percent, message=''):
+       try:
+           self.connection.send(rpc.notification('progress', {'id': self.id, 'percent': percent, 'message': message}))
+       except OSError:
+           raise rpc.Cancelled('Client went away')
+
+   def check(self):
+       pass
+
+class Connection(socketserver.StreamRequestHandler):
+   def handle(self):
+       for line in self.rfile:
+           if not line.strip():
+               continue
+           id = None
+           message = None
+           try:
+               message = rpc.decode(line)
+               id = message.get('id')
+               method = message['method']
+               params = message.get('params') or []
+               if method == 'logs':
+                   self.logs(id, **params) if isinstance(params, dict) else self.logs(id, *params)
+                   return
+               value = self.server.daemon.call(method, params, RemoteTask(self, id))
+               self.send(rpc.result(id, value))
+           except rpc.Cancelled:
+               return
+           except Exception as e:
+               logging.exception(f'RPC call {message.get("method") if isinstance(message, dict) else line!r} failed')
+               try:
+                   self.send(rpc.error(id, e))
+               except OSError:
+                   return
+
+   def send(self, data):
+       self.wfile.write(data)
+       self.wfile.flush()
+
+   def closed(self):
+       readable, _, _ = select.select([self.connection], [], [], 0)
+       return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+
+   def logs(self, id, server, lines=100, follow=True):
+       handler = StreamHandler()
+       # Attach before reading the history so nothing logged in between is lost
+       if follow:
+           serverlog.attach(server, handler)
+       try:
+           store = serverlog.history(server)
+           for line in store.tail(lines) if store is not None and lines else []:
+               self.send(rpc.notification('log', {'server': server, 'line': line}))
+           if not follow:
+               self.send(rpc.result(id, None))
+           while follow:
+               try:
+                   line = handler.lines.get(timeout=1)
+               except queue.Empty:
+                   if self.closed():
+                       return
+                   continue
+               self.send(rpc.notification('log', {'server': server, 'line': line}))
+       except OSError:
+           return
+       finally:
+           if follow:
+               serverlog.detach(server, handler)
+
+class Daemon:
+   def __init__(self, path=None, metrics=None):
+       self.path = rpc.address(path)
+       self.metrics = metrics
+       self.backend = None
+       self.server = None
+
+   def methods(self):
+       backend = self.backend
+       return {
+           'servers': backend.servers,
+           'status': backend.status,
+           'start': backend.start,
+           'stop': backend.stop,
+           'stop_all': backend.stop_all,
+           'restart': backend.restart,
+           'command': backend.command,
+           'create': backend.create,
+           'update': backend.update,
+           'downloadPlayit': backend.downloadPlayit,
+           'bedrock': backend.bedrock,
+           'backup': backend.backup,
+           'hot_backup': backend.hotBackup,
+           'archive': backend.archive,
+           'restore': backend.restore,
+           'crashes': backend.crashes,
+           'search': backend.search,
+           'between': backend.between,
+           'levels': backend.levels,
+           'schedule': backend.schedule,
+           'runScheduled': backend.runScheduled,
+           'launchCommand': backend.launchCommand,
+           'isolationMode': backend.isolationMode,
+           'config': backend.config,
+           'configure': backend.configure,
+           'saveProperties': backend.saveProperties,
+           'installChunky': backend.installChunky,
+           'pregenerate': backend.pregenerate,
+           'pregenPause': backend.pregenPause,
+           'pregenResume': backend.pregenResume,
+           'pregenCancel': backend.pregenCancel,
+           'pregenStatus': backend.pregenStatus,
+           'telemetry': self.telemetry,
+           'shutdown': self.shutdown,
+       }
+
+   def telemetry(self, server, since=0):
+       series = self.backend.telemetry.get(server).series
+       return {name: values.since(since) for name, values in series.items()}
+
+   def call(self, method, params, task):
+       function = self.methods().get(method)
+       if function is None:
+           raise rpc.RpcError(f'Unknown method {method}')
+       args, kwargs = (params, {}) if isinstance(params, list) else ([], dict(params))
+       if method in ('create', 'update', 'downloadPlayit', 'bedrock', 'installChunky'):
+           kwargs['task'] = task
+       return function(*args, **kwargs)
+
+   def bind(self):
+       if isinstance(self.path, tuple):
+           # Loopback TCP where there are no Unix sockets, a second daemon fails to bind the port
+           self.server = socketserver.ThreadingTCPServer(self.path, Connection, bind_and_activate=False)
+           self.server.daemon_threads = True
+           self.server.daemon = self
+           try:
+               self.server.server_bind()
+           except OSError as e:
+               self.server.server_close()
+               raise RuntimeError(f'Could not listen on {rpc.describe(self.path)}, is a daemon already running? {e}')
+           self.server.server_activate()
+           return
+
+       if os.path.exists(self.path):
+           probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+           try:
+               probe.connect(self.path)
+               raise RuntimeError(f'A daemon is already listening on {self.path}')
+           except (ConnectionRefusedError, FileNotFoundError):
+               os.unlink(self.path)
+           finally:
+               probe.close()
+
+       self.server = socketserver.ThreadingUnixStreamServer(self.path, Connection, bind_and_activate=False)
+       self.server.daemon_threads = True
+       self.server.daemon = self
+       # Only the user running the servers may talk to them
+       old = os.umask(0o177)
+       try:
+           self.server.server_bind()
+       finally:
+           os.umask(old)
+       self.server.server_activate()
+
+   def serve(self):
+       self.bind()
+       import backend
+       self.backend = backend
+       if self.metrics:
+           backend.start_metrics(*self.metrics)
+       logging.info(f'Daemon listening on {rpc.describe(self.path)}')
+       try:
+           self.server.serve_forever()
+       finally:
+           self.server.server_close()
+           if not isinstance(self.path, tuple) and os.path.exists(self.path):
+               os.unlink(self.path)
+           logging.info('Daemon stopping all servers')
+           backend.scheduler.stop()
+           backend.stop_all()
+           backend.configs.flush()
+
+   def shutdown(self, *args):
+       # serve_forever() has to be stopped from another thread
+       if self.server is not None:
+           threading.Thread(target=self.server.shutdown, name='shutdown').start()
+
+def main(argv=None):
+   parser = argparse.ArgumentParser(description='Minecraft Server Manager daemon')
+   parser.add_argument('--socket', default=None)
+   parser.add_argument('--metrics-port', type=int, default=int(os.environ.get('MSM_METRICS_PORT', 0)) or None)
+   parser.add_argument('--metrics-host', default=os.environ.get('MSM_METRICS_HOST', '127.0.0.1'))
+   args = parser.parse_args(argv)
+
+   daemon = Daemon(args.socket, (args.metrics_port, args.metrics_host) if args.metrics_port else None)
+   signal.signal(signal.SIGTERM, daemon.shutdown)
+   signal.signal(signal.SIGINT, daemon.shutdown)
+   daemon.serve()
+
+if __name__ == '__main__':
+   main()
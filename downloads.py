@@ -0,0 +1,71 @@
+import concurrent.futures
+import logging
+import os
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CHUNK_SIZE = 1024 * 1024
+AGENT = "cool-project/1.0.0 (contact@me.com)"
+
+class Downloader:
+   def __init__(self, workers=8, chunk_size=CHUNK_SIZE, timeout=30):
+       self.chunk_size = chunk_size
+       self.timeout = timeout
+
+       # One keep-alive pool shared by every download and API call
+       self.session = requests.Session()
+       self.session.headers['User-Agent'] = AGENT
+       adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=3)
+       self.session.mount('http://', adapter)
+       self.session.mount('https://', adapter)
+
+       self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='download')
+       self.lock = threading.Lock()
+       self.downloaded = 0
+
+   def fetch(self, url, dest, log=logging):
+       directory = os.path.dirname(dest)
+       os.makedirs(directory, exist_ok=True)
+
+       log.info(f"Downloading from {url}")
+       with self.session.get(url, stream=True, timeout=self.timeout) as response:
+           response.raise_for_status()
+
+           # Write next to the target so the final rename is atomic and never crosses filesystems
+           with tempfile.NamedTemporaryFile(dir=directory, prefix=f'.{os.path.basename(dest)}.', suffix='.part', delete=False) as temp:
+               try:
+                   for chunk in response.iter_content(chunk_size=self.chunk_size):
+                       temp.write(chunk)
+                       with self.lock:
+                           self.downloaded += len(chunk)
+                   temp.flush()
+                   os.fsync(temp.fileno())
+               except BaseException:
+                   temp.close()
+                   os.remove(temp.name)
+                   raise
+
+       os.replace(temp.name, dest)
+       log.info(f'Downloaded {os.path.basename(dest)}')
+       return dest
+
+   def submit(self, url, dest, log=logging):
+       return self.pool.submit(self.fetch, url, dest, log)
+
+   def fetch_all(self, downloads, log=logging):
+       futures = {self.submit(url, dest, log): dest for dest, url in downloads.items()}
+       failed = None
+       for future in concurrent.futures.as_completed(futures):
+           try:
+               future.result()
+           except Exception as e:
+               log.error(f'Failed to download {os.path.basename(futures[future])}: {e}')
+               failed = failed or e
+       if failed is not None:
+           raise failed
+       return list(futures.values())
+
+downloader = Downloader()
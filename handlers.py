@@ -1,20 +1,55 @@
+import collections
 import logging
 from PySide6.QtWidgets import QTextEdit
-from PySide6.QtCore import QObject, Signal
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtGui import QTextCursor
 
 class QTextEditLogHandler(logging.Handler, QObject):
-   new_log = Signal(str)
-
-   def __init__(self, text_edit: QTextEdit):
+   def __init__(self, text_edit: QTextEdit, interval=75, max_lines=5000):
        logging.Handler.__init__(self)
        QObject.__init__(self)
        self.text_edit = text_edit
-       self.new_log.connect(self.append_text)
+       self.text_edit.document().setMaximumBlockCount(max_lines)
+
+       # Records arrive from reader threads, only the timer touches the widget
+       self.pending = collections.deque(maxlen=max_lines)
+
+       self.timer = QTimer(self)
+       self.timer.setInterval(interval)
+       self.timer.timeout.connect(self.append_pending)
+       self.timer.start()
 
    def emit(self, record):
-       msg = self.format(record)
-       self.new_log.emit(msg)
+       try:
+           self.pending.append(self.format(record))
+       except Exception:
+           self.handleError(record)
+
+   def append_pending(self):
+       if not self.pending:
+           return
+
+       lines = []
+       while self.pending:
+           lines.append(self.pending.popleft())
+
+       scrollbar = self.text_edit.verticalScrollBar()
+       at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+
+       cursor = QTextCursor(self.text_edit.document())
+       cursor.movePosition(QTextCursor.MoveOperation.End)
+       if not self.text_edit.document().isEmpty():
+           cursor.insertBlock()
+       cursor.insertText('\n'.join(lines))
+
+       if at_bottom:
+           scrollbar.setValue(scrollbar.maximum())
 
-   def append_text(self, msg):
-       self.text_edit.append(msg)
-       self.text_edit.verticalScrollBar().setValue(self.text_edit.verticalScrollBar().maximum())
+   def close(self):
+       # logging shuts handlers down at exit, possibly after Qt already deleted the widgets
+       try:
+           self.timer.stop()
+           self.append_pending()
+       except RuntimeError:
+           pass
+       logging.Handler.close(self)
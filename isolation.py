@@ -0,0 +1,184 @@
+import glob
+import logging
+import math
+import os
+import shutil
+import threading
+
+CGROUP = '/sys/fs/cgroup'
+PERIOD = 100000
+PREFIX = 'msm-'
+# Leaf cgroup the manager moves itself into, so its parent can enable controllers for the server cgroups
+LEAF = 'manager'
+
+DEFAULTS = {'cpus': None, 'memory': None, 'cores': None, 'nice': 0, 'io_class': None, 'io_level': 4}
+IO_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+
+base_lock = threading.Lock()
+base_checked = False
+base_path = None
+
+def options(data):
+   return {**DEFAULTS, **data.get('limits', {})}
+
+def lowest_nice():
+   # Raising priority needs root (or CAP_SYS_NICE), for anyone else os.nice() fails in the child and the server never starts
+   return -20 if hasattr(os, 'geteuid') and os.geteuid() == 0 else 0
+
+def own_cgroup():
+   try:
+       with open('/proc/self/cgroup', 'r') as file:
+           for line in file:
+               if line.startswith('0::'):
+                   return line[3:].strip()
+   except OSError:
+       pass
+   return None
+
+def cgroup_base():
+   # Only a delegated cgroup v2 subtree works, a manager launched from a plain login shell usually gets the fallback
+   global base_checked, base_path
+   with base_lock:
+       if not base_checked:
+           base_path = delegate()
+           base_checked = True
+       return base_path
+
+def delegate():
+   path = own_cgroup()
+   if path is None or not os.path.exists(os.path.join(CGROUP, 'cgroup.controllers')):
+       return None
+   base = os.path.join(CGROUP, path.lstrip('/'))
+   if os.path.basename(base) == LEAF:
+       base = os.path.dirname(base)
+   try:
+       with open(os.path.join(base, 'cgroup.controllers'), 'r') as file:
+           available = file.read().split()
+       if 'cpu' not in available or 'memory' not in available:
+           return None
+       with open(os.path.join(base, 'cgroup.subtree_control'), 'r') as file:
+           enabled = file.read().split()
+       if 'cpu' not in enabled or 'memory' not in enabled:
+           # No internal processes: a cgroup that hands controllers to children may not hold processes itself, the manager moves to a leaf first
+           leaf = os.path.join(base, LEAF)
+           os.makedirs(leaf, exist_ok=True)
+           write(os.path.join(leaf, 'cgroup.procs'), os.getpid())
+           with open(os.path.join(base, 'cgroup.procs'), 'r') as file:
+               others = file.read().split()
+           if others:
+               # Only our own process is ours to move, a shell or service sharing the cgroup keeps it from delegating
+               logging.warning(f'Isolation: cgroup {base} also holds processes {", ".join(others)}, cgroup limits are off. Run the manager in a cgroup of its own, e.g. systemd-run --user --scope -p Delegate=yes')
+               return None
+           write(os.path.join(base, 'cgroup.subtree_control'), '+cpu +memory')
+   except OSError as e:
+       logging.info(f'Isolation: cgroup v2 controllers not available, using affinity and nice: {e}')
+       return None
+   return base
+
+def mode():
+   if cgroup_base() is not None:
+       return 'cgroup v2'
+   if hasattr(os, 'sched_setaffinity'):
+       return 'affinity and nice'
+   return 'unavailable'
+
+def topology():
+   # Logical CPUs grouped by physical core, so pinning never splits SMT siblings between servers
+   allowed = os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else set(range(os.cpu_count() or 1))
+   cores = {}
+   for path in glob.glob('/sys/devices/system/cpu/cpu[0-9]*/topology/core_id'):
+       cpu = int(path.split('/')[-3][3:])
+       if cpu not in allowed:
+           continue
+       try:
+           with open(path, 'r') as file:
+               core = int(file.read())
+           with open(path.replace('core_id', 'physical_package_id'), 'r') as file:
+               package = int(file.read())
+       except (OSError, ValueError):
+           core, package = cpu, 0
+       cores.setdefault((package, core), []).append(cpu)
+   if not cores:
+       return [[cpu] for cpu in sorted(allowed)]
+   return [sorted(cpus) for _, cpus in sorted(cores.items())]
+
+def assign_cores(cores, index=0, groups=None):
+   groups = groups or topology()
+   if isinstance(cores, list):
+       return sorted(cores)
+   count = min(max(int(cores), 1), len(groups))
+   # Servers take consecutive blocks of physical cores, counting down from the last so core 0 stays free for the OS
+   start = (len(groups) - count * (index + 1)) % len(groups)
+   chosen = [groups[(start + i) % len(groups)] for i in range(count)]
+   return sorted(cpu for group in chosen for cpu in group)
+
+def write(path, value):
+   with open(path, 'w') as file:
+       file.write(str(value))
+
+def create_cgroup(server, settings, base):
+   path = os.path.join(base, f'{PREFIX}{server}')
+   os.makedirs(path, exist_ok=True)
+   write(os.path.join(path, 'cpu.max'), f"{int(settings['cpus'] * PERIOD)} {PERIOD}" if settings['cpus'] else f'max {PERIOD}')
+   write(os.path.join(path, 'memory.max'), int(settings['memory']) * 1048576 if settings['memory'] else 'max')
+   return path
+
+def remove_cgroup(server, log=logging):
+   # Only looks at the base found when the server was started, never sets up delegation just to clean up
+   if base_path is None:
+       return
+   path = os.path.join(base_path, f'{PREFIX}{server}')
+   try:
+       os.rmdir(path)
+   except FileNotFoundError:
+       pass
+   except OSError as e:
+       log.warning(f'Isolation: could not remove cgroup {path}: {e}')
+
+def prepare(server, data, index=0, log=logging):
+   settings = options(data)
+   prefix = []
+   procs = None
+   cpus = None
+
+   cores = settings['cores']
+   base = cgroup_base() if settings['cpus'] or settings['memory'] else None
+   if base is not None:
+       try:
+           procs = os.path.join(create_cgroup(server, settings, base), 'cgroup.procs')
+           log.info(f'Isolation: {server} runs in cgroup {os.path.dirname(procs)}')
+       except OSError as e:
+           log.warning(f'Isolation: could not set up a cgroup for {server}, falling back to affinity: {e}')
+           base = None
+   if base is None and settings['cpus'] and cores is None:
+       cores = math.ceil(settings['cpus'])
+   if base is None and settings['memory']:
+       log.warning(f'Isolation: memory limit for {server} needs cgroup v2, only the JVM heap limit applies')
+
+   if cores and hasattr(os, 'sched_setaffinity'):
+       cpus = assign_cores(cores, index)
+       log.info(f'Isolation: {server} pinned to CPUs {",".join(map(str, cpus))}')
+
+   nice = int(settings['nice'] or 0)
+   if settings['io_class'] in IO_CLASSES and shutil.which('ionice'):
+       prefix = ['ionice', '-c', str(IO_CLASSES[settings['io_class']])]
+       if settings['io_class'] != 'idle':
+           prefix += ['-n', str(settings['io_level'])]
+
+   if procs is None and cpus is None and not nice:
+       return prefix, None
+
+   # Runs in the forked child before exec, only plain syscalls so no lock held by another thread can deadlock it
+   def preexec():
+       if procs is not None:
+           fd = os.open(procs, os.O_WRONLY)
+           try:
+               os.write(fd, b'0')
+           finally:
+               os.close(fd)
+       if cpus is not None:
+           os.sched_setaffinity(0, cpus)
+       if nice:
+           os.nice(nice)
+
+   return prefix, preexec
@@ -0,0 +1,93 @@
+import os
+
+from telemetry import GC_LOG
+
+# https://docs.papermc.io/paper/aikars-flags
+AIKAR = [
+   '-XX:+UseG1GC',
+   '-XX:+ParallelRefProcEnabled',
+   '-XX:MaxGCPauseMillis=200',
+   '-XX:+UnlockExperimentalVMOptions',
+   '-XX:+DisableExplicitGC',
+   '-XX:G1NewSizePercent={new}',
+   '-XX:G1MaxNewSizePercent={max_new}',
+   '-XX:G1HeapRegionSize={region}M',
+   '-XX:G1ReservePercent={reserve}',
+   '-XX:G1HeapWastePercent=5',
+   '-XX:G1MixedGCCountTarget=4',
+   '-XX:InitiatingHeapOccupancyPercent={occupancy}',
+   '-XX:G1MixedGCLiveThresholdPercent=90',
+   '-XX:G1RSetUpdatingPauseTimePercent=5',
+   '-XX:SurvivorRatio=32',
+   '-XX:+PerfDisableSharedMem',
+   '-XX:MaxTenuringThreshold=1',
+   '-Dusing.aikars.flags=https://mcflags.emc.gs',
+   '-Daikars.new.flags=true',
+]
+
+PROFILES = {
+   'default': [],
+   'aikar': AIKAR,
+   'zgc': ['-XX:+UseZGC', '-XX:+ZGenerational', '-XX:+DisableExplicitGC'],
+   'shenandoah': ['-XX:+UseShenandoahGC', '-XX:+DisableExplicitGC'],
+}
+
+# Servers without a jvm section keep the plain flags they were created with, new servers opt into RECOMMENDED
+DEFAULTS = {'profile': 'default', 'java': 'java', 'pretouch': False, 'large_pages': False, 'auto_heap': False, 'extra': []}
+RECOMMENDED = {'profile': 'aikar', 'pretouch': True}
+
+MINIMUM_HEAP = 1024
+# Off-heap memory (metaspace, threads, direct buffers) the JVM needs on top of -Xmx
+OVERHEAD = 1024
+
+def host_memory():
+   try:
+       return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 1048576
+   except (AttributeError, ValueError, OSError):
+       return None
+
+def auto_heap(servers=1, total=None):
+   total = total or host_memory()
+   if not total:
+       return None
+   # Leave the larger of 2 GB or 15 % for the OS and page cache, split the rest between co-hosted servers
+   available = total - max(2048, total * 15 // 100)
+   heap = available // max(servers, 1) - OVERHEAD
+   return max(MINIMUM_HEAP, heap // 256 * 256)
+
+def options(data):
+   return {**DEFAULTS, **data.get('jvm', {})}
+
+def heap(data, servers=1):
+   settings = options(data)
+   if settings['auto_heap']:
+       size = auto_heap(servers)
+       if size:
+           return size, size
+   maximum = int(data['maximum'])
+   return min(int(data['minimum']), maximum), maximum
+
+def flags(profile, maximum):
+   large = maximum >= 12 * 1024
+   values = {
+       'new': 40 if large else 30,
+       'max_new': 50 if large else 40,
+       'region': 16 if large else 8,
+       'reserve': 15 if large else 20,
+       'occupancy': 20 if large else 15,
+   }
+   return [flag.format(**values) for flag in PROFILES.get(profile, [])]
+
+def command(server, data, directory, servers=1):
+   settings = options(data)
+   minimum, maximum = heap(data, servers)
+
+   args = [settings['java'] or 'java', f'-Xms{minimum}M', f'-Xmx{maximum}M']
+   args += flags(settings['profile'], maximum)
+   if settings['pretouch']:
+       args.append('-XX:+AlwaysPreTouch')
+   if settings['large_pages']:
+       args.append('-XX:+UseLargePages')
+   args += list(settings['extra'])
+   args += [f'-Xlog:gc:file={GC_LOG}:uptime,level,tags:filecount=5,filesize=10m', '-jar', os.path.join(directory, f'{server}.jar'), 'nogui']
+   return args
@@ -0,0 +1,248 @@
+import bisect
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+
+# One index entry per written batch plus one per further warning/error line: (created, byte offset, level)
+ENTRY = struct.Struct('<dQB')
+
+LEVEL = re.compile(rb'^(?:\[[^\]]*\] )?\[[^\]]*?(WARN|ERROR|FATAL|SEVERE)\]')
+LEVELS = {b'WARN': logging.WARNING, b'ERROR': logging.ERROR, b'SEVERE': logging.ERROR, b'FATAL': logging.CRITICAL}
+
+class IndexView:
+   def __init__(self, buffer):
+       self.buffer = buffer
+       self.length = len(buffer) // ENTRY.size
+
+   def __len__(self):
+       return self.length
+
+   def __getitem__(self, position):
+       return ENTRY.unpack_from(self.buffer, position * ENTRY.size)
+
+class LogStore:
+   # Rolled like manager.log, the .log and .idx of a segment always move together and searches run over every segment
+   def __init__(self, directory, name='history', max_bytes=50 * 1024 * 1024, backups=10):
+       self.path = os.path.join(directory, f'{name}.log')
+       self.index_path = os.path.join(directory, f'{name}.idx')
+       self.max_bytes = max_bytes
+       self.backups = backups
+       self.lock = threading.Lock()
+       self.data = None
+       self.index = None
+
+   def segments(self):
+       # Oldest first, the live segment last
+       rolled = [(f'{self.path}.{n}', f'{self.index_path}.{n}') for n in range(self.backups, 0, -1)]
+       return [paths for paths in rolled + [(self.path, self.index_path)] if os.path.exists(paths[0])]
+
+   def rollover(self):
+       self.data.close()
+       self.index.close()
+       for path in (self.path, self.index_path):
+           if self.backups == 0:
+               os.remove(path)
+               continue
+           for n in range(self.backups - 1, 0, -1):
+               if os.path.exists(f'{path}.{n}'):
+                   os.replace(f'{path}.{n}', f'{path}.{n + 1}')
+           os.replace(path, f'{path}.1')
+
+   def append(self, created, text, level=logging.INFO):
+       lines = [line.encode('utf-8', errors='replace') for line in text.split('\n') if line]
+       if not lines:
+           return
+
+       with self.lock:
+           if self.data is None:
+               self.data = open(self.path, 'ab')
+               self.index = open(self.index_path, 'ab')
+           if self.max_bytes and self.data.tell() >= self.max_bytes:
+               self.rollover()
+               self.data = open(self.path, 'ab')
+               self.index = open(self.index_path, 'ab')
+
+           # Every line is indexed at most once: the batch entry covers the first line, the others get an
+           # entry only when they are warnings or errors, by the record's level or the level the line shows
+           entries = []
+           position = self.data.tell()
+           for number, line in enumerate(lines):
+               match = LEVEL.match(line)
+               levelno = max(level, LEVELS[match.group(1)] if match else logging.NOTSET)
+               if number == 0 or levelno >= logging.WARNING:
+                   entries.append(ENTRY.pack(created, position, levelno))
+               position += len(line) + 1
+
+           self.data.write(b'\n'.join(lines) + b'\n')
+           self.index.write(b''.join(entries))
+           self.data.flush()
+           self.index.flush()
+
+   def close(self):
+       with self.lock:
+           if self.data is not None:
+               self.data.close()
+               self.index.close()
+               self.data = None
+               self.index = None
+
+   def open_map(self, path):
+       # A segment can be rolled away between listing and opening it
+       try:
+           with open(path, 'rb') as file:
+               if os.fstat(file.fileno()).st_size == 0:
+                   return None
+               return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+       except FileNotFoundError:
+           return None
+
+   def open_segment(self, paths):
+       data = self.open_map(paths[0])
+       index = self.open_map(paths[1])
+       if data is None or index is None:
+           for buffer in (data, index):
+               if buffer is not None:
+                   buffer.close()
+           return None
+       return data, index
+
+   def offsets(self, entries, start=None, end=None, size=0):
+       first = 0
+       last = size
+       if start is not None:
+           position = bisect.bisect_left(entries, start, key=lambda entry: entry[0])
+           first = entries[position][1] if position < len(entries) else size
+       if end is not None:
+           position = bisect.bisect_right(entries, end, key=lambda entry: entry[0])
+           last = entries[position][1] if position < len(entries) else size
+       return first, last
+
+   def time_at(self, entries, offset):
+       position = bisect.bisect_right(entries, offset, key=lambda entry: entry[1]) - 1
+       if position < 0:
+           return None
+       return entries[position][0]
+
+   def line_at(self, data, offset):
+       begin = data.rfind(b'\n', 0, offset) + 1
+       finish = data.find(b'\n', offset)
+       if finish == -1:
+           finish = len(data)
+       return begin, finish
+
+   def tail(self, n=100):
+       lines = []
+       for path, _ in reversed(self.segments()):
+           data = self.open_map(path)
+           if data is None:
+               continue
+           with data:
+               position = len(data) - 1
+               for _ in range(n - len(lines)):
+                   position = data.rfind(b'\n', 0, position)
+                   if position == -1:
+                       break
+               lines = data[position + 1:].decode('utf-8', errors='replace').splitlines() + lines
+           if len(lines) >= n:
+               break
+       return lines[-n:] if n else []
+
+   def between(self, start=None, end=None):
+       lines = []
+       for paths in self.segments():
+           segment = self.open_segment(paths)
+           if segment is None:
+               continue
+           data, index = segment
+           with data, index:
+               first, last = self.offsets(IndexView(index), start, end, len(data))
+               lines.extend(data[first:last].decode('utf-8', errors='replace').splitlines())
+       return lines
+
+   def search(self, pattern, regex=False, start=None, end=None, limit=1000, ignore_case=False):
+       results = []
+       for paths in self.segments():
+           segment = self.open_segment(paths)
+           if segment is None:
+               continue
+           with segment[0], segment[1]:
+               results.extend(self.search_segment(*segment, pattern, regex, start, end, limit - len(results), ignore_case))
+           if len(results) >= limit:
+               break
+       return results
+
+   def search_segment(self, data, index, pattern, regex, start, end, limit, ignore_case):
+       results = []
+       entries = IndexView(index)
+       first, last = self.offsets(entries, start, end, len(data))
+
+       if regex or ignore_case:
+           flags = re.IGNORECASE if ignore_case else 0
+           expression = re.compile(pattern.encode() if regex else re.escape(pattern.encode()), flags | re.MULTILINE)
+           matches = (match.start() for match in expression.finditer(data, first, last))
+       else:
+           matches = self.find_all(data, pattern.encode(), first, last)
+
+       previous = -1
+       for offset in matches:
+           begin, finish = self.line_at(data, offset)
+           if begin == previous:
+               continue
+           previous = begin
+           results.append((self.time_at(entries, begin), data[begin:finish].decode('utf-8', errors='replace')))
+           if len(results) >= limit:
+               break
+       # The match iterator still references the map, release it before the map is closed
+       del matches
+       return results
+
+   def find_all(self, data, needle, first, last):
+       position = data.find(needle, first, last)
+       while position != -1:
+           yield position
+           # Skip the rest of the line, one hit per line is enough
+           finish = data.find(b'\n', position)
+           if finish == -1:
+               return
+           position = data.find(needle, finish, last)
+
+   def levels(self, level=logging.WARNING, start=None, end=None, limit=1000):
+       results = []
+       for paths in self.segments():
+           segment = self.open_segment(paths)
+           if segment is None:
+               continue
+           data, index = segment
+           with data, index:
+               entries = IndexView(index)
+               first = 0
+               if start is not None:
+                   first = bisect.bisect_left(entries, start, key=lambda entry: entry[0])
+               for position in range(first, len(entries)):
+                   created, offset, levelno = entries[position]
+                   if end is not None and created > end:
+                       break
+                   if levelno >= level:
+                       begin, finish = self.line_at(data, offset)
+                       results.append((created, data[begin:finish].decode('utf-8', errors='replace')))
+                       if len(results) >= limit:
+                           return results
+       return results
+
+class LogStoreHandler(logging.Handler):
+   def __init__(self, store):
+       logging.Handler.__init__(self)
+       self.store = store
+
+   def emit(self, record):
+       try:
+           self.store.append(record.created, getattr(record, 'raw', record.getMessage()), record.levelno)
+       except Exception:
+           self.handleError(record)
+
+   def close(self):
+       self.store.close()
+       logging.Handler.close(self)
@@ -1,17 +1,65 @@
 import sys
 import os
-import backend
+import rpc
 import logging
 import time
-import json
-
-from PySide6.QtWidgets import QApplication, QLabel, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QPushButton, QCheckBox, QLineEdit, QHBoxLayout, QSplitter, QTextEdit, QSizePolicy, QMessageBox
-from PySide6.QtCore import Qt
-
+import config
+import shlex
+import threading
+import isolation
+import jvm
+import properties
+import cron
+import maintenance
+
+from PySide6.QtWidgets import QApplication, QLabel, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QPushButton, QCheckBox, QLineEdit, QHBoxLayout, QSplitter, QTextEdit, QSizePolicy, QMessageBox, QProgressBar, QComboBox, QTableWidget, QTableWidgetItem, QHeaderView
+from PySide6.QtCore import Qt, QTimer, Signal
+from PySide6.QtGui import QIntValidator
+
+import client
+from client import RemoteBackend
 from handlers import QTextEditLogHandler
+from tasks import TaskExecutor
+from widgets import MetricsPanel
+
+backend = RemoteBackend()
+
+def read_metadata(server):
+   directory = os.path.join(os.getcwd(), server)
+   data = config.read(os.path.join(directory, 'backend.json'))
+   try:
+       with open(os.path.join(directory, 'server.properties'), 'r', encoding='latin-1') as file:
+           properties = file.read()
+   except Exception as e:
+       properties = e
+   return {'data': data, 'properties': properties}
+
+def property_hint(key):
+   if key in properties.BOOLEANS:
+       return 'true or false'
+   if key in properties.RANGES:
+       return f'{properties.RANGES[key][0]} to {properties.RANGES[key][1]}'
+   if key in properties.CHOICES:
+       return ', '.join(properties.CHOICES[key])
+   return ''
+
+def scan_servers():
+   servers = []
+   metadata = {}
+   for entry in sorted(os.scandir(os.getcwd()), key=lambda entry: entry.name):
+       if not entry.is_dir() or not os.path.exists(os.path.join(entry.path, 'backend.json')):
+           continue
+       servers.append(entry.name)
+       try:
+           metadata[entry.name] = read_metadata(entry.name)
+       except (OSError, ValueError) as e:
+           logging.error(f'Could not read {entry.name}/backend.json: {e}')
+   return servers, metadata
 
 class MainWindow(QMainWindow):
-   def __init__(self):
+   scanned = Signal(object, object)
+
+   def __init__(self, lazy=True):
        super().__init__()
 
        self.setWindowTitle("Minecraft Server Manager")
@@ -23,15 +71,36 @@ class MainWindow(QMainWindow):
 
        # Create tabs with simple text labels
        self.servers = []
+       self.prompts = {}
+       self.progress_bars = {}
+       self.placeholders = {}
+       self.properties_tables = {}
+       self.pregen_bars = {}
+       self.pregen_polling = set()
+       self.command_labels = {}
+       self.schedule_labels = {}
+       self.pending_settings = {}
+       self.settings_timers = {}
+       self.isolation = None
+       self.properties_loaded = {}
+       self.built = set()
+       self.metadata = {}
+       self.lazy = lazy
+       # Backend calls run on a thread pool, one queue per server, so the window never blocks on them
+       self.executor = TaskExecutor()
        self.load_servers()
 
+       self.tabs.currentChanged.connect(self.tab_changed)
        self.setCentralWidget(self.tabs)
 
    def load_servers(self):
-       subfolders = [os.path.basename(f.path) for f in os.scandir(os.getcwd()) if f.is_dir()]
-       for folder in subfolders:
-           if os.path.exists(os.path.join(os.getcwd(), folder, 'backend.json')):
-               self.servers.append(folder)
+       # The scan reads every backend.json and server.properties, it runs off the GUI thread and the window paints meanwhile
+       self.scanned.connect(self.servers_scanned, Qt.ConnectionType.QueuedConnection)
+       threading.Thread(target=lambda: self.scanned.emit(*scan_servers()), name='scan', daemon=True).start()
+
+   def servers_scanned(self, servers, metadata):
+       self.servers.extend(servers)
+       self.metadata.update(metadata)
 
        if len(self.servers) == 0:
            self.create_server_tab()
@@ -72,248 +141,613 @@ class MainWindow(QMainWindow):
        self.tabs.addTab(tab_content, 'Create Server')
 
    def add_server_tabs(self):
+       # Tabs start out empty and are built the first time they are shown, so startup cost does not grow with the fleet
        for server in self.servers:
-           tab_content = QWidget()
-           layout = QVBoxLayout()
-
-           # Top Buttons
-           button_layout = QHBoxLayout()
-           start_button = QPushButton('Start')
-           stop_button = QPushButton('Stop')
-           update_button = QPushButton('Update')
-           button_layout.addWidget(start_button)
-           button_layout.addWidget(stop_button)
-           button_layout.addWidget(update_button)
-           layout.addLayout(button_layout)
-
-           splitter = QSplitter()
-
-           left_splitter = QWidget()
-           left = QVBoxLayout()
-
-           right_splitter = QWidget()
-           right = QVBoxLayout()
-
-           # Left Splitter
-           options = QTabWidget()
-           options.addTab(QLabel('Work In Progress'), 'General')
-
-           #Properties Tab
-
-           properties_widget = QWidget()
-           properties_layout = QVBoxLayout()
-
-           self.properties_text = QTextEdit()
-
-           try:
-               with open(f'{os.path.join(os.getcwd(), server)}/server.properties', 'r') as file:
-                   contents = file.read()
-                   self.properties_text.setText(contents)
-           except Exception as e:
-               self.properties_text.setText(f"Error loading file: {e}. \n\nThis error will occur if you have not started the server yet, try starting it first. You may have to re-open the program once you do.")
-
-           save_button = QPushButton('Save')
-
-           self.properties_text.setSizePolicy(
-               QSizePolicy.Policy.Expanding,
-               QSizePolicy.Policy.Expanding
-           )
-
-           properties_layout.addWidget(self.properties_text)
-           properties_layout.addWidget(save_button)
-
-           properties_widget.setLayout(properties_layout)
-           options.addTab(properties_widget, 'Properties')
-
-           save_button.pressed.connect(lambda server_name=server: self.properties_save(server_name))
-
-           #Memory Tab
-
-           memory_widget = QWidget()
-           memory_layout = QVBoxLayout()
-
-           label = QLabel('How much memory do you want to give to your server? It has a direct effect on performance. Memory is in MB, one GB = 1024 MB, e.g., 8 GB = 1024 x 8 = 8192 MB')
-           label.setWordWrap(True)
-           label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
-
-           minimum = QHBoxLayout()
-           maximum = QHBoxLayout()
-
-           minimum.addWidget(QLabel('Minimum Memory'))
-           maximum.addWidget(QLabel('Maximum Memory'))
-
-           with open(os.path.join(os.getcwd(), server, 'backend.json'), 'r') as file:
-               data = json.load(file)
-
-           minimumBox = QLineEdit(data['minimum'])
-           maximumBox = QLineEdit(data['maximum'])
-
-           minimum.addWidget(minimumBox)
-           maximum.addWidget(maximumBox)
-
-           memory_layout.addWidget(label)
-           memory_layout.addLayout(minimum)
-           memory_layout.addLayout(maximum)
+           placeholder = QWidget()
+           placeholder_layout = QVBoxLayout()
+           placeholder_layout.setContentsMargins(0, 0, 0, 0)
+           placeholder.setLayout(placeholder_layout)
+           self.placeholders[server] = placeholder
+           self.tabs.addTab(placeholder, server)
+           if not self.lazy:
+               self.build_tab(server)
+       QTimer.singleShot(0, lambda: self.tab_changed(self.tabs.currentIndex()))
+
+   def tab_changed(self, index):
+       if index < 0:
+           return
+       server = self.tabs.tabText(index)
+       if server in self.placeholders and server not in self.built:
+           self.build_tab(server)
+
+   def build_tab(self, server):
+       self.built.add(server)
+       self.placeholders[server].layout().addWidget(self.build_server_tab(server))
+
+   def build_server_tab(self, server):
+       tab_content = QWidget()
+       layout = QVBoxLayout()
 
-           minimumBox.textChanged.connect(lambda text: self.minimum_changed(text, server))
-           maximumBox.textChanged.connect(lambda text: self.maximum_changed(text, server))
+       # Top Buttons
+       button_layout = QHBoxLayout()
+       start_button = QPushButton('Start')
+       stop_button = QPushButton('Stop')
+       update_button = QPushButton('Update')
+       button_layout.addWidget(start_button)
+       button_layout.addWidget(stop_button)
+       button_layout.addWidget(update_button)
+       layout.addLayout(button_layout)
+
+       progress_layout = QHBoxLayout()
+       progress_bar = QProgressBar()
+       progress_bar.setTextVisible(True)
+       progress_bar.setFormat('Idle')
+       progress_bar.setValue(0)
+       cancel_button = QPushButton('Cancel')
+       progress_layout.addWidget(progress_bar)
+       progress_layout.addWidget(cancel_button)
+       layout.addLayout(progress_layout)
+       self.progress_bars[server] = progress_bar
+       cancel_button.clicked.connect(lambda _, s=server: self.executor.cancel(s))
+
+       splitter = QSplitter()
+
+       left_splitter = QWidget()
+       left = QVBoxLayout()
+
+       right_splitter = QWidget()
+       right = QVBoxLayout()
+
+       # Left Splitter
+       options = QTabWidget()
+       options.addTab(MetricsPanel(backend.telemetry.get(server)), 'General')
+
+       #Properties Tab
+
+       properties_widget = QWidget()
+       properties_layout = QVBoxLayout()
+
+       metadata = self.metadata.pop(server, None) or read_metadata(server)
+
+       if isinstance(metadata['properties'], Exception):
+           error = QLabel(f"Error loading file: {metadata['properties']}. \n\nThis error will occur if you have not started the server yet, try starting it first. You may have to re-open the program once you do.")
+           error.setWordWrap(True)
+           properties_layout.addWidget(error)
+           items = []
+       else:
+           items = properties.Properties(metadata['properties']).items()
+
+       table = QTableWidget(len(items), 3)
+       table.setHorizontalHeaderLabels(['Setting', 'Value', 'Applies'])
+       table.verticalHeader().setVisible(False)
+       table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+       for row, (key, value) in enumerate(items):
+           key_item = QTableWidgetItem(key)
+           applies_item = QTableWidgetItem('Live' if key in properties.LIVE else 'Restart')
+           for item in (key_item, applies_item):
+               item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+           value_item = QTableWidgetItem(value)
+           value_item.setToolTip(property_hint(key))
+           table.setItem(row, 0, key_item)
+           table.setItem(row, 1, value_item)
+           table.setItem(row, 2, applies_item)
+       self.properties_tables[server] = table
+       self.properties_loaded[server] = dict(items)
+
+       save_button = QPushButton('Save')
+
+       table.setSizePolicy(
+           QSizePolicy.Policy.Expanding,
+           QSizePolicy.Policy.Expanding
+       )
+
+       properties_layout.addWidget(table)
+       properties_layout.addWidget(save_button)
+
+       properties_widget.setLayout(properties_layout)
+       options.addTab(properties_widget, 'Properties')
+
+       save_button.pressed.connect(lambda server_name=server: self.properties_save(server_name))
+
+       #Memory Tab
+
+       memory_widget = QWidget()
+       memory_layout = QVBoxLayout()
+
+       label = QLabel('How much memory do you want to give to your server? It has a direct effect on performance. Memory is in MB, one GB = 1024 MB, e.g., 8 GB = 1024 x 8 = 8192 MB')
+       label.setWordWrap(True)
+       label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+
+       minimum = QHBoxLayout()
+       maximum = QHBoxLayout()
+
+       minimum.addWidget(QLabel('Minimum Memory'))
+       maximum.addWidget(QLabel('Maximum Memory'))
+
+       data = metadata['data']
 
-           memory_layout.addStretch()
+       minimumBox = QLineEdit(str(data['minimum']))
+       maximumBox = QLineEdit(str(data['maximum']))
 
-           memory_widget.setLayout(memory_layout)
+       minimum.addWidget(minimumBox)
+       maximum.addWidget(maximumBox)
 
-           options.addTab(memory_widget, 'Memory')
+       memory_layout.addWidget(label)
+       memory_layout.addLayout(minimum)
+       memory_layout.addLayout(maximum)
 
-           #Playit.gg
+       settings = jvm.options(data)
 
-           bedrock_widget = QWidget()
-           bedrock_layout = QVBoxLayout()
-           bedrock_label = QLabel('Uses GeyserMC.org (Geyser and Floodgate), along with ViaVersion to enable Minecraft: Bedrock Edition players to join Minecraft: Java Edition servers. This may cause errors. ')
-           bedrock_label.setWordWrap(True)
-           bedrock_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+       profile = QHBoxLayout()
+       profile.addWidget(QLabel('JVM Profile'))
+       profileBox = QComboBox()
+       profileBox.addItems(list(jvm.PROFILES))
+       profileBox.setCurrentText(settings['profile'])
+       profile.addWidget(profileBox)
 
-           bedrock_download_button = QPushButton('Enable Bedrock Support')
+       java = QHBoxLayout()
+       java.addWidget(QLabel('Java Path'))
+       javaBox = QLineEdit(settings['java'])
+       java.addWidget(javaBox)
 
-           bedrock_layout.addWidget(bedrock_label)
-           bedrock_layout.addWidget(bedrock_download_button)
+       pretouchBox = QCheckBox('Pre-touch heap at startup')
+       pretouchBox.setChecked(settings['pretouch'])
+       largePagesBox = QCheckBox('Use large pages')
+       largePagesBox.setChecked(settings['large_pages'])
+       autoHeapBox = QCheckBox('Size heap from host memory (shared between servers)')
+       autoHeapBox.setChecked(settings['auto_heap'])
 
-           bedrock_download_button.clicked.connect(lambda text: self.download_bedrock(server))
+       commandLabel = QLabel()
+       commandLabel.setWordWrap(True)
+       commandLabel.setTextInteractionFlags(Qt.TextSelectableByMouse)
 
-           bedrock_layout.addStretch()
+       memory_layout.addLayout(profile)
+       memory_layout.addLayout(java)
+       memory_layout.addWidget(pretouchBox)
+       memory_layout.addWidget(largePagesBox)
+       memory_layout.addWidget(autoHeapBox)
+       memory_layout.addWidget(commandLabel)
 
-           bedrock_widget.setLayout(bedrock_layout)
+       limits = isolation.options(data)
+       limitsLabel = QLabel()
+       limitsLabel.setWordWrap(True)
+       self.show_isolation(limitsLabel)
+       memory_layout.addWidget(limitsLabel)
 
-           options.addTab(bedrock_widget, 'Bedrock')
+       limitBoxes = {}
+       for key, title in (('cpus', 'CPU Limit (cores)'), ('memory', 'Memory Limit (MB)'), ('cores', 'Pinned Physical Cores'), ('nice', 'Nice')):
+           row = QHBoxLayout()
+           row.addWidget(QLabel(title))
+           box = QLineEdit('' if limits[key] in (None, 0) else str(limits[key]))
+           row.addWidget(box)
+           memory_layout.addLayout(row)
+           limitBoxes[key] = box
 
-           #Bedrock Tab
+       limitBoxes['cpus'].textChanged.connect(lambda text: self.limit_changed(server, 'cpus', text, float))
+       limitBoxes['memory'].textChanged.connect(lambda text: self.limit_changed(server, 'memory', text, int))
+       limitBoxes['cores'].textChanged.connect(lambda text: self.limit_changed(server, 'cores', text, int))
+       limitBoxes['nice'].setValidator(QIntValidator(isolation.lowest_nice(), 19))
+       limitBoxes['nice'].textChanged.connect(lambda text: self.limit_changed(server, 'nice', text, int))
 
-           playit = QWidget()
-           playit_layout = QVBoxLayout()
+       # Refreshed once the daemon has the new settings
+       self.command_labels[server] = commandLabel
+       self.show_command(commandLabel, server)
 
-           playit_label = QLabel('Playit.gg is a free online service build specifically for minecraft Java servers, however it does work with anything else, to connect it to the internet. For this server, we will use it to get other players outside the local network to connect and play. Once you click the download button below, a playit.gg client will download (you might need to restart the server). Next, you will have to go to https://playit.gg/ and create an account. In the console, it will be telling you to go to a website, do that and add the agent (instance). Once complete, create a tunnel, and make it redirect to 127.0.0.1 on port 25565 (unless set otherwise, you can find it in your properties tab). It will give you a domain, and that will be used for other players to connect to your server. Please note the consequences of allowing access to the internet. You can use this domain, however the client will be set up for you via a plugin: https://docs.famlam.ca/server-hosting/setup-playit-gg')
-           playit_label.setWordWrap(True)
-           playit_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+       minimumBox.textChanged.connect(lambda text: self.minimum_changed(text, server))
+       maximumBox.textChanged.connect(lambda text: self.maximum_changed(text, server))
+       profileBox.currentTextChanged.connect(lambda text: self.section_changed(server, 'jvm', 'profile', text))
+       javaBox.textChanged.connect(lambda text: self.section_changed(server, 'jvm', 'java', text.strip() or 'java'))
+       pretouchBox.toggled.connect(lambda checked: self.section_changed(server, 'jvm', 'pretouch', checked))
+       largePagesBox.toggled.connect(lambda checked: self.section_changed(server, 'jvm', 'large_pages', checked))
+       autoHeapBox.toggled.connect(lambda checked: self.section_changed(server, 'jvm', 'auto_heap', checked))
 
-           download_button = QPushButton('Download Playit.gg')
+       memory_layout.addStretch()
 
-           playit_layout.addWidget(playit_label)
-           playit_layout.addWidget(download_button)
+       memory_widget.setLayout(memory_layout)
 
-           download_button.clicked.connect(lambda text: self.download_playit(server))
+       options.addTab(memory_widget, 'Memory')
 
-           playit_layout.addStretch()
+       #Playit.gg
 
-           playit.setLayout(playit_layout)
+       bedrock_widget = QWidget()
+       bedrock_layout = QVBoxLayout()
+       bedrock_label = QLabel('Uses GeyserMC.org (Geyser and Floodgate), along with ViaVersion to enable Minecraft: Bedrock Edition players to join Minecraft: Java Edition servers. This may cause errors. ')
+       bedrock_label.setWordWrap(True)
+       bedrock_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
 
-           options.addTab(playit, 'Playit.gg')
+       bedrock_download_button = QPushButton('Enable Bedrock Support')
 
-           #Other stuff
+       bedrock_layout.addWidget(bedrock_label)
+       bedrock_layout.addWidget(bedrock_download_button)
 
-           left.addWidget(options)
+       bedrock_download_button.clicked.connect(lambda text: self.download_bedrock(server))
+
+       bedrock_layout.addStretch()
+
+       bedrock_widget.setLayout(bedrock_layout)
+
+       options.addTab(bedrock_widget, 'Bedrock')
+
+       #Bedrock Tab
+
+       playit = QWidget()
+       playit_layout = QVBoxLayout()
+
+       playit_label = QLabel('Playit.gg is a free online service build specifically for minecraft Java servers, however it does work with anything else, to connect it to the internet. For this server, we will use it to get other players outside the local network to connect and play. Once you click the download button below, a playit.gg client will download (you might need to restart the server). Next, you will have to go to https://playit.gg/ and create an account. In the console, it will be telling you to go to a website, do that and add the agent (instance). Once complete, create a tunnel, and make it redirect to 127.0.0.1 on port 25565 (unless set otherwise, you can find it in your properties tab). It will give you a domain, and that will be used for other players to connect to your server. Please note the consequences of allowing access to the internet. You can use this domain, however the client will be set up for you via a plugin: https://docs.famlam.ca/server-hosting/setup-playit-gg')
+       playit_label.setWordWrap(True)
+       playit_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+
+       download_button = QPushButton('Download Playit.gg')
+
+       playit_layout.addWidget(playit_label)
+       playit_layout.addWidget(download_button)
+
+       download_button.clicked.connect(lambda text: self.download_playit(server))
+
+       playit_layout.addStretch()
+
+       playit.setLayout(playit_layout)
+
+       options.addTab(playit, 'Playit.gg')
+
+       #Pre-generation Tab
+
+       pregen_widget = QWidget()
+       pregen_layout = QVBoxLayout()
+
+       pregen_label = QLabel('Generates the world ahead of time, so players exploring new land do not cause lag. It slows down on its own when the server is busy and carries on after restarts. Uses Chunky when it is installed, otherwise the vanilla forceload command.')
+       pregen_label.setWordWrap(True)
+       pregen_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+       pregen_layout.addWidget(pregen_label)
+
+       pregen_boxes = {}
+       for key, title, default in (('radius', 'Radius (blocks)', '2000'), ('center_x', 'Center X', '0'), ('center_z', 'Center Z', '0')):
+           row = QHBoxLayout()
+           row.addWidget(QLabel(title))
+           box = QLineEdit(default)
+           row.addWidget(box)
+           pregen_layout.addLayout(row)
+           pregen_boxes[key] = box
+
+       players_box = QCheckBox('Pause while players are online')
+       pregen_layout.addWidget(players_box)
+
+       pregen_buttons = QHBoxLayout()
+       chunky_button = QPushButton('Install Chunky')
+       pregen_start = QPushButton('Start')
+       pregen_pause = QPushButton('Pause')
+       pregen_resume = QPushButton('Resume')
+       pregen_cancel = QPushButton('Cancel')
+       for button in (chunky_button, pregen_start, pregen_pause, pregen_resume, pregen_cancel):
+           pregen_buttons.addWidget(button)
+       pregen_layout.addLayout(pregen_buttons)
 
-           # Right Splitter
-           self.console = QTextEdit()  # Store the console as an instance variable
+       pregen_bar = QProgressBar()
+       pregen_bar.setTextVisible(True)
+       pregen_bar.setFormat('Not started')
+       pregen_layout.addWidget(pregen_bar)
+       pregen_layout.addStretch()
 
-           log_handler = QTextEditLogHandler(self.console)
-           log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-           logging.getLogger().addHandler(log_handler)
+       pregen_widget.setLayout(pregen_layout)
+       options.addTab(pregen_widget, 'Pre-generation')
 
-           self.console.setReadOnly(True)
-           self.console.setSizePolicy(
-               QSizePolicy.Policy.Expanding,
-               QSizePolicy.Policy.Expanding
-           )
-           right.addWidget(self.console)
+       chunky_button.clicked.connect(lambda _, s=server: self.run_task(s, 'Install Chunky', backend.installChunky, s, progress=True))
+       pregen_start.clicked.connect(lambda _, s=server: self.pregen_call(s, backend.pregenerate, s, pregen_boxes['radius'].text(), pregen_boxes['center_x'].text(), pregen_boxes['center_z'].text(), 'world', None, players_box.isChecked()))
+       pregen_pause.clicked.connect(lambda _, s=server: self.pregen_call(s, backend.pregenPause, s))
+       pregen_resume.clicked.connect(lambda _, s=server: self.pregen_call(s, backend.pregenResume, s))
+       pregen_cancel.clicked.connect(lambda _, s=server: self.pregen_call(s, backend.pregenCancel, s))
 
-           command = QHBoxLayout()
-           command.addWidget(QLabel('Command:'))
-           self.prompt = QLineEdit()
-           command.addWidget(self.prompt)
-           send = QPushButton('Send')
-           command.addWidget(send)
+       pregen_timer = QTimer(pregen_widget)
+       pregen_timer.setInterval(2000)
+       pregen_timer.timeout.connect(lambda s=server, bar=pregen_bar, widget=pregen_widget: self.pregen_refresh(s, bar, widget))
+       pregen_timer.start()
+       self.pregen_bars[server] = pregen_bar
 
-           right.addLayout(command)
+       #Schedule Tab
 
-           self.prompt.returnPressed.connect(lambda server_name=server: self.send_command(server_name))
+       schedule_widget = QWidget()
+       schedule_layout = QVBoxLayout()
 
-           send.pressed.connect(lambda server_name=server: self.send_command(server_name))
+       schedule_label = QLabel('Runs maintenance on a schedule, written like crontab: minute hour day month weekday, for example "0 4 * * *" is every day at 4:00. Leave a field empty to turn the job off. Jobs that fall due together on several servers run one after another.')
+       schedule_label.setWordWrap(True)
+       schedule_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+       schedule_layout.addWidget(schedule_label)
 
-           left_splitter.setLayout(left)
-           right_splitter.setLayout(right)
-           splitter.addWidget(left_splitter)
-           splitter.addWidget(right_splitter)
+       schedule = maintenance.options(data)
+       scheduleLabel = QLabel()
+       scheduleLabel.setWordWrap(True)
+       for key, title in (('restart', 'Restart'), ('backup', 'Hot Backup'), ('update', 'Update Check')):
+           row = QHBoxLayout()
+           row.addWidget(QLabel(title))
+           box = QLineEdit(schedule[key] or '')
+           row.addWidget(box)
+           run = QPushButton('Run now')
+           row.addWidget(run)
+           schedule_layout.addLayout(row)
+           box.textChanged.connect(lambda text, key=key: self.schedule_changed(server, key, text))
+           run.clicked.connect(lambda _, key=key: self.run_scheduled(server, key))
 
-           layout.addWidget(splitter)
+       warnings = QHBoxLayout()
+       warnings.addWidget(QLabel('Restart Warnings (seconds)'))
+       warningsBox = QLineEdit(', '.join(str(seconds) for seconds in schedule['warnings']))
+       warnings.addWidget(warningsBox)
+       schedule_layout.addLayout(warnings)
+       warningsBox.textChanged.connect(lambda text: self.warnings_changed(server, text))
+
+       applyBox = QCheckBox('Install updates found by the update check (the server restarts)')
+       applyBox.setChecked(schedule['apply_updates'])
+       applyBox.toggled.connect(lambda checked: self.section_changed(server, 'schedule', 'apply_updates', checked))
+       schedule_layout.addWidget(applyBox)
+
+       schedule_layout.addWidget(scheduleLabel)
+       self.schedule_labels[server] = scheduleLabel
+       self.show_schedule(scheduleLabel, server)
+       schedule_layout.addStretch()
+
+       schedule_widget.setLayout(schedule_layout)
+       options.addTab(schedule_widget, 'Schedule')
+
+       #Other stuff
+
+       left.addWidget(options)
+
+       # Right Splitter
+       self.console = QTextEdit()  # Store the console as an instance variable
+
+       # Only this server's output reaches this console
+       backend.attach(server, QTextEditLogHandler(self.console))
+
+       self.console.setReadOnly(True)
+       self.console.setSizePolicy(
+           QSizePolicy.Policy.Expanding,
+           QSizePolicy.Policy.Expanding
+       )
+       right.addWidget(self.console)
+
+       command = QHBoxLayout()
+       command.addWidget(QLabel('Command:'))
+       prompt = QLineEdit()
+       self.prompts[server] = prompt
+       command.addWidget(prompt)
+       send = QPushButton('Send')
+       command.addWidget(send)
+
+       right.addLayout(command)
+
+       prompt.returnPressed.connect(lambda server_name=server: self.send_command(server_name))
+
+       send.pressed.connect(lambda server_name=server: self.send_command(server_name))
+
+       left_splitter.setLayout(left)
+       right_splitter.setLayout(right)
+       splitter.addWidget(left_splitter)
+       splitter.addWidget(right_splitter)
+
+       layout.addWidget(splitter)
 
-           tab_content.setLayout(layout)
-           self.tabs.addTab(tab_content, server)
+       tab_content.setLayout(layout)
 
-           # Connect start and stop buttons to their respective functions
-           start_button.clicked.connect(lambda _, s=server: self.start_server(s))
-           stop_button.clicked.connect(lambda _, s=server: self.stop_server(s))
-           update_button.clicked.connect(lambda _, s=server: self.update_server(s))
+       # Connect start and stop buttons to their respective functions
+       start_button.clicked.connect(lambda _, s=server: self.start_server(s))
+       stop_button.clicked.connect(lambda _, s=server: self.stop_server(s))
+       update_button.clicked.connect(lambda _, s=server: self.update_server(s))
+
+       return tab_content
+
+   def run_task(self, server, name, function, *args, progress=False, on_success=None, **kwargs):
+       queued = self.executor.busy(server)
+       task = self.executor.submit(server, name, function, *args, progress=progress, **kwargs)
+       # Task signals fire on pool threads, queue them so widgets are only touched on the GUI thread
+       queued_connection = Qt.ConnectionType.QueuedConnection
+       bar = self.progress_bars.get(server)
+       if bar is not None:
+           bar.setValue(0)
+           bar.setFormat(f'{name}: queued' if queued else name)
+           task.progressed.connect(lambda percent, message, bar=bar, name=name: (bar.setValue(percent), bar.setFormat(f'{name}: {message}' if message else name)), queued_connection)
+           task.failed.connect(lambda error, bar=bar, name=name: bar.setFormat(f'{name} failed: {error}'), queued_connection)
+           task.succeeded.connect(lambda _, bar=bar, name=name: bar.setFormat(f'{name} done'), queued_connection)
+       if on_success is not None:
+           task.succeeded.connect(on_success, queued_connection)
+       return task
+
+   def background(self, key, function, *args, on_done=None):
+       # Quick daemon calls run off the GUI thread too, on_done gets (result, error) back on the GUI thread
+       def call():
+           try:
+               return function(*args), None
+           except (OSError, rpc.RpcError) as e:
+               return None, e
+       task = self.executor.submit(f'{key} (background)', function.__name__, call)
+       if on_done is not None:
+           task.succeeded.connect(lambda outcome: on_done(*outcome), Qt.ConnectionType.QueuedConnection)
+       return task
 
    def download_playit(self, server):
-       backend.downloadPlayit(server)
+       self.run_task(server, 'Download Playit.gg', backend.downloadPlayit, server, progress=True)
 
    def download_bedrock(self, server):
-       backend.bedrock(server)
+       self.run_task(server, 'Enable Bedrock', backend.bedrock, server, progress=True)
 
    def send_command(self, server):
-           command_text = self.prompt.text()
+           prompt = self.prompts[server]
+           command_text = prompt.text()
            if command_text:
-               logging.info(f"Sending command: {command_text}")
-               backend.command(server, command_text)
-               self.prompt.clear()
+               self.background(server, backend.command, server, command_text, on_done=lambda _, error: error and logging.error(f'Could not send the command to {server}: {error}'))
+               prompt.clear()
 
    def start_server(self, server):
-       # Call the backend start function and pass the console
-       backend.start(server)
+       self.run_task(server, 'Start', backend.start, server)
 
    def update_server(self, server):
-       backend.update(server)
+       self.run_task(server, 'Update', backend.update, server, progress=True)
 
    def properties_save(self, server):
-       try:
-           with open(f'{os.path.join(os.getcwd(), server)}/server.properties', 'w') as file:
-               content = self.properties_text.toPlainText()
-               file.write(content)
-
-               reply = QMessageBox.question(self, 'Restart Server',
-                               "The server has to be restarted for these changed to be applied, would you like to restart?",
-                               QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
-
-               if reply == QMessageBox.Yes:
-                   backend.stop(server)
-                   backend.start(server)
-               else:
-                   event.ignore()  # Ignore the event to keep the window open
-       except Exception as e:
-           logging.error(f"Error saving file: {e}")
+       table = self.properties_tables[server]
+       loaded = self.properties_loaded[server]
+       changes = {}
+       for row in range(table.rowCount()):
+           key = table.item(row, 0).text()
+           value = table.item(row, 1).text()
+           if loaded.get(key) != value:
+               changes[key] = value
+       if not changes:
+           return
+
+       task = self.run_task(server, 'Save properties', backend.saveProperties, server, changes, on_success=lambda result, s=server: self.properties_saved(s, result))
+       task.failed.connect(lambda error: QMessageBox.warning(self, 'Properties', f'Could not save server.properties: {error}'), Qt.ConnectionType.QueuedConnection)
+
+   def properties_saved(self, server, result):
+       table = self.properties_tables[server]
+       self.properties_loaded[server].update(result['changed'])
+       for row in range(table.rowCount()):
+           key = table.item(row, 0).text()
+           if key in result['changed']:
+               table.item(row, 1).setText(result['changed'][key])
+
+       # Live settings already reached the server over the console, only the rest needs a restart
+       if result['restart']:
+           reply = QMessageBox.question(self, 'Restart Server',
+                           f"{', '.join(result['restart'])} only take effect after a restart, would you like to restart?",
+                           QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+
+           if reply == QMessageBox.Yes:
+               self.run_task(server, 'Restart', backend.restart, server)
+
+   def pregen_call(self, server, function, *args):
+       def done(_, error):
+           if error is not None:
+               QMessageBox.warning(self, 'Pre-generation', f'{error}')
+           self.pregen_refresh(server, self.pregen_bars[server])
+       self.background(server, function, *args, on_done=done)
+
+   def pregen_refresh(self, server, bar, widget=None):
+       # Polled only while the tab is on screen and one request at a time, the job itself runs in the daemon
+       if widget is not None and not widget.isVisible() or server in self.pregen_polling:
+           return
+       self.pregen_polling.add(server)
+       self.background(server, backend.pregenStatus, server, on_done=lambda status, error: self.pregen_show(server, bar, status))
+
+   def pregen_show(self, server, bar, status):
+       self.pregen_polling.discard(server)
+       if not status or not status.get('state'):
+           return
+       bar.setValue(int(status.get('percent') or 0))
+       text = f"{status['state'].capitalize()} ({status.get('mode')}): {status.get('percent') or 0:.1f}%"
+       if status.get('throttled'):
+           text += ', throttled while the server is busy'
+       if status.get('rate'):
+           text += f", {status['rate']:.0f} chunks/s"
+       if status.get('error'):
+           text += f", {status['error']}"
+       bar.setFormat(text)
 
    def stop_server(self, server):
-       # Call the backend stop function
-       backend.stop(server)
+       self.run_task(server, 'Stop', backend.stop, server)
 
    def minimum_changed(self, text, server):
        if text.isdigit():
-           with open(os.path.join(os.getcwd(), server, 'backend.json'), 'r') as file:
-               data = json.load(file)
-
-           data['minimum'] = text
-
-           with open(os.path.join(os.getcwd(), server, 'backend.json'), 'w') as file:
-               json.dump(data, file, indent=4)
+           self.settings_changed(server, {'minimum': int(text)})
 
    def maximum_changed(self, text, server):
        if text.isdigit():
-           with open(os.path.join(os.getcwd(), server, 'backend.json'), 'r') as file:
-               data = json.load(file)
+           self.settings_changed(server, {'maximum': int(text)})
+
+   def section_changed(self, server, section, key, value):
+       self.settings_changed(server, {section: {key: value}})
+
+   def settings_changed(self, server, changes):
+       # Keystrokes are collected and sent together once typing pauses, the daemon owns backend.json and coalesces the writes
+       pending = self.pending_settings.setdefault(server, {})
+       for key, value in changes.items():
+           if isinstance(value, dict) and isinstance(pending.get(key), dict):
+               pending[key].update(value)
+           else:
+               pending[key] = value
+       timer = self.settings_timers.get(server)
+       if timer is None:
+           timer = self.settings_timers[server] = QTimer(self)
+           timer.setSingleShot(True)
+           timer.setInterval(300)
+           timer.timeout.connect(lambda: self.flush_settings(server))
+       timer.start()
+
+   def flush_settings(self, server):
+       changes = self.pending_settings.pop(server, None)
+       if changes:
+           self.background(server, backend.configure, server, changes, on_done=lambda _, error: self.settings_saved(server, error))
+
+   def settings_saved(self, server, error):
+       if error is not None:
+           logging.error(f'Could not save settings for {server}: {error}')
+       if server in self.command_labels:
+           self.show_command(self.command_labels[server], server)
+       if server in self.schedule_labels:
+           self.show_schedule(self.schedule_labels[server], server)
+
+   def limit_changed(self, server, key, text, kind):
+       text = text.strip()
+       if not text:
+           self.section_changed(server, 'limits', key, None)
+           return
+       try:
+           value = kind(text)
+       except ValueError:
+           return
+       if value >= (isolation.lowest_nice() if key == 'nice' else 0):
+           self.section_changed(server, 'limits', key, value)
+
+   def schedule_changed(self, server, key, text):
+       text = text.strip()
+       if text:
+           try:
+               cron.parse(text)
+           except ValueError:
+               return
+       self.section_changed(server, 'schedule', key, text or None)
 
-           data['maximum'] = text
+   def warnings_changed(self, server, text):
+       try:
+           warnings = [int(value) for value in text.replace(',', ' ').split()]
+       except ValueError:
+           return
+       if all(seconds > 0 for seconds in warnings):
+           self.section_changed(server, 'schedule', 'warnings', warnings)
+
+   def run_scheduled(self, server, job):
+       def done(_, error):
+           if error is not None:
+               QMessageBox.warning(self, 'Schedule', f'{error}')
+           self.show_schedule(self.schedule_labels[server], server)
+       self.background(server, backend.runScheduled, server, job, on_done=done)
+
+   def show_schedule(self, label, server):
+       self.background(server, backend.schedule, server, on_done=lambda schedule, error: self.schedule_shown(label, schedule, error))
+
+   def schedule_shown(self, label, schedule, error):
+       if error is not None:
+           label.setText(f'Schedule unavailable: {error}')
+           return
+       lines = []
+       for job, state in schedule['jobs'].items():
+           if state['running'] or state['queued']:
+               lines.append(f'{job.capitalize()}: running now' if state['running'] else f"{job.capitalize()}: queued for {time.strftime('%H:%M:%S', time.localtime(state['queued']))}")
+           elif state['next']:
+               lines.append(f"{job.capitalize()}: next at {time.strftime('%a %d %b %H:%M', time.localtime(state['next']))}" + (f", last {state['result']}" if state['result'] else ''))
+       label.setText('\n'.join(lines) or 'Nothing scheduled')
+
+   def show_isolation(self, label):
+       # Asked once, the daemon's cgroup decides how servers are isolated, not the window's
+       def done(mode, error):
+           if mode is not None:
+               self.isolation = mode
+           label.setText(f"Resource limits keep co-hosted servers from starving each other. Leave a field empty for no limit. Isolation on this host: {self.isolation or 'unknown, the daemon is not reachable'}")
+       if self.isolation is not None:
+           done(self.isolation, None)
+       else:
+           self.background('daemon', backend.isolationMode, on_done=done)
 
-           with open(os.path.join(os.getcwd(), server, 'backend.json'), 'w') as file:
-               json.dump(data, file, indent=4)
+   def show_command(self, label, server):
+       self.background(server, backend.launchCommand, server, on_done=lambda args, error: label.setText(shlex.join(args) if error is None else f'Invalid settings: {error}'))
 
    def show_state(self, state):
        if state == 2 or (state == True and len(self.lineedit.text()) > 0):
@@ -327,8 +761,9 @@ class MainWindow(QMainWindow):
 
    def button_pressed(self):
        server_name = self.lineedit.text()
-       backend.create(server_name)  # Call the backend to create the server
-       self.add_server_tab(server_name)  # Add a new tab for the created server
+       self.button.setEnabled(False)
+       task = self.run_task(server_name, 'Create', backend.create, server_name, progress=True, on_success=lambda _, s=server_name: self.add_server_tab(s))  # Add a new tab once the server exists
+       task.failed.connect(lambda error: (self.button.setEnabled(True), QMessageBox.warning(self, 'Create Server', f'Could not create the server: {error}')), Qt.ConnectionType.QueuedConnection)
 
    def add_server_tab(self, server_name):
        tab_content = QWidget()
@@ -340,18 +775,26 @@ class MainWindow(QMainWindow):
    def closeEvent(self, event):
        # Create a confirmation dialog
        reply = QMessageBox.question(self, 'Confirm Exit',
-                                    "Are you sure you want to exit? Any running servers will be stopped.",
-                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+                                    "Stop all running servers as well? Choose No to leave them running in the background, reopening this program reattaches to them.",
+                                    QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.No)
 
-       if reply == QMessageBox.Yes:
-           # Stop all running servers before closing
+       if reply != QMessageBox.Cancel:
            for server in self.servers:
-               backend.stop(server)  # Call the backend stop function for each server
+               self.executor.cancel(server)
+           if reply == QMessageBox.Yes:
+               # The daemon stops the servers in parallel and carries on if the window stops waiting
+               try:
+                   backend.call('stop_all', timeout=client.TIMEOUT)
+               except (OSError, rpc.RpcError) as e:
+                   logging.warning(f'The daemon did not confirm stopping the servers: {e}')
            event.accept()  # Accept the event to close the window
        else:
            event.ignore()  # Ignore the event to keep the window open
 
 if __name__ == "__main__":
+   # Servers live in the daemon, the window only attaches to it. MSM_METRICS_PORT is passed on to a daemon started here.
+   backend.client.spawn()
+
    app = QApplication(sys.argv)
    window = MainWindow()
    window.show()
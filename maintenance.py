@@ -0,0 +1,256 @@
+import logging
+import threading
+import time
+
+import cron
+from config import SCHEDULED
+from supervisor import LineWaiter
+
+INTERVAL = 15
+# Gap between the start of two jobs that were due together, so backups and JVM warmups of co-hosted servers follow each other
+STAGGER = 120
+WARNINGS = [300, 60, 30, 10]
+READY = r'Done \('
+READY_TIMEOUT = 600
+JOBS = SCHEDULED
+HISTORY = 20
+
+DEFAULTS = {
+   'restart': None,
+   'backup': None,
+   'update': None,
+   'warnings': WARNINGS,
+   'apply_updates': False,
+}
+
+def options(data):
+   return {**DEFAULTS, **(data.get('schedule') or {})}
+
+def duration(seconds):
+   if seconds >= 60 and seconds % 60 == 0:
+       minutes = seconds // 60
+       return f'{minutes} minute{"s" if minutes != 1 else ""}'
+   return f'{seconds} second{"s" if seconds != 1 else ""}'
+
+class Entry:
+   def __init__(self, server, kind, expression, due):
+       self.server = server
+       self.kind = kind
+       self.expression = expression
+       self.due = due
+       self.at = None
+       self.running = False
+       self.last = None
+       self.result = None
+
+class Scheduler:
+   # actions: start, restart, backup, available and update, each called with the server name
+   def __init__(self, supervisor, configs, servers, actions, clock=time.time, sleep=None, interval=INTERVAL, stagger=STAGGER, ready_timeout=READY_TIMEOUT):
+       self.supervisor = supervisor
+       self.configs = configs
+       self.servers = servers
+       self.actions = actions
+       self.clock = clock
+       self.stopped = threading.Event()
+       self.sleep = sleep or self.stopped.wait
+       self.interval = interval
+       self.stagger = stagger
+       self.ready_timeout = ready_timeout
+       self.entries = {}
+       self.pending = []
+       self.history = []
+       self.free = 0.0
+       # Last config error per server, logged once rather than every tick until it is fixed
+       self.broken = {}
+       self.lock = threading.Lock()
+       # Held for the disk or CPU heavy part of every job, whatever the stagger, two never overlap
+       self.heavy = threading.Lock()
+       self.thread = None
+
+   def start(self):
+       if self.thread is None:
+           self.thread = threading.Thread(target=self.run, name='scheduler', daemon=True)
+           self.thread.start()
+
+   def stop(self):
+       self.stopped.set()
+
+   def run(self):
+       while not self.stopped.wait(self.interval):
+           try:
+               self.tick()
+           except Exception as e:
+               logging.error(f'Scheduler tick failed: {e}')
+
+   def tick(self, now=None):
+       now = self.clock() if now is None else now
+       due = []
+       with self.lock:
+           for server in sorted(self.servers()):
+               try:
+                   schedule = options(self.configs.get(server).snapshot())
+               except (ValueError, OSError) as e:
+                   # One unreadable backend.json leaves the other servers on schedule
+                   if self.broken.get(server) != str(e):
+                       self.broken[server] = str(e)
+                       self.supervisor.get(server).logger.error(f'Schedule: config could not be read, skipping this server: {e}')
+                   continue
+               self.broken.pop(server, None)
+               for kind in JOBS:
+                   key = (server, kind)
+                   expression = schedule.get(kind)
+                   if not expression:
+                       continue
+                   entry = self.entries.get(key)
+                   if entry is None:
+                       entry = self.entries[key] = Entry(server, kind, None, None)
+                   if entry.expression != expression:
+                       # Updated in place, a run already queued or in progress keeps its place
+                       try:
+                           entry.due = cron.parse(expression).next(now)
+                       except ValueError as e:
+                           self.supervisor.get(server).logger.error(f'Schedule: {kind} "{expression}" is invalid: {e}')
+                           continue
+                       entry.expression = expression
+                   if now >= entry.due:
+                       # Runs missed while the daemon was down are skipped, only the next one is kept
+                       entry.due = cron.parse(expression).next(now)
+                       due.append(entry)
+           for entry in due:
+               self.queue(entry, now)
+
+           ready = [entry for entry in self.pending if entry.at <= now]
+           self.pending = [entry for entry in self.pending if entry.at > now]
+           for entry in ready:
+               entry.running = True
+       for entry in ready:
+           threading.Thread(target=self.execute, args=(entry,), name=f'{entry.server}-{entry.kind}', daemon=True).start()
+       return ready
+
+   def queue(self, entry, now):
+       log = self.supervisor.get(entry.server).logger
+       if entry.running or entry.at is not None:
+           log.warning(f'Schedule: {entry.kind} is still queued or running from its last run, skipping this one')
+           return
+       entry.at = max(now, self.free)
+       self.free = entry.at + self.stagger
+       self.pending.append(entry)
+       if entry.at > now:
+           log.info(f'Schedule: {entry.kind} staggered by {entry.at - now:.0f}s behind other servers')
+
+   def trigger(self, server, kind):
+       if kind not in JOBS:
+           raise ValueError(f'Unknown job {kind}, expected one of {", ".join(JOBS)}')
+       now = self.clock()
+       with self.lock:
+           entry = self.entries.get((server, kind))
+           if entry is None:
+               entry = self.entries[(server, kind)] = Entry(server, kind, None, None)
+           self.queue(entry, now)
+           return entry.at
+
+   def execute(self, entry):
+       log = self.supervisor.get(entry.server).logger
+       started = self.clock()
+       try:
+           log.info(f'Schedule: running {entry.kind}')
+           result = getattr(self, f'run_{entry.kind}')(entry.server)
+       except Exception as e:
+           log.error(f'Schedule: {entry.kind} failed: {e}')
+           result = f'failed: {e}'
+       with self.lock:
+           entry.running = False
+           entry.at = None
+           entry.last = started
+           entry.result = result
+           self.history.append({'server': entry.server, 'job': entry.kind, 'time': started, 'result': result})
+           del self.history[:-HISTORY]
+       log.info(f'Schedule: {entry.kind} {result}')
+       return result
+
+   def countdown(self, server, action):
+       instance = self.supervisor.get(server)
+       warnings = sorted(set(options(self.configs.get(server).snapshot())['warnings']), reverse=True)
+       for index, seconds in enumerate(warnings):
+           instance.command(f'say Server {action} in {duration(seconds)}')
+           following = warnings[index + 1] if index + 1 < len(warnings) else 0
+           if self.sleep(seconds - following):
+               return False
+       instance.command(f'say Server {action} now')
+       return True
+
+   def launch(self, server, action):
+       # The next heavy job waits for this server to finish loading
+       instance = self.supervisor.get(server)
+       waiter = LineWaiter(READY)
+       instance.add_consumer(waiter)
+       try:
+           if not action(server):
+               return False
+           if not waiter.event.wait(self.ready_timeout):
+               instance.logger.warning(f'Schedule: server did not finish loading within {self.ready_timeout}s')
+           return True
+       finally:
+           instance.remove_consumer(waiter)
+
+   def run_restart(self, server):
+       if not self.supervisor.get(server).is_running():
+           return 'skipped, server not running'
+       if not self.countdown(server, 'restarting'):
+           return 'cancelled'
+       with self.heavy:
+           return 'done' if self.launch(server, self.actions['restart']) else 'failed to start'
+
+   def run_backup(self, server):
+       with self.heavy:
+           point = self.actions['backup'](server)
+       return 'done' if point else 'failed'
+
+   def run_update(self, server):
+       latest = self.actions['available'](server)
+       if not latest:
+           return 'up to date'
+       if not options(self.configs.get(server).snapshot())['apply_updates']:
+           self.supervisor.get(server).logger.warning(f'Schedule: version {latest} is available, update from the Update button or enable apply_updates')
+           return f'{latest} available'
+       running = self.supervisor.get(server).is_running()
+       if running and not self.countdown(server, f'updating to {latest}'):
+           return 'cancelled'
+       with self.heavy:
+           try:
+               if self.actions['update'](server):
+                   result = f'updated to {latest}'
+               else:
+                   result = f'not updated to {latest}, see the server log'
+           except Exception as e:
+               self.supervisor.get(server).logger.error(f'Schedule: update to {latest} failed: {e}')
+               result = f'update to {latest} failed: {e}'
+           finally:
+               # The update stops the server first, whatever happened it goes back up on the version it has
+               if running and not self.supervisor.get(server).is_running() and not self.launch(server, self.actions['start']):
+                   result += ', failed to start'
+       return result
+
+   def status(self, server):
+       now = self.clock()
+       schedule = options(self.configs.get(server).snapshot())
+       with self.lock:
+           jobs = {}
+           for kind in JOBS:
+               entry = self.entries.get((server, kind))
+               expression = schedule.get(kind)
+               due = entry.due if entry is not None and entry.expression == expression else None
+               if due is None and expression:
+                   try:
+                       due = cron.parse(expression).next(now)
+                   except ValueError:
+                       due = None
+               jobs[kind] = {
+                   'expression': expression,
+                   'next': due,
+                   'queued': entry.at if entry is not None else None,
+                   'running': entry.running if entry is not None else False,
+                   'last': entry.last if entry is not None else None,
+                   'result': entry.result if entry is not None else None,
+               }
+           return {'jobs': jobs, 'history': [run for run in self.history if run['server'] == server]}
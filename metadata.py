@@ -0,0 +1,111 @@
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from downloads import downloader
+
+TTL = 600
+
+class MetadataClient:
+   def __init__(self, root, ttl=TTL, session=None, timeout=10):
+       self.root = root
+       self.ttl = ttl
+       self.session = session or downloader.session
+       self.timeout = timeout
+       self.lock = threading.Lock()
+       self.entries = {}
+       self.inflight = {}
+
+   def path(self, url):
+       return os.path.join(self.root, f'{hashlib.sha1(url.encode()).hexdigest()}.json')
+
+   def entry(self, url):
+       entry = self.entries.get(url)
+       if entry is None:
+           try:
+               with open(self.path(url), 'r') as file:
+                   entry = json.load(file)
+           except (FileNotFoundError, ValueError):
+               return None
+           self.entries[url] = entry
+       return entry
+
+   def store(self, url, entry):
+       self.entries[url] = entry
+       os.makedirs(self.root, exist_ok=True)
+       with tempfile.NamedTemporaryFile('w', dir=self.root, suffix='.tmp', delete=False) as temp:
+           json.dump(entry, temp)
+       os.replace(temp.name, self.path(url))
+
+   def get(self, url, ttl=None):
+       ttl = self.ttl if ttl is None else ttl
+
+       # Identical lookups already on the wire share one request
+       with self.lock:
+           entry = self.entry(url)
+           if entry is not None and time.time() - entry['fetched'] < ttl:
+               return entry['body']
+           pending = self.inflight.get(url)
+           owner = pending is None
+           if owner:
+               pending = self.inflight[url] = concurrent.futures.Future()
+
+       if not owner:
+           return pending.result()
+
+       try:
+           body = self.refresh(url, entry)
+           pending.set_result(body)
+           return body
+       except BaseException as e:
+           pending.set_exception(e)
+           raise
+       finally:
+           with self.lock:
+               del self.inflight[url]
+
+   def refresh(self, url, entry):
+       headers = {}
+       if entry is not None:
+           if entry.get('etag'):
+               headers['If-None-Match'] = entry['etag']
+           if entry.get('last_modified'):
+               headers['If-Modified-Since'] = entry['last_modified']
+
+       try:
+           response = self.session.get(url, headers=headers, timeout=self.timeout)
+           if response.status_code == 304 and entry is not None:
+               entry = dict(entry, fetched=time.time())
+           else:
+               response.raise_for_status()
+               entry = {
+                   'url': url,
+                   'etag': response.headers.get('ETag'),
+                   'last_modified': response.headers.get('Last-Modified'),
+                   'fetched': time.time(),
+                   'body': response.json()
+               }
+       except requests.RequestException as e:
+           if entry is None:
+               raise
+           logging.warning(f'Using cached response for {url}, refresh failed: {e}')
+           return entry['body']
+
+       with self.lock:
+           self.store(url, entry)
+       return entry['body']
+
+   def invalidate(self, url=None):
+       with self.lock:
+           urls = [url] if url else list(self.entries)
+           for key in urls:
+               self.entries.pop(key, None)
+               if os.path.exists(self.path(key)):
+                   os.remove(self.path(key))
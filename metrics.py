@@ -0,0 +1,107 @@
+import http.server
+import logging
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def escape(value):
+   return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Exporter:
+   def __init__(self, supervisor, telemetry=None, downloader=None, backups=None, watchdog=None):
+       self.supervisor = supervisor
+       self.watchdog = watchdog
+       self.telemetry = telemetry
+       self.downloader = downloader
+       self.backups = backups
+       self.server = None
+       self.thread = None
+
+   def families(self):
+       # Everything here is a value other threads already keep up to date, a scrape never waits on a server
+       families = {}
+
+       def add(name, kind, help, value, labels=None, suffix=''):
+           if value is None:
+               return
+           family = families.setdefault(name, (kind, help, []))
+           family[2].append((suffix, labels or {}, value))
+
+       with self.supervisor.lock:
+           instances = list(self.supervisor.instances.values())
+
+       for instance in instances:
+           labels = {'server': instance.name}
+           up = instance.process is not None and instance.exit_code is None
+           add('minecraft_server_up', 'gauge', 'Whether the server process is running.', int(up), labels)
+           add('minecraft_server_restarts_total', 'counter', 'Times the server was started again after its first start.', max(instance.starts - 1, 0), labels)
+           add('minecraft_server_uptime_seconds', 'gauge', 'Seconds since the server process started.', time.monotonic() - instance.started_at if up else 0, labels)
+           add('minecraft_console_lines_total', 'counter', 'Console lines read from the server.', instance.lines, labels)
+
+           if self.watchdog is not None:
+               watch = self.watchdog.state(instance.name)
+               add('minecraft_server_crashes_total', 'counter', 'Unexpected exits and hangs detected by the watchdog.', watch['total'], labels)
+
+           if self.telemetry is not None:
+               snapshot = self.telemetry.get(instance.name).snapshot()
+               add('minecraft_process_resident_memory_bytes', 'gauge', 'Resident set size of the server process.', None if snapshot['rss'] is None else snapshot['rss'] * 1048576, labels)
+               add('minecraft_process_cpu_seconds_total', 'counter', 'CPU time used by the server process.', snapshot['cpu_seconds'], labels)
+               add('minecraft_tps', 'gauge', 'Ticks per second over the last minute.', snapshot['tps'], labels)
+               add('minecraft_mspt_milliseconds', 'gauge', 'Average milliseconds per tick.', snapshot['mspt'], labels)
+               add('minecraft_players_online', 'gauge', 'Players online.', snapshot['players'], labels)
+               add('minecraft_gc_pause_milliseconds', 'gauge', 'Most recent JVM GC pause.', snapshot['gc_pause'], labels)
+
+       if self.backups is not None:
+           for server, stats in list(self.backups.stats.items()):
+               labels = {'server': server}
+               add('minecraft_backup_duration_seconds', 'summary', 'Time spent taking backups.', stats['seconds'], labels, '_sum')
+               add('minecraft_backup_duration_seconds', 'summary', 'Time spent taking backups.', stats['count'], labels, '_count')
+               add('minecraft_backup_last_duration_seconds', 'gauge', 'Duration of the most recent backup.', stats['last'], labels)
+               add('minecraft_backup_written_bytes_total', 'counter', 'New bytes written to the backup store.', stats['bytes'], labels)
+
+       if self.downloader is not None:
+           add('minecraft_manager_download_bytes_total', 'counter', 'Bytes downloaded for jars and plugins.', self.downloader.downloaded)
+
+       return families
+
+   def render(self):
+       lines = []
+       for name, (kind, help, samples) in self.families().items():
+           lines.append(f'# HELP {name} {help}')
+           lines.append(f'# TYPE {name} {kind}')
+           for suffix, labels, value in samples:
+               label = ','.join(f'{key}="{escape(item)}"' for key, item in labels.items())
+               lines.append(f'{name}{suffix}{{{label}}} {value}' if label else f'{name}{suffix} {value}')
+       return '\n'.join(lines) + '\n'
+
+   def start(self, port=9225, host='127.0.0.1'):
+       exporter = self
+
+       class Handler(http.server.BaseHTTPRequestHandler):
+           def do_GET(self):
+               if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                   self.send_error(404)
+                   return
+               body = exporter.render().encode()
+               self.send_response(200)
+               self.send_header('Content-Type', CONTENT_TYPE)
+               self.send_header('Content-Length', str(len(body)))
+               self.end_headers()
+               self.wfile.write(body)
+
+           def log_message(self, format, *args):
+               pass
+
+       self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+       self.server.daemon_threads = True
+       self.thread = threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True)
+       self.thread.start()
+       logging.info(f'Serving metrics on http://{host}:{self.server.server_port}/metrics')
+       return self.server.server_port
+
+   def stop(self):
+       if self.server is not None:
+           self.server.shutdown()
+           self.server.server_close()
+           self.server = None
@@ -0,0 +1,323 @@
+import glob
+import math
+import os
+import re
+import threading
+import time
+
+from telemetry import MSPT_HEADER, PLAYERS, TPS
+
+INTERVAL = 10
+MSPT_HIGH = 45.0
+MSPT_LOW = 30.0
+TPS_LOW = 18.0
+READY = r'Done \('
+READY_TIMEOUT = 600
+# A forceload sweep marks one square of 16 x 16 chunks at a time, the most one command accepts
+SQUARE = 256
+SETTLE = 5.0
+# A square counts as generated once these probes report its chunks loaded, servers before 1.19.4 fall back to SETTLE
+LOADED = r'Test passed|Test failed|Unknown or incomplete command|Incorrect argument'
+LOAD_POLL = 1.0
+LOAD_TIMEOUT = 120
+ATTEMPTS = 3
+DIMENSIONS = {'_nether': 'minecraft:the_nether', '_the_end': 'minecraft:the_end'}
+
+CHUNKY_PROGRESS = re.compile(r'\[Chunky\] Task (running|finished) for (\S+)\. Processed: (\d+) chunks \(([\d.]+)%\)(?:, ETA: ([\d:]+), Rate: ([\d.]+) cps)?')
+CHUNKY_MISSING = re.compile(r'Unknown or incomplete command.*chunky|Unknown command.*chunky', re.IGNORECASE)
+
+def chunky_installed(directory):
+   return bool(glob.glob(os.path.join(directory, 'plugins', 'Chunky*.jar')) or glob.glob(os.path.join(directory, 'plugins', 'chunky*.jar')))
+
+def dimension(world):
+   # Chunky takes the Bukkit world folder, forceload needs the dimension it belongs to
+   if ':' in world:
+       return world
+   for suffix, name in DIMENSIONS.items():
+       if world.endswith(suffix):
+           return name
+   return 'minecraft:overworld'
+
+def squares(center, radius):
+   # Center first, then outwards ring by ring, so a stopped sweep has generated the most visited area
+   rings = math.ceil(radius / SQUARE)
+   cells = [(x, z) for x in range(-rings, rings) for z in range(-rings, rings)]
+   cells.sort(key=lambda cell: (max(abs(cell[0] + 0.5), abs(cell[1] + 0.5)), cell))
+   cx, cz = center
+   return [(cx + x * SQUARE, cz + z * SQUARE, cx + x * SQUARE + SQUARE - 1, cz + z * SQUARE + SQUARE - 1) for x, z in cells]
+
+class PregenJob:
+   def __init__(self, runner, server):
+       self.runner = runner
+       self.server = server
+       self.instance = runner.supervisor.get(server)
+       self.telemetry = runner.telemetry.get(server)
+       self.config = runner.configs.get(server)
+       self.wake = threading.Event()
+       self.throttled = False
+       self.rate = None
+       self.load_check = True
+       self.ready_for = None
+       self.thread = threading.Thread(target=self.run, name=f'{server}-pregen', daemon=True)
+
+   @property
+   def state(self):
+       return self.config.get('pregen', {})
+
+   def save(self, **changes):
+       # Only the changed keys, the config merges them so a pause or cancel made meanwhile is kept
+       self.config.update({'pregen': changes})
+
+   def finish(self, state, **changes):
+       # A job that ends on its own must not overwrite a cancel that arrived meanwhile
+       with self.config.lock:
+           if self.state.get('state') in ('running', 'paused'):
+               self.save(state=state, **changes)
+
+   def log(self, message, level='info'):
+       getattr(self.instance.logger, level)(f'Pre-generation: {message}')
+
+   def ready(self):
+       while self.state.get('state') in ('running', 'paused'):
+           if self.instance.is_running():
+               # Remembered per launch, the "Done" line soon scrolls out of the console tail
+               if self.ready_for == self.instance.starts:
+                   return True
+               if self.instance.uptime > 60 or any(re.search(READY, line) for line in list(self.instance.tail)) or self.instance.wait_for(READY, timeout=READY_TIMEOUT) is not None:
+                   self.ready_for = self.instance.starts
+                   return True
+           elif self.wake.wait(INTERVAL):
+               self.wake.clear()
+       return False
+
+   def overloaded(self):
+       snapshot = self.telemetry.snapshot()
+       mspt, tps, players = snapshot['mspt'], snapshot['tps'], snapshot['players']
+       if self.state.get('pause_for_players') and players:
+           return True
+       if self.throttled:
+           # Only let go once the server clearly has headroom again
+           return (mspt is not None and mspt > MSPT_LOW) or (tps is not None and tps < TPS_LOW)
+       return (mspt is not None and mspt > MSPT_HIGH) or (tps is not None and tps < TPS_LOW)
+
+   def sample(self):
+       # Fresher numbers than the telemetry poll, the replies are parsed by the telemetry consumer
+       self.instance.probe('mspt', MSPT_HEADER.pattern, lines=2)
+       self.instance.probe('tps', TPS.pattern)
+       if self.state.get('pause_for_players'):
+           self.instance.probe('list', PLAYERS.pattern)
+
+   def run(self):
+       try:
+           while self.state.get('state') in ('running', 'paused'):
+               if self.state.get('state') == 'paused' and self.state.get('mode') != 'chunky':
+                   self.wake.wait(INTERVAL)
+                   self.wake.clear()
+                   continue
+               if not self.ready():
+                   break
+               if self.state.get('mode') == 'chunky':
+                   self.run_chunky()
+               else:
+                   self.run_forceload()
+       except Exception as e:
+           self.log(f'job failed: {e}', 'error')
+           self.finish('failed', error=str(e))
+       finally:
+           self.runner.finished(self)
+
+   def parse(self, lines):
+       for line in lines:
+           match = CHUNKY_PROGRESS.search(line)
+           if match:
+               status, _, done, percent, _, rate = match.groups()
+               self.rate = float(rate) if rate else self.rate
+               if status == 'finished':
+                   self.finish('done', done=int(done), percent=100.0)
+                   self.log(f'finished, {done} chunks')
+                   self.wake.set()
+               else:
+                   self.save(done=int(done), percent=float(percent))
+           elif CHUNKY_MISSING.search(line):
+               self.finish('failed', error='Chunky is not loaded, restart the server after installing it')
+               self.wake.set()
+
+   def run_chunky(self):
+       self.instance.add_consumer(self.parse)
+       try:
+           state = self.state
+           if not state.get('started'):
+               center_x, center_z = state['center']
+               for command in (f"chunky world {state['world']}", f'chunky center {center_x} {center_z}', f"chunky radius {state['radius']}", 'chunky start'):
+                   self.instance.command(command)
+               self.save(started=True)
+               self.log(f"started with Chunky, radius {state['radius']} around {center_x}, {center_z}")
+           elif state.get('state') == 'running':
+               # Chunky keeps its own progress across restarts
+               self.instance.command('chunky continue')
+           paused = state.get('state') == 'paused'
+
+           while self.instance.is_running() and self.state.get('state') in ('running', 'paused'):
+               want_pause = self.state.get('state') == 'paused' or self.overloaded()
+               if want_pause != paused:
+                   self.instance.command('chunky pause' if want_pause else 'chunky continue')
+                   paused = want_pause
+               self.throttled = want_pause and self.state.get('state') == 'running'
+               if self.state.get('state') == 'running':
+                   self.sample()
+               if self.wake.wait(INTERVAL):
+                   self.wake.clear()
+                   if self.state.get('state') == 'cancelled':
+                       self.instance.command('chunky cancel')
+                       self.instance.command('chunky confirm')
+       finally:
+           self.instance.remove_consumer(self.parse)
+
+   def loaded(self, x, z):
+       reply = self.instance.wait_for(LOADED, send=f'execute in {self.where} if loaded {x} 0 {z}', timeout=30, quiet=True)
+       if reply is None or 'Test' not in reply:
+           if reply is not None:
+               self.log('this server cannot report loaded chunks, waiting a fixed time per square instead', 'warning')
+               self.load_check = False
+           return None
+       return 'passed' in reply
+
+   def generated(self, square, settle):
+       # Corners and center of the square, the server loads a forceloaded area from all sides at once
+       x1, z1, x2, z2 = square
+       points = [(x1, z1), (x2, z1), (x1, z2), (x2, z2), ((x1 + x2) // 2, (z1 + z2) // 2)]
+       deadline = time.monotonic() + LOAD_TIMEOUT
+       while self.load_check and points and time.monotonic() < deadline:
+           if self.state.get('state') != 'running' or not self.instance.is_running():
+               return False
+           points = [point for point in points if not self.loaded(*point)]
+           if points and self.wake.wait(LOAD_POLL):
+               self.wake.clear()
+       if not self.load_check:
+           if self.wake.wait(settle):
+               self.wake.clear()
+           return self.state.get('state') == 'running'
+       return not points
+
+   def run_forceload(self):
+       state = self.state
+       cells = squares(state['center'], state['radius'])
+       self.where = dimension(state.get('world') or 'world')
+       if not state.get('started'):
+           self.save(started=True, total=len(cells) * 256)
+           self.log(f"started with forceload sweeps in {self.where}, {len(cells)} squares around {state['center'][0]}, {state['center'][1]}")
+
+       step = self.state.get('step', 0)
+       settle = SETTLE
+       attempts = 0
+       while step < len(cells) and self.instance.is_running():
+           if self.state.get('state') != 'running':
+               return
+           if self.overloaded():
+               self.throttled = True
+               settle = min(settle * 2, 60.0)
+               self.sample()
+               self.wake.wait(INTERVAL)
+               self.wake.clear()
+               continue
+           self.throttled = False
+
+           x1, z1, x2, z2 = cells[step]
+           if self.instance.wait_for(r'Marked|already|No chunks', send=f'execute in {self.where} run forceload add {x1} {z1} {x2} {z2}', timeout=120, quiet=True) is None:
+               self.log(f'no reply to forceload at {x1}, {z1}, retrying', 'warning')
+               continue
+           done = self.generated(cells[step], settle)
+           self.instance.probe(f'execute in {self.where} run forceload remove {x1} {z1} {x2} {z2}', r'Unmarked|not marked|No chunks')
+           if not done:
+               if self.state.get('state') != 'running' or not self.instance.is_running():
+                   return
+               attempts += 1
+               if attempts >= ATTEMPTS:
+                   raise RuntimeError(f'chunks around {x1}, {z1} did not finish generating after {ATTEMPTS} tries')
+               self.log(f'chunks around {x1}, {z1} still generating after {LOAD_TIMEOUT}s, trying again', 'warning')
+               continue
+           attempts = 0
+           step += 1
+           self.save(step=step, done=step * 256, percent=round(100 * step / len(cells), 2))
+           self.sample()
+           mspt = self.telemetry.snapshot()['mspt']
+           settle = max(SETTLE, min(60.0, settle * (1.5 if mspt and mspt > MSPT_LOW else 0.8)))
+
+       if step >= len(cells):
+           self.instance.command('save-all')
+           self.finish('done', percent=100.0)
+           self.log(f'finished, {step * 256} chunks')
+
+class PregenRunner:
+   def __init__(self, supervisor, telemetry, configs):
+       self.supervisor = supervisor
+       self.telemetry = telemetry
+       self.configs = configs
+       self.jobs = {}
+       self.lock = threading.Lock()
+
+   def start(self, server, radius, center=(0, 0), world='world', mode=None, pause_for_players=False):
+       directory = self.supervisor.get(server).directory
+       mode = mode or ('chunky' if chunky_installed(directory) else 'forceload')
+       self.configs.get(server).set('pregen', {
+           'state': 'running',
+           'mode': mode,
+           'world': world,
+           'center': list(center),
+           'radius': int(radius),
+           'pause_for_players': pause_for_players,
+           'started': False,
+           'step': 0,
+           'done': 0,
+           'percent': 0.0,
+           'total': None,
+           'error': None,
+       })
+       return self.resume(server)
+
+   def resume(self, server):
+       self.transition(server, 'paused', 'running')
+       return self.restore(server)
+
+   def restore(self, server):
+       # Called on every server launch, picks up a job that was running or paused when the server or daemon went down
+       if self.configs.get(server).get('pregen', {}).get('state') not in ('running', 'paused'):
+           return False
+       with self.lock:
+           job = self.jobs.get(server)
+           if job is None:
+               job = self.jobs[server] = PregenJob(self, server)
+               job.thread.start()
+       job.wake.set()
+       return True
+
+   def pause(self, server):
+       return self.transition(server, 'running', 'paused')
+
+   def cancel(self, server):
+       return self.transition(server, None, 'cancelled')
+
+   def transition(self, server, expected, state):
+       config = self.configs.get(server)
+       # Checked and changed under the config lock, a job thread saving progress cannot slip in between
+       with config.lock:
+           current = config.get('pregen', {})
+           if not current or current.get('state') in ('done', 'cancelled') or expected and current.get('state') != expected:
+               return False
+           config.update({'pregen': {'state': state}})
+       with self.lock:
+           job = self.jobs.get(server)
+       if job is not None:
+           job.wake.set()
+       return True
+
+   def finished(self, job):
+       with self.lock:
+           if self.jobs.get(job.server) is job:
+               del self.jobs[job.server]
+
+   def status(self, server):
+       state = self.configs.get(server).get('pregen', {})
+       with self.lock:
+           job = self.jobs.get(server)
+       return {**state, 'throttled': job.throttled if job else False, 'rate': job.rate if job else None}
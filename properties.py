@@ -0,0 +1,181 @@
+import os
+import re
+import tempfile
+
+FILENAME = 'server.properties'
+
+SEPARATOR = re.compile(r'(?<!\\)[=:]|(?<!\\)\s')
+
+BOOLEANS = (
+   'allow-flight', 'allow-nether', 'broadcast-console-to-ops', 'broadcast-rcon-to-ops', 'enable-command-block', 'enable-jmx-monitoring',
+   'enable-query', 'enable-rcon', 'enable-status', 'enforce-secure-profile', 'enforce-whitelist', 'force-gamemode', 'generate-structures',
+   'hardcore', 'hide-online-players', 'online-mode', 'prevent-proxy-connections', 'pvp', 'require-resource-pack', 'spawn-animals',
+   'spawn-monsters', 'spawn-npcs', 'sync-chunk-writes', 'use-native-transport', 'white-list', 'accepts-transfers', 'log-ips',
+)
+RANGES = {
+   'server-port': (1, 65535),
+   'query.port': (1, 65535),
+   'rcon.port': (1, 65535),
+   'max-players': (0, 2147483647),
+   'view-distance': (3, 32),
+   'simulation-distance': (3, 32),
+   'spawn-protection': (0, 2147483647),
+   'max-world-size': (1, 29999984),
+   'max-tick-time': (-1, 2147483647),
+   'network-compression-threshold': (-1, 2147483647),
+   'op-permission-level': (0, 4),
+   'function-permission-level': (1, 4),
+   'entity-broadcast-range-percentage': (10, 1000),
+   'player-idle-timeout': (0, 2147483647),
+   'rate-limit': (0, 2147483647),
+   'max-chained-neighbor-updates': (-1, 2147483647),
+}
+CHOICES = {
+   'difficulty': ('peaceful', 'easy', 'normal', 'hard'),
+   'gamemode': ('survival', 'creative', 'adventure', 'spectator'),
+}
+
+# Keys a running server can take over the console, everything else only applies after a restart
+LIVE = {
+   'difficulty': lambda value: f'difficulty {value}',
+   'white-list': lambda value: f'whitelist {"on" if value == "true" else "off"}',
+   'gamemode': lambda value: f'defaultgamemode {value}',
+}
+
+def unescape(text):
+   result = []
+   i = 0
+   while i < len(text):
+       char = text[i]
+       if char == '\\' and i + 1 < len(text):
+           following = text[i + 1]
+           if following == 'u' and re.fullmatch(r'[0-9a-fA-F]{4}', text[i + 2:i + 6]):
+               result.append(chr(int(text[i + 2:i + 6], 16)))
+               i += 6
+               continue
+           result.append({'t': '\t', 'n': '\n', 'r': '\r', 'f': '\f'}.get(following, following))
+           i += 2
+           continue
+       result.append(char)
+       i += 1
+   return ''.join(result)
+
+def escape(text, key=False):
+   result = []
+   for i, char in enumerate(text):
+       if char in '\\=:#!' or char == ' ' and (key or i == 0):
+           result.append('\\' + char)
+       elif char in '\t\n\r\f':
+           result.append({'\t': '\\t', '\n': '\\n', '\r': '\\r', '\f': '\\f'}[char])
+       elif ord(char) < 0x20 or ord(char) > 0x7e:
+           result.append(f'\\u{ord(char):04x}')
+       else:
+           result.append(char)
+   return ''.join(result)
+
+class Properties:
+   def __init__(self, text=''):
+       # Every line is kept, comments and order survive a save untouched
+       self.lines = []
+       self.index = {}
+       for line in text.splitlines():
+           stripped = line.lstrip()
+           if not stripped or stripped[0] in '#!':
+               self.lines.append([None, None, line])
+               continue
+           match = SEPARATOR.search(stripped)
+           if match is None:
+               key, value = stripped, ''
+           else:
+               key = stripped[:match.start()]
+               value = stripped[match.end():].lstrip()
+               if match.group().isspace() and value[:1] in ('=', ':'):
+                   value = value[1:].lstrip()
+           key = unescape(key)
+           self.index[key] = len(self.lines)
+           self.lines.append([key, unescape(value), line])
+
+   def __contains__(self, key):
+       return key in self.index
+
+   def get(self, key, default=None):
+       if key not in self.index:
+           return default
+       return self.lines[self.index[key]][1]
+
+   def items(self):
+       return [(key, value) for key, value, _ in self.lines if key is not None]
+
+   def set(self, key, value):
+       line = f'{escape(key, key=True)}={escape(value)}'
+       if key in self.index:
+           self.lines[self.index[key]][1:] = [value, line]
+       else:
+           self.index[key] = len(self.lines)
+           self.lines.append([key, value, line])
+
+   def dump(self):
+       return ''.join(line + '\n' for _, _, line in self.lines)
+
+def validate(key, value):
+   value = value.strip()
+   if key in BOOLEANS:
+       if value.lower() not in ('true', 'false'):
+           raise ValueError(f'{key} must be true or false')
+       return value.lower()
+   if key in RANGES:
+       low, high = RANGES[key]
+       try:
+           number = int(value)
+       except ValueError:
+           raise ValueError(f'{key} must be a whole number')
+       if not low <= number <= high:
+           raise ValueError(f'{key} must be between {low} and {high}')
+       return str(number)
+   if key in CHOICES:
+       if value.lower() not in CHOICES[key]:
+           raise ValueError(f'{key} must be one of {", ".join(CHOICES[key])}')
+       return value.lower()
+   return value
+
+def load(directory):
+   try:
+       with open(os.path.join(directory, FILENAME), 'r', encoding='latin-1') as file:
+           return Properties(file.read())
+   except FileNotFoundError:
+       return Properties()
+
+def save(directory, properties):
+   # Java reads the file as ISO 8859-1, everything outside it is written as \u escapes
+   path = os.path.join(directory, FILENAME)
+   handle, temp = tempfile.mkstemp(prefix=f'.{FILENAME}.', dir=directory)
+   try:
+       with os.fdopen(handle, 'w', encoding='latin-1') as file:
+           file.write(properties.dump())
+           file.flush()
+           os.fsync(file.fileno())
+       os.replace(temp, path)
+   except BaseException:
+       if os.path.exists(temp):
+           os.unlink(temp)
+       raise
+
+def update(directory, changes):
+   properties = load(directory)
+   errors = []
+   changed = {}
+   for key, value in changes.items():
+       try:
+           value = validate(key, str(value))
+       except ValueError as e:
+           errors.append(str(e))
+           continue
+       if properties.get(key) != value:
+           changed[key] = value
+   if errors:
+       raise ValueError('; '.join(errors))
+   if changed:
+       for key, value in changed.items():
+           properties.set(key, value)
+       save(directory, properties)
+   return changed
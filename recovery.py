@@ -0,0 +1,242 @@
+import collections
+import re
+import threading
+import time
+
+from supervisor import LineWaiter
+
+INTERVAL = 1
+BACKOFF = 5
+MAX_BACKOFF = 300
+# A server that stays up this long is considered healthy again and its backoff starts over
+STABLE = 600
+CRASH_LOOP = 5
+CRASH_WINDOW = 900
+GRACE = 180
+HANG = 90
+PROBE = 'list'
+PROBE_REPLY = r'players online|Unknown command'
+PROBE_TIMEOUT = 30
+HISTORY = 20
+
+# Checked in order, the first match wins. Fatal reasons need a person, restarting would fail the same way.
+REASONS = [
+   (re.compile(r'You need to agree to the EULA'), 'EULA not accepted', True),
+   (re.compile(r'Unable to access jarfile|Invalid or corrupt jarfile'), 'Server jar missing or corrupt', True),
+   (re.compile(r'UnsupportedClassVersionError|compiled by a more recent version'), 'Java version too old for this server', True),
+   (re.compile(r'Unrecognized VM option|Invalid maximum heap size|Could not reserve enough space|Could not create the Java Virtual Machine'), 'JVM rejected the launch options', True),
+   (re.compile(r'OutOfMemoryError'), 'Out of memory', False),
+   (re.compile(r'A fatal error has been detected by the Java Runtime'), 'JVM crashed', False),
+   (re.compile(r'FAILED TO BIND TO PORT|Address already in use'), 'Port already in use', False),
+   (re.compile(r'session\.lock|already locked'), 'World locked by another process', False),
+   (re.compile(r'The server has stopped responding|Considering it to be crashed'), 'Tick loop stalled', False),
+   (re.compile(r'Exception in server tick loop|Encountered an unexpected exception'), 'Exception in server tick loop', False),
+]
+ERROR = re.compile(r'ERROR|Exception|Error:')
+
+def crash_reason(lines, exit_code=None):
+   lines = list(lines)
+   for pattern, reason, fatal in REASONS:
+       for line in lines:
+           if pattern.search(line):
+               return reason, fatal, line
+   for line in reversed(lines):
+       if ERROR.search(line):
+           return f'Exited with code {exit_code}', False, line
+   return f'Exited with code {exit_code}', False, None
+
+class Watch:
+   def __init__(self, name):
+       self.name = name
+       self.state = 'running'
+       self.failures = 0
+       self.total = 0
+       self.crashes = collections.deque(maxlen=HISTORY)
+       self.handled = None
+       self.next_restart = None
+       self.probe = None
+       self.probed_at = None
+       self.unresponsive = False
+
+   def recent(self, now, window=CRASH_WINDOW):
+       return [crash for crash in self.crashes if now - crash['monotonic'] <= window]
+
+class Watchdog:
+   def __init__(self, supervisor, launch, interval=INTERVAL, backoff=BACKOFF, max_backoff=MAX_BACKOFF, stable=STABLE, crash_loop=CRASH_LOOP, crash_window=CRASH_WINDOW, grace=GRACE, hang=HANG, probe_timeout=PROBE_TIMEOUT):
+       self.supervisor = supervisor
+       self.launch = launch
+       self.interval = interval
+       self.backoff = backoff
+       self.max_backoff = max_backoff
+       self.stable = stable
+       self.crash_loop = crash_loop
+       self.crash_window = crash_window
+       self.grace = grace
+       self.hang = hang
+       self.probe_timeout = probe_timeout
+       self.watches = {}
+       self.lock = threading.Lock()
+       self.stopped = threading.Event()
+       self.thread = None
+
+   def watch(self, name):
+       # Starting a server by hand clears a crash loop, the user presumably fixed something
+       instance = self.supervisor.get(name)
+       with self.lock:
+           watch = self.watches.get(name)
+           if watch is None:
+               watch = self.watches[name] = Watch(name)
+           watch.state = 'running'
+           watch.failures = 0
+           watch.next_restart = None
+           watch.handled = instance.starts if not instance.is_running() else None
+       return watch
+
+   def unwatch(self, name):
+       with self.lock:
+           watch = self.watches.get(name)
+           if watch is not None:
+               watch.state = 'stopped'
+               watch.next_restart = None
+               self.clear_probe(watch)
+
+   def state(self, name):
+       with self.lock:
+           watch = self.watches.get(name)
+           if watch is None:
+               return {'state': 'stopped', 'failures': 0, 'total': 0, 'next_restart': None, 'crashes': []}
+           return {
+               'state': watch.state,
+               'failures': watch.failures,
+               'total': watch.total,
+               'next_restart': None if watch.next_restart is None else max(watch.next_restart - time.monotonic(), 0.0),
+               'crashes': [{key: value for key, value in crash.items() if key != 'monotonic'} for crash in watch.crashes]
+           }
+
+   def crashes(self, name):
+       return self.state(name)['crashes']
+
+   def start(self):
+       if self.thread is None:
+           self.thread = threading.Thread(target=self.run, name='watchdog', daemon=True)
+           self.thread.start()
+
+   def stop(self):
+       self.stopped.set()
+
+   def run(self):
+       while not self.stopped.wait(self.interval):
+           with self.lock:
+               watches = [watch for watch in self.watches.values() if watch.state in ('running', 'backoff')]
+           for watch in watches:
+               try:
+                   self.check(watch)
+               except Exception as e:
+                   self.supervisor.get(watch.name).logger.error(f'Watchdog check for {watch.name} failed: {e}')
+
+   def check(self, watch):
+       instance = self.supervisor.get(watch.name)
+       now = time.monotonic()
+
+       if watch.state == 'backoff':
+           if now >= watch.next_restart:
+               self.restart(watch, instance)
+           return
+
+       if instance.is_running():
+           watch.handled = None
+           if watch.failures and instance.uptime >= self.stable:
+               instance.logger.info(f'Watchdog: server {watch.name} stable for {self.stable}s, resetting backoff')
+               watch.failures = 0
+           self.check_hang(watch, instance, now)
+           return
+
+       # The reader thread sets exit_code once the last output line has been consumed
+       if instance.exit_code is None or watch.handled == instance.starts:
+           return
+       watch.handled = instance.starts
+       self.clear_probe(watch)
+
+       if instance.stopping and not watch.unresponsive:
+           watch.state = 'stopped'
+           return
+       self.crashed(watch, instance, now)
+
+   def check_hang(self, watch, instance, now):
+       if instance.uptime < self.grace:
+           return
+
+       if watch.probe is not None:
+           if watch.probe.event.is_set():
+               self.clear_probe(watch)
+           elif now - watch.probed_at >= self.probe_timeout:
+               self.clear_probe(watch)
+               watch.unresponsive = True
+               instance.logger.critical(f'Watchdog: server {watch.name} produced no output for {now - instance.last_output:.0f}s and did not answer "{PROBE}"')
+               threading.Thread(target=instance.kill, name=f'{watch.name}-kill', daemon=True).start()
+           return
+
+       if instance.last_output is not None and now - instance.last_output >= self.hang:
+           watch.probe = LineWaiter(PROBE_REPLY)
+           watch.probed_at = now
+           instance.add_consumer(watch.probe)
+           instance.command(PROBE)
+
+   def clear_probe(self, watch):
+       if watch.probe is not None:
+           self.supervisor.get(watch.name).remove_consumer(watch.probe)
+           watch.probe = None
+           watch.probed_at = None
+
+   def crashed(self, watch, instance, now):
+       if watch.unresponsive:
+           reason, fatal, line = 'Unresponsive', False, None
+           watch.unresponsive = False
+       else:
+           reason, fatal, line = crash_reason(instance.tail, instance.exit_code)
+
+       with self.lock:
+           watch.crashes.append({
+               'time': time.time(),
+               'monotonic': now,
+               'exit_code': instance.exit_code,
+               'uptime': instance.uptime,
+               'reason': reason,
+               'line': line,
+               'tail': list(instance.tail)[-20:]
+           })
+           watch.total += 1
+       watch.failures += 1
+       instance.logger.critical(f'Watchdog: server {watch.name} crashed after {instance.uptime:.0f}s: {reason}' + (f' ({line.strip()})' if line else ''))
+
+       if fatal:
+           watch.state = 'failed'
+           instance.logger.critical(f'Watchdog: not restarting {watch.name}, fix the problem and start it again')
+           return
+
+       recent = watch.recent(now, self.crash_window)
+       if len(recent) >= self.crash_loop:
+           watch.state = 'crash-loop'
+           instance.logger.critical(f'Watchdog: server {watch.name} crashed {len(recent)} times in {self.crash_window}s, giving up')
+           return
+
+       delay = min(self.backoff * 2 ** (watch.failures - 1), self.max_backoff)
+       watch.state = 'backoff'
+       watch.next_restart = now + delay
+       instance.logger.warning(f'Watchdog: restarting {watch.name} in {delay:.0f}s (attempt {watch.failures})')
+
+   def restart(self, watch, instance):
+       watch.next_restart = None
+       try:
+           started = self.launch(watch.name)
+       except Exception as e:
+           instance.logger.critical(f'Watchdog: could not launch {watch.name}: {e}')
+           started = False
+       if started:
+           watch.state = 'running'
+           instance.logger.info(f'Watchdog: server {watch.name} restarted (attempt {watch.failures})')
+       elif instance.is_running():
+           watch.state = 'running'
+       else:
+           watch.state = 'failed'
+           instance.logger.critical(f'Watchdog: server {watch.name} could not be launched, not retrying')
@@ -0,0 +1,47 @@
+import json
+import os
+import socket
+
+SOCKET = 'msm.sock'
+# Loopback port used where there are no Unix sockets (Windows)
+PORT = 25599
+
+class RpcError(Exception):
+   pass
+
+class Cancelled(Exception):
+   pass
+
+def socket_path(path=None):
+   return path or os.environ.get('MSM_SOCKET') or os.path.join(os.getcwd(), SOCKET)
+
+def address(path=None):
+   # A Unix socket path, or a (host, port) pair where the platform has none, --socket and MSM_SOCKET then give the port
+   if hasattr(socket, 'AF_UNIX'):
+       return socket_path(path)
+   return ('127.0.0.1', int(path or os.environ.get('MSM_SOCKET') or PORT))
+
+def family(address):
+   return socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+
+def describe(address):
+   return f'{address[0]}:{address[1]}' if isinstance(address, tuple) else address
+
+def encode(message):
+   # One JSON document per line, a client can be a few lines of shell around socat
+   return (json.dumps({'jsonrpc': '2.0', **message}, default=str) + '\n').encode()
+
+def decode(line):
+   return json.loads(line)
+
+def request(id, method, params=None):
+   return encode({'id': id, 'method': method, 'params': params if params is not None else []})
+
+def notification(method, params):
+   return encode({'method': method, 'params': params})
+
+def result(id, value):
+   return encode({'id': id, 'result': value})
+
+def error(id, e):
+   return encode({'id': id, 'error': {'type': type(e).__name__, 'message': str(e)}})
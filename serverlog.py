@@ -0,0 +1,98 @@
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+
+from logstore import LogStore, LogStoreHandler
+
+MAX_BYTES = 50 * 1024 * 1024
+BACKUPS = 10
+
+listeners = {}
+stores = {}
+
+class OnceFormatter(logging.Formatter):
+   # Every handler on a server logger shares this formatter, so a record is formatted once however many sinks it fans out to
+   def format(self, record):
+       if getattr(record, 'formatted_by', None) is self:
+           return record.formatted
+       formatted = super().format(record)
+       if '\n' in record.message and formatted.endswith(record.message):
+           # A batch of console lines is one record, each line still reads as its own log line
+           head = formatted[:-len(record.message)]
+           formatted = '\n'.join(head + line for line in record.message.split('\n'))
+       record.formatted = formatted
+       record.formatted_by = self
+       return record.formatted
+
+class ServerQueueHandler(logging.handlers.QueueHandler):
+   def prepare(self, record):
+       # prepare() replaces msg with the formatted text, keep the raw console lines for the history store
+       raw = record.getMessage()
+       record = super().prepare(record)
+       record.raw = raw
+       return record
+
+formatter = OnceFormatter('%(asctime)s - %(levelname)s - %(message)s')
+
+def gzip_namer(name):
+   return f'{name}.gz'
+
+def gzip_rotator(source, dest):
+   with open(source, 'rb') as plain, gzip.open(dest, 'wb') as compressed:
+       shutil.copyfileobj(plain, compressed, 1024 * 1024)
+   os.remove(source)
+
+def rotating_handler(path, max_bytes=MAX_BYTES, backups=BACKUPS, when=None):
+   if when:
+       handler = logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backups, encoding='utf-8', delay=True)
+   else:
+       handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+   handler.namer = gzip_namer
+   handler.rotator = gzip_rotator
+   handler.setFormatter(formatter)
+   return handler
+
+def logger(server, directory=None, max_bytes=MAX_BYTES, backups=BACKUPS, when=None):
+   log = logging.getLogger(f'server.{server}')
+   if not getattr(log, 'configured', False):
+       log.configured = True
+       log.propagate = False
+       log.setLevel(logging.INFO)
+
+       directory = directory or os.path.join(os.getcwd(), server)
+       if os.path.isdir(directory):
+           # Disk writes and gzip rotation happen on the listener thread, never on the console reader
+           records = queue.SimpleQueue()
+           sink = ServerQueueHandler(records)
+           sink.setFormatter(formatter)
+           stores[server] = LogStore(directory, max_bytes=max_bytes, backups=backups)
+           listener = logging.handlers.QueueListener(records, rotating_handler(os.path.join(directory, 'manager.log'), max_bytes, backups, when), LogStoreHandler(stores[server]))
+           listener.start()
+           listeners[server] = listener
+           log.addHandler(sink)
+   return log
+
+def history(server):
+   logger(server)
+   return stores.get(server)
+
+def attach(server, handler):
+   handler.setFormatter(formatter)
+   logger(server).addHandler(handler)
+   return handler
+
+def detach(server, handler):
+   logger(server).removeHandler(handler)
+
+def shutdown():
+   for server, listener in list(listeners.items()):
+       listener.stop()
+       for handler in listener.handlers:
+           handler.close()
+       del listeners[server]
+
+atexit.register(shutdown)
@@ -0,0 +1,383 @@
+import collections
+import logging
+import os
+import queue
+import re
+import selectors
+import subprocess
+import threading
+import time
+
+import serverlog
+
+STOP_TIMEOUT = 60
+KILL_TIMEOUT = 10
+TAIL = 200
+# Both the Paper "[12:00:00 WARN]:" and the vanilla "[Server thread/WARN]:" prefixes
+LEVEL = re.compile(r'[ /](WARN|ERROR|FATAL)\]')
+LEVELS = {'WARN': logging.WARNING, 'ERROR': logging.ERROR, 'FATAL': logging.CRITICAL}
+PROBE_TIMEOUT = 30
+
+class ConsoleReader:
+   def __init__(self, stream, block_size=65536, encoding='utf-8'):
+       self.stream = stream
+       self.block_size = block_size
+       self.encoding = encoding
+       self.pending = b''
+
+   def split(self, block):
+       data = self.pending + block
+       lines = data.split(b'\n')
+       self.pending = lines.pop()
+       return [line.rstrip(b'\r').decode(self.encoding, errors='replace') for line in lines if line.strip()]
+
+   def flush(self):
+       line = self.pending.rstrip(b'\r')
+       self.pending = b''
+       if line.strip():
+           return [line.decode(self.encoding, errors='replace')]
+       return []
+
+   def blocks(self):
+       if os.name == 'nt' or not hasattr(self.stream, 'fileno'):
+           # Windows pipes cannot be registered with a selector, a raw read still returns whatever is available
+           read = getattr(self.stream, 'read1', self.stream.read)
+           while True:
+               block = read(self.block_size)
+               if not block:
+                   return
+               yield block
+
+       fd = self.stream.fileno()
+       with selectors.DefaultSelector() as selector:
+           selector.register(fd, selectors.EVENT_READ)
+           while True:
+               if not selector.select(timeout=1.0):
+                   continue
+               block = os.read(fd, self.block_size)
+               if not block:
+                   return
+               yield block
+
+   def batches(self):
+       for block in self.blocks():
+           lines = self.split(block)
+           if lines:
+               yield lines
+       lines = self.flush()
+       if lines:
+           yield lines
+
+class LineWaiter:
+   def __init__(self, pattern):
+       self.pattern = re.compile(pattern)
+       self.event = threading.Event()
+       self.line = None
+
+   def __call__(self, lines):
+       if self.event.is_set():
+           return
+       for line in lines:
+           if self.pattern.search(line):
+               self.line = line
+               self.event.set()
+               return
+
+class ServerInstance:
+   def __init__(self, name, directory):
+       self.name = name
+       self.directory = directory
+       self.process = None
+       self.started_at = None
+       self.stopped_at = None
+       self.exit_code = None
+       self.lock = threading.Lock()
+       self.reader = None
+       self.writer = None
+       self.on_exit = None
+       self.stdin = queue.Queue()
+       self.logger = serverlog.logger(name, directory)
+       self.consumers = []
+       self.starts = 0
+       self.lines = 0
+       self.tail = collections.deque(maxlen=TAIL)
+       self.last_output = None
+       self.stopping = False
+       self.probes = []
+       self.probe_lock = threading.Lock()
+       self.quiet = 0
+       self.add_consumer(self.log_lines)
+
+   def add_consumer(self, consumer):
+       self.consumers.append(consumer)
+
+   def remove_consumer(self, consumer):
+       if consumer in self.consumers:
+           self.consumers.remove(consumer)
+
+   def log_lines(self, lines):
+       # One record per run of lines at the same level, a block of console output costs a handful of records rather than one per line
+       batch = []
+       level = logging.INFO
+       for line in lines:
+           if self.probe_reply(line):
+               self.logger.debug(line)
+               continue
+           match = LEVEL.search(line)
+           current = LEVELS[match.group(1)] if match else logging.INFO
+           if batch and current != level:
+               self.logger.log(level, '\n'.join(batch))
+               batch = []
+           level = current
+           batch.append(line)
+       if batch:
+           self.logger.log(level, '\n'.join(batch))
+
+   def probe(self, command, reply, lines=1, timeout=PROBE_TIMEOUT):
+       # Automated commands (telemetry, pre-generation) expect their reply, it is logged at DEBUG so it stays out of the console and history
+       with self.probe_lock:
+           self.probes.append((re.compile(reply), lines, time.monotonic() + timeout))
+       return self.command(command)
+
+   def probe_reply(self, line):
+       if self.quiet:
+           self.quiet -= 1
+           return True
+       if not self.probes:
+           return False
+       now = time.monotonic()
+       with self.probe_lock:
+           self.probes = [probe for probe in self.probes if probe[2] > now]
+           for probe in self.probes:
+               if probe[0].search(line):
+                   self.probes.remove(probe)
+                   self.quiet = probe[1] - 1
+                   return True
+       return False
+
+   @property
+   def pid(self):
+       if self.process is not None:
+           return self.process.pid
+       return None
+
+   @property
+   def uptime(self):
+       if self.started_at is None:
+           return 0.0
+       if self.is_running():
+           return time.monotonic() - self.started_at
+       if self.stopped_at is not None:
+           return self.stopped_at - self.started_at
+       return 0.0
+
+   def is_running(self):
+       return self.process is not None and self.process.poll() is None
+
+   def state(self):
+       return {
+           'name': self.name,
+           'running': self.is_running(),
+           'pid': self.pid,
+           'uptime': self.uptime,
+           'exit_code': self.exit_code,
+           'stopping': self.stopping
+       }
+
+   def start(self, args, preexec=None, on_exit=None):
+       # on_exit runs on the reader thread once the process is gone, before anyone can see it stopped
+       with self.lock:
+           if self.is_running():
+               self.logger.info(f'Server {self.name} is already running.')
+               return False
+
+           self.logger.info(f'Server {self.name} starting')
+           try:
+               self.process = subprocess.Popen(
+                   args,
+                   cwd=self.directory,
+                   stdout=subprocess.PIPE,
+                   stderr=subprocess.STDOUT,  # Combine stderr with stdout
+                   stdin=subprocess.PIPE,
+                   bufsize=0,
+                   preexec_fn=preexec if os.name != 'nt' else None
+               )
+           except FileNotFoundError as e:
+               self.logger.critical(f'Java not found on your system or in your system path: {e}')
+               self.process = None
+               self.exited(on_exit)
+               return False
+           except (subprocess.SubprocessError, OSError) as e:
+               # A failing preexec (cgroup, affinity, nice) or an unusable working directory
+               self.logger.critical(f'Server {self.name} could not be started: {e}')
+               self.process = None
+               self.exited(on_exit)
+               return False
+
+           self.starts += 1
+           self.started_at = time.monotonic()
+           self.stopped_at = None
+           self.exit_code = None
+           self.stopping = False
+           self.last_output = self.started_at
+           self.tail.clear()
+           self.stdin = queue.Queue()
+           self.on_exit = on_exit
+
+           self.reader = threading.Thread(target=self.read, args=(self.process,), name=f'{self.name}-reader', daemon=True)
+           self.writer = threading.Thread(target=self.write, args=(self.process, self.stdin), name=f'{self.name}-writer', daemon=True)
+           self.reader.start()
+           self.writer.start()
+           return True
+
+   def read(self, process):
+       for lines in ConsoleReader(process.stdout).batches():
+           self.lines += len(lines)
+           self.last_output = time.monotonic()
+           self.tail.extend(lines)
+           for consumer in list(self.consumers):
+               try:
+                   consumer(lines)
+               except Exception as e:
+                   self.logger.error(f'Server {self.name} console consumer failed: {e}')
+
+       code = process.wait()
+       self.exited(self.on_exit)
+       self.exit_code = code
+       self.stopped_at = time.monotonic()
+       self.stdin.put(None)
+       self.logger.info(f'Server {self.name} exited with code {self.exit_code}')
+
+   def exited(self, on_exit):
+       if on_exit is None:
+           return
+       try:
+           on_exit()
+       except Exception as e:
+           self.logger.error(f'Server {self.name} exit cleanup failed: {e}')
+
+   def write(self, process, commands):
+       while True:
+           command = commands.get()
+           if command is None:
+               break
+           try:
+               process.stdin.write(f'{command}\n'.encode())
+               process.stdin.flush()
+           except (BrokenPipeError, OSError, ValueError) as e:
+               self.logger.error(f'Server {self.name} could not receive command {command}: {e}')
+               break
+
+   def command(self, command):
+       if not self.is_running():
+           self.logger.error(f'Server {self.name} is not running. Cannot run command.')
+           return False
+       if command.strip().lstrip('/') == 'stop':
+           self.stopping = True
+       self.stdin.put(command)
+       return True
+
+   def wait_for(self, pattern, send=None, timeout=30, quiet=False):
+       # Register before sending so a fast reply cannot slip past
+       waiter = LineWaiter(pattern)
+       self.add_consumer(waiter)
+       try:
+           if send is not None and not (self.probe(send, pattern, timeout=timeout) if quiet else self.command(send)):
+               return None
+           waiter.event.wait(timeout)
+           return waiter.line
+       finally:
+           self.remove_consumer(waiter)
+
+   def terminate(self, process, timeout=KILL_TIMEOUT):
+       process.terminate()
+       try:
+           process.wait(timeout)
+       except subprocess.TimeoutExpired:
+           self.logger.critical(f'Server {self.name} ignored SIGTERM, killing')
+           process.kill()
+           process.wait()
+
+   def stop(self, timeout=STOP_TIMEOUT, kill_timeout=KILL_TIMEOUT):
+       with self.lock:
+           if not self.is_running():
+               self.logger.info(f'Server {self.name} not running')
+               return False
+
+           self.logger.warning(f'Server {self.name} stopping')
+           process = self.process
+           started = time.monotonic()
+           self.stopping = True
+           self.stdin.put('stop')
+
+           # Ask nicely, then SIGTERM, then SIGKILL, each step with its own deadline
+           try:
+               process.wait(timeout)
+           except subprocess.TimeoutExpired:
+               self.logger.error(f'Server {self.name} did not stop within {timeout}s, terminating')
+               self.terminate(process, kill_timeout)
+
+           if self.reader is not None:
+               self.reader.join(kill_timeout)
+           self.logger.info(f'Server {self.name} stopped in {time.monotonic() - started:.1f}s')
+           return True
+
+   def kill(self, kill_timeout=KILL_TIMEOUT):
+       # Used on hung servers, they would not act on a stop command anyway
+       with self.lock:
+           if not self.is_running():
+               return False
+           self.logger.critical(f'Server {self.name} is unresponsive, terminating')
+           self.terminate(self.process, kill_timeout)
+           if self.reader is not None:
+               self.reader.join(kill_timeout)
+           return True
+
+class ServerSupervisor:
+   def __init__(self, root=None):
+       self.root = root
+       self.instances = {}
+       self.lock = threading.Lock()
+
+   def get(self, name):
+       with self.lock:
+           instance = self.instances.get(name)
+           if instance is None:
+               instance = ServerInstance(name, os.path.join(self.root or os.getcwd(), name))
+               self.instances[name] = instance
+           return instance
+
+   def start(self, name, args, preexec=None, on_exit=None):
+       return self.get(name).start(args, preexec, on_exit)
+
+   def stop(self, name, timeout=STOP_TIMEOUT):
+       return self.get(name).stop(timeout)
+
+   def stop_all(self, timeout=STOP_TIMEOUT):
+       # Every server gets its own stopping thread, so shutting down the fleet takes as long as the slowest server
+       threads = [threading.Thread(target=self.stop, args=(name, timeout), name=f'{name}-stop') for name in self.running()]
+       for thread in threads:
+           thread.start()
+       for thread in threads:
+           thread.join()
+
+   def restart(self, name, args, preexec=None):
+       instance = self.get(name)
+       instance.stop()
+       return instance.start(args, preexec)
+
+   def command(self, name, command):
+       return self.get(name).command(command)
+
+   def state(self, name):
+       return self.get(name).state()
+
+   def states(self):
+       with self.lock:
+           instances = list(self.instances.values())
+       return {instance.name: instance.state() for instance in instances}
+
+   def running(self):
+       with self.lock:
+           instances = list(self.instances.values())
+       return [instance.name for instance in instances if instance.is_running()]
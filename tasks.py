@@ -0,0 +1,108 @@
+import collections
+import logging
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+class TaskCancelled(Exception):
+   pass
+
+class Task(QObject):
+   progressed = Signal(int, str)
+   succeeded = Signal(object)
+   failed = Signal(str)
+   done = Signal()
+
+   def __init__(self, server, name, function, args, kwargs):
+       QObject.__init__(self)
+       self.server = server
+       self.name = name
+       self.function = function
+       self.args = args
+       self.kwargs = kwargs
+       self.cancelled = threading.Event()
+
+   def cancel(self):
+       self.cancelled.set()
+
+   def check(self):
+       if self.cancelled.is_set():
+           raise TaskCancelled(f'{self.name} cancelled')
+
+   def progress(self, percent, message=''):
+       self.check()
+       self.progressed.emit(percent, message)
+
+   def run(self):
+       try:
+           self.check()
+           result = self.function(*self.args, **self.kwargs)
+           self.progressed.emit(100, f'{self.name} finished')
+           self.succeeded.emit(result)
+       except TaskCancelled as e:
+           logging.warning(f'{self.server}: {e}')
+           self.failed.emit(str(e))
+       except Exception as e:
+           logging.exception(f'{self.server}: {self.name} failed')
+           self.failed.emit(str(e))
+       finally:
+           self.done.emit()
+
+class TaskRunnable(QRunnable):
+   def __init__(self, executor, task):
+       QRunnable.__init__(self)
+       self.executor = executor
+       self.task = task
+
+   def run(self):
+       try:
+           self.task.run()
+       finally:
+           self.executor.next(self.task.server)
+
+class TaskExecutor(QObject):
+   def __init__(self, pool=None, threads=8):
+       QObject.__init__(self)
+       self.pool = pool or QThreadPool.globalInstance()
+       self.pool.setMaxThreadCount(max(self.pool.maxThreadCount(), threads))
+       self.lock = threading.Lock()
+       self.queues = collections.defaultdict(collections.deque)
+       self.running = {}
+
+   def submit(self, server, name, function, *args, progress=False, **kwargs):
+       # Tasks for one server run in order, different servers run side by side
+       task = Task(server, name, function, args, kwargs)
+       if progress:
+           task.kwargs['task'] = task
+       with self.lock:
+           self.queues[server].append(task)
+           idle = server not in self.running
+       if idle:
+           self.next(server)
+       return task
+
+   def next(self, server):
+       with self.lock:
+           self.running.pop(server, None)
+           if not self.queues[server]:
+               return
+           task = self.queues[server].popleft()
+           self.running[server] = task
+       self.pool.start(TaskRunnable(self, task))
+
+   def busy(self, server):
+       with self.lock:
+           return server in self.running or bool(self.queues[server])
+
+   def cancel(self, server):
+       with self.lock:
+           tasks = list(self.queues[server])
+           self.queues[server].clear()
+           running = self.running.get(server)
+       for task in tasks:
+           task.cancel()
+           task.failed.emit(f'{task.name} cancelled')
+           task.done.emit()
+       if running is not None:
+           running.cancel()
+       return running is not None or bool(tasks)
@@ -0,0 +1,153 @@
+import collections
+import os
+import re
+import threading
+import time
+
+CAPACITY = 720
+INTERVAL = 5
+POLL = 30
+GC_LOG = os.path.join('logs', 'gc.log')
+
+TPS = re.compile(r'TPS from last 1m, 5m, 15m: \*?([\d.]+)')
+MSPT_HEADER = re.compile(r'Server tick times')
+MSPT = re.compile(r'([\d.]+)/([\d.]+)/([\d.]+)')
+PLAYERS = re.compile(r'There are (\d+) of a max of (\d+) players online')
+GC_PAUSE = re.compile(r'Pause .*?(?:(\d+)M->(\d+)M\((\d+)M\) )?([\d.]+)ms$')
+
+class RingSeries:
+   def __init__(self, capacity=CAPACITY):
+       self.points = collections.deque(maxlen=capacity)
+
+   def append(self, value, timestamp=None):
+       self.points.append((timestamp or time.time(), value))
+
+   def values(self):
+       return [value for _, value in self.points]
+
+   def last(self):
+       if not self.points:
+           return None
+       return self.points[-1][1]
+
+   def since(self, timestamp):
+       return [(when, value) for when, value in self.points if when >= timestamp]
+
+class Telemetry:
+   def __init__(self, instance, capacity=CAPACITY):
+       self.instance = instance
+       self.series = {name: RingSeries(capacity) for name in ('cpu', 'rss', 'tps', 'mspt', 'gc_pause', 'heap', 'players')}
+       self.cpu_seconds = 0.0
+       self.previous = None
+       self.gc_offset = 0
+       self.expect_mspt = False
+       instance.add_consumer(self.parse)
+
+   def parse(self, lines):
+       for line in lines:
+           if self.expect_mspt:
+               match = MSPT.search(line)
+               if match:
+                   self.expect_mspt = False
+                   self.series['mspt'].append(float(match.group(1)))
+                   continue
+           match = TPS.search(line)
+           if match:
+               self.series['tps'].append(float(match.group(1)))
+               continue
+           if MSPT_HEADER.search(line):
+               self.expect_mspt = True
+               continue
+           match = PLAYERS.search(line)
+           if match:
+               self.series['players'].append(int(match.group(1)))
+
+   def sample_process(self):
+       pid = self.instance.pid
+       if pid is None or not self.instance.is_running():
+           self.previous = None
+           return
+       try:
+           with open(f'/proc/{pid}/stat', 'r') as file:
+               # The command name may contain spaces, the fields we want follow the closing parenthesis
+               fields = file.read().rsplit(')', 1)[1].split()
+           with open(f'/proc/{pid}/statm', 'r') as file:
+               resident = int(file.read().split()[1])
+       except (FileNotFoundError, ProcessLookupError, IndexError, ValueError):
+           return
+
+       ticks = os.sysconf('SC_CLK_TCK')
+       cpu = (int(fields[11]) + int(fields[12])) / ticks
+       now = time.monotonic()
+       if self.previous is not None and now > self.previous[0]:
+           self.series['cpu'].append(100 * (cpu - self.previous[1]) / (now - self.previous[0]))
+       self.previous = (now, cpu)
+       self.cpu_seconds = cpu
+       self.series['rss'].append(resident * os.sysconf('SC_PAGE_SIZE') / 1048576)
+
+   def sample_gc(self):
+       path = os.path.join(self.instance.directory, GC_LOG)
+       try:
+           size = os.path.getsize(path)
+       except FileNotFoundError:
+           return
+       if size < self.gc_offset:
+           # The JVM rotated the log
+           self.gc_offset = 0
+       with open(path, 'r', errors='replace') as file:
+           file.seek(self.gc_offset)
+           lines = file.readlines()
+           self.gc_offset = file.tell()
+       for line in lines:
+           match = GC_PAUSE.search(line.strip())
+           if match:
+               self.series['gc_pause'].append(float(match.group(4)))
+               if match.group(2):
+                   self.series['heap'].append(int(match.group(2)))
+
+   def poll(self):
+       self.instance.probe('tps', TPS.pattern)
+       self.instance.probe('mspt', MSPT_HEADER.pattern, lines=2)
+       self.instance.probe('list', PLAYERS.pattern)
+
+   def snapshot(self):
+       return {name: series.last() for name, series in self.series.items()} | {'cpu_seconds': self.cpu_seconds}
+
+class TelemetryMonitor:
+   def __init__(self, supervisor, interval=INTERVAL, poll=POLL, capacity=CAPACITY):
+       self.supervisor = supervisor
+       self.interval = interval
+       self.poll_interval = poll
+       self.capacity = capacity
+       self.telemetry = {}
+       self.lock = threading.Lock()
+       self.stopped = threading.Event()
+       self.thread = None
+
+   def get(self, name):
+       with self.lock:
+           telemetry = self.telemetry.get(name)
+           if telemetry is None:
+               telemetry = self.telemetry[name] = Telemetry(self.supervisor.get(name), self.capacity)
+           return telemetry
+
+   def start(self):
+       if self.thread is None:
+           self.thread = threading.Thread(target=self.run, name='telemetry', daemon=True)
+           self.thread.start()
+
+   def stop(self):
+       self.stopped.set()
+
+   def run(self):
+       last_poll = 0.0
+       while not self.stopped.wait(self.interval):
+           polling = time.monotonic() - last_poll >= self.poll_interval
+           if polling:
+               last_poll = time.monotonic()
+           for name in self.supervisor.running():
+               telemetry = self.get(name)
+               telemetry.sample_process()
+               telemetry.sample_gc()
+               if polling and telemetry.instance.uptime > self.interval:
+                   telemetry.poll()
@@ -0,0 +1,57 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class Stub:
+   # Canned responses by path, every request is recorded with its headers
+   def __init__(self, port):
+       self.base = f'http://127.0.0.1:{port}'
+       self.routes = {}
+       self.requests = []
+       self.lock = threading.Lock()
+
+   def url(self, path):
+       return self.base + path
+
+   def hits(self, path):
+       with self.lock:
+           return sum(1 for seen, _ in self.requests if seen == path)
+
+class StubHandler(BaseHTTPRequestHandler):
+   def do_GET(self):
+       stub = self.server.stub
+       with stub.lock:
+           stub.requests.append((self.path, dict(self.headers)))
+       route = stub.routes.get(self.path)
+       if route is None:
+           self.send_error(404)
+           return
+       status, headers, body, delay = route(self.headers) if callable(route) else route
+       time.sleep(delay)
+       self.send_response(status)
+       for name, value in headers.items():
+           self.send_header(name, value)
+       self.send_header('Content-Length', str(len(body)))
+       self.end_headers()
+       self.wfile.write(body)
+
+   def log_message(self, format, *args):
+       pass
+
+@pytest.fixture
+def http():
+   server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+   server.daemon_threads = True
+   server.stub = Stub(server.server_address[1])
+   thread = threading.Thread(target=server.serve_forever, daemon=True)
+   thread.start()
+   yield server.stub
+   server.shutdown()
+   server.server_close()
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import stat
+import threading
+
+import pytest
+
+from cache import ArtifactCache
+from downloads import Downloader
+
+JAR = b'PK\x03\x04' + os.urandom(64 * 1024)
+SHA256 = hashlib.sha256(JAR).hexdigest()
+
+@pytest.fixture
+def cache(tmp_path):
+   return ArtifactCache(tmp_path / 'cache', downloader=Downloader(workers=4))
+
+def test_concurrent_fetches_download_once(cache, tmp_path, http):
+   http.routes['/paper.jar'] = (200, {}, JAR, 0.3)
+   dests = [tmp_path / f'server{n}' / 'server.jar' for n in range(4)]
+   threads = [threading.Thread(target=cache.fetch, args=(http.url('/paper.jar'), str(dest), {'sha256': SHA256})) for dest in dests]
+   for thread in threads:
+       thread.start()
+   for thread in threads:
+       thread.join()
+
+   assert http.hits('/paper.jar') == 1
+   assert all(dest.read_bytes() == JAR for dest in dests)
+
+def test_cached_object_is_reused(cache, tmp_path, http):
+   http.routes['/paper.jar'] = (200, {}, JAR, 0.0)
+   cache.fetch(http.url('/paper.jar'), str(tmp_path / 'a' / 'server.jar'), {'sha256': SHA256})
+   cache.fetch(http.url('/paper.jar'), str(tmp_path / 'b' / 'server.jar'), {'sha256': SHA256})
+
+   assert http.hits('/paper.jar') == 1
+   assert (tmp_path / 'b' / 'server.jar').read_bytes() == JAR
+
+def test_hash_mismatch_keeps_nothing(cache, tmp_path, http):
+   http.routes['/paper.jar'] = (200, {}, JAR, 0.0)
+   dest = tmp_path / 'server' / 'server.jar'
+
+   with pytest.raises(ValueError, match='sha256 mismatch'):
+       cache.fetch(http.url('/paper.jar'), str(dest), {'sha256': '0' * 64})
+
+   assert not dest.exists()
+   assert not os.listdir(tmp_path / 'cache' / 'staging')
+   assert not (tmp_path / 'cache' / 'objects').exists()
+
+def test_modified_object_is_downloaded_again(cache, tmp_path, http):
+   http.routes['/paper.jar'] = (200, {}, JAR, 0.0)
+   cache.fetch(http.url('/paper.jar'), str(tmp_path / 'a' / 'server.jar'), {'sha256': SHA256})
+
+   target = cache.path(SHA256)
+   os.chmod(target, stat.S_IRUSR | stat.S_IWUSR)
+   with open(target, 'r+b') as file:
+       file.write(b'XX')
+
+   cache.fetch(http.url('/paper.jar'), str(tmp_path / 'b' / 'server.jar'), {'sha256': SHA256})
+   assert http.hits('/paper.jar') == 2
+   assert (tmp_path / 'b' / 'server.jar').read_bytes() == JAR
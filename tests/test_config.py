@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+import config
+
+def test_old_string_values_are_coerced():
+   data = config.validate({'minimum': '1024', 'maximum': ' 4096 ', 'playit': 'True', 'bedrock': 0, 'version': 1.21})
+   assert data['minimum'] == 1024
+   assert data['maximum'] == 4096
+   assert data['playit'] is True
+   assert data['bedrock'] is False
+   assert data['version'] == '1.21'
+
+def test_missing_keys_get_fresh_defaults():
+   first = config.validate({})
+   second = config.validate({})
+   first['limits']['cpus'] = 2
+   assert second['limits'] == {}
+   assert first['auto_restart'] is True
+
+def test_limits_are_numbers():
+   data = config.validate({'limits': {'cpus': '1.5', 'memory': 2048, 'cores': '2', 'nice': -5}})
+   assert data['limits'] == {'cpus': 1.5, 'memory': 2048, 'cores': 2, 'nice': -5}
+
+@pytest.mark.parametrize('data', [
+   {'minimum': 'lots'},
+   {'maximum': 0},
+   {'playit': 'sometimes'},
+   {'limits': {'cpus': -1}},
+   {'limits': {'memory': True}},
+   {'limits': {'cores': [0, 'one']}},
+   {'schedule': {'backup': '0 25 * * *'}},
+   {'schedule': {'warnings': [60, 0]}},
+])
+def test_invalid_values_raise(data):
+   with pytest.raises(config.ConfigError):
+       config.validate(data)
+
+def test_read_validates_the_file(tmp_path):
+   path = tmp_path / config.FILENAME
+   path.write_text(json.dumps({'minimum': '512'}))
+   assert config.read(path)['minimum'] == 512
+
+   path.write_text(json.dumps({'minimum': 'x'}))
+   with pytest.raises(config.ConfigError):
+       config.read(path)
@@ -0,0 +1,35 @@
+import datetime
+
+import pytest
+
+import cron
+
+def at(*args):
+   return datetime.datetime(*args).timestamp()
+
+def test_next_is_strictly_after():
+   expression = cron.parse('30 4 * * *')
+   assert expression.next(at(2024, 5, 1, 4, 29)) == at(2024, 5, 1, 4, 30)
+   assert expression.next(at(2024, 5, 1, 4, 30)) == at(2024, 5, 2, 4, 30)
+
+def test_steps_ranges_and_lists():
+   expression = cron.parse('*/15 9-17 * * 1,3,5')
+   assert expression.minutes == {0, 15, 30, 45}
+   assert expression.hours == set(range(9, 18))
+   assert expression.weekdays == {1, 3, 5}
+
+def test_names_aliases_and_sunday_as_seven():
+   assert cron.parse('0 0 * jan sun').months == {1}
+   assert cron.parse('0 0 * * 7').weekdays == {0}
+   assert cron.parse('@daily').next(at(2024, 5, 1, 12, 0)) == at(2024, 5, 2, 0, 0)
+
+def test_restricted_day_and_weekday_match_either():
+   # 1 May 2024 is a Wednesday, the 13th of May a Monday
+   expression = cron.parse('0 0 13 * 1')
+   assert expression.next(at(2024, 5, 1)) == at(2024, 5, 6)
+   assert expression.next(at(2024, 5, 12, 12)) == at(2024, 5, 13)
+
+@pytest.mark.parametrize('expression', ['* * *', '60 * * * *', '0 0 * * mon-xyz', '*/0 * * * *', '0 0 31 2 *'])
+def test_invalid_expressions_raise(expression):
+   with pytest.raises(ValueError):
+       cron.parse(expression).next(at(2024, 5, 1))
@@ -0,0 +1,35 @@
+import logging
+
+from logstore import LogStore
+
+def test_levels_lists_each_line_once(tmp_path):
+   store = LogStore(tmp_path)
+   store.append(1.0, '[12:00:00 INFO]: Starting\n[12:00:00 INFO]: Loading', logging.INFO)
+   store.append(2.0, '[12:00:01 WARN]: Can\'t keep up\n[12:00:01 WARN]: Running behind', logging.WARNING)
+   store.append(3.0, '[12:00:02 ERROR]: Crashed', logging.ERROR)
+   store.close()
+
+   assert store.levels() == [
+       (2.0, '[12:00:01 WARN]: Can\'t keep up'),
+       (2.0, '[12:00:01 WARN]: Running behind'),
+       (3.0, '[12:00:02 ERROR]: Crashed'),
+   ]
+   assert store.levels(logging.ERROR) == [(3.0, '[12:00:02 ERROR]: Crashed')]
+
+def test_levels_picks_up_lines_inside_an_info_record(tmp_path):
+   store = LogStore(tmp_path)
+   store.append(1.0, '[12:00:00 INFO]: Done\n[12:00:00 ERROR]: Plugin failed\n[12:00:00 INFO]: Ready', logging.INFO)
+   store.close()
+
+   assert store.levels() == [(1.0, '[12:00:00 ERROR]: Plugin failed')]
+
+def test_search_and_between_span_rolled_segments(tmp_path):
+   store = LogStore(tmp_path, max_bytes=64, backups=1)
+   for second in range(6):
+       store.append(float(second), f'[12:00:0{second} INFO]: line {second} ' + 'x' * 20)
+   store.close()
+
+   assert len(store.segments()) == 2
+   assert [time for time, _ in store.search('line')] == [2.0, 3.0, 4.0, 5.0]
+   assert [line.split()[3] for line in store.between(3.0, 4.0)] == ['3', '4']
+   assert store.tail(2)[-1].startswith('[12:00:05 INFO]: line 5')
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+
+import cron
+from config import ConfigError
+from maintenance import Scheduler
+
+DAY = 24 * 60 * 60
+
+class Instance:
+   def __init__(self, name):
+       self.logger = logging.getLogger(f'test.{name}')
+       self.running = False
+
+   def is_running(self):
+       return self.running
+
+   def command(self, command):
+       return True
+
+   def add_consumer(self, consumer):
+       pass
+
+   def remove_consumer(self, consumer):
+       pass
+
+class Supervisor:
+   def __init__(self):
+       self.instances = {}
+
+   def get(self, name):
+       return self.instances.setdefault(name, Instance(name))
+
+class Config:
+   def __init__(self, data):
+       self.data = data
+
+   def snapshot(self):
+       if isinstance(self.data, Exception):
+           raise self.data
+       return self.data
+
+class Configs:
+   def __init__(self, data):
+       self.data = data
+
+   def get(self, server):
+       return Config(self.data[server])
+
+def scheduler(configs, actions=None, stagger=120):
+   clock = [0.0]
+   actions = {'start': None, 'restart': None, 'backup': lambda server: True, 'available': lambda server: None, 'update': lambda server: True, **(actions or {})}
+   return Scheduler(Supervisor(), Configs(configs), lambda: sorted(configs), actions, clock=lambda: clock[0], sleep=lambda seconds: False, stagger=stagger)
+
+def settle(scheduler, timeout=5):
+   deadline = time.monotonic() + timeout
+   while any(entry.running for entry in scheduler.entries.values()) and time.monotonic() < deadline:
+       time.sleep(0.01)
+
+def nightly():
+   # Half a minute before the next 03:00 local time
+   return cron.parse('0 3 * * *').next(time.time()) - 30
+
+def test_jobs_due_together_are_staggered():
+   before = nightly()
+   runner = scheduler({server: {'schedule': {'backup': '0 3 * * *'}} for server in ('a', 'b')})
+   assert runner.tick(before) == []
+
+   due = before + 30
+   assert [entry.server for entry in runner.tick(due)] == ['a']
+   settle(runner)
+   assert runner.tick(due + 60) == []
+   assert [entry.server for entry in runner.tick(due + 120)] == ['b']
+   settle(runner)
+
+def test_missed_runs_are_skipped():
+   before = nightly()
+   runner = scheduler({'a': {'schedule': {'backup': '0 3 * * *'}}})
+   runner.tick(before)
+
+   # Three nights later, as if the daemon had been down, only one run happens
+   later = before + 3 * DAY + 60
+   assert len(runner.tick(later)) == 1
+   settle(runner)
+   assert runner.entries[('a', 'backup')].due > later
+   assert runner.tick(later + 60) == []
+
+def test_heavy_jobs_never_overlap():
+   active = []
+   overlap = []
+   lock = threading.Lock()
+
+   def backup(server):
+       with lock:
+           active.append(server)
+           overlap.append(len(active))
+       time.sleep(0.2)
+       with lock:
+           active.remove(server)
+       return True
+
+   runner = scheduler({'a': {}, 'b': {}}, {'backup': backup}, stagger=0)
+   runner.trigger('a', 'backup')
+   runner.trigger('b', 'backup')
+   assert len(runner.tick(0.0)) == 2
+   settle(runner)
+
+   assert overlap == [1, 1]
+
+def test_unreadable_config_only_skips_that_server(caplog):
+   before = nightly()
+   runner = scheduler({'a': ConfigError('minimum must be int'), 'b': {'schedule': {'backup': '0 3 * * *'}}})
+   with caplog.at_level(logging.ERROR):
+       runner.tick(before)
+       ready = runner.tick(before + 30)
+       settle(runner)
+
+   assert [entry.server for entry in ready] == ['b']
+   assert [record.name for record in caplog.records] == ['test.a']
+
+def test_update_that_did_nothing_is_not_reported_as_done():
+   runner = scheduler({'a': {'schedule': {'apply_updates': True}}}, {'available': lambda server: '1.21', 'update': lambda server: False})
+   assert runner.run_update('a') == 'not updated to 1.21, see the server log'
@@ -0,0 +1,55 @@
+import json
+import threading
+
+import requests
+
+from metadata import MetadataClient
+
+VERSIONS = {'versions': ['1.20.6', '1.21']}
+
+def versions(etag='"v1"', delay=0.0):
+   def route(headers):
+       if headers.get('If-None-Match') == etag:
+           return 304, {'ETag': etag}, b'', delay
+       return 200, {'ETag': etag, 'Content-Type': 'application/json'}, json.dumps(VERSIONS).encode(), delay
+   return route
+
+def test_concurrent_lookups_share_one_request(tmp_path, http):
+   http.routes['/versions'] = versions(delay=0.3)
+   client = MetadataClient(tmp_path, session=requests.Session())
+   results = []
+   threads = [threading.Thread(target=lambda: results.append(client.get(http.url('/versions')))) for _ in range(8)]
+   for thread in threads:
+       thread.start()
+   for thread in threads:
+       thread.join()
+
+   assert results == [VERSIONS] * 8
+   assert http.hits('/versions') == 1
+
+def test_fresh_entry_is_served_without_a_request(tmp_path, http):
+   http.routes['/versions'] = versions()
+   client = MetadataClient(tmp_path, session=requests.Session())
+   client.get(http.url('/versions'))
+
+   assert client.get(http.url('/versions')) == VERSIONS
+   assert http.hits('/versions') == 1
+
+def test_stale_entry_is_revalidated_with_its_etag(tmp_path, http):
+   http.routes['/versions'] = versions()
+   client = MetadataClient(tmp_path, session=requests.Session())
+   client.get(http.url('/versions'))
+
+   # A new client reads the entry back from disk, the 304 keeps its body
+   reloaded = MetadataClient(tmp_path, session=requests.Session())
+   assert reloaded.get(http.url('/versions'), ttl=0) == VERSIONS
+   assert http.hits('/versions') == 2
+   assert http.requests[-1][1].get('If-None-Match') == '"v1"'
+
+def test_failed_refresh_falls_back_to_the_cached_body(tmp_path, http):
+   http.routes['/versions'] = versions()
+   client = MetadataClient(tmp_path, session=requests.Session())
+   client.get(http.url('/versions'))
+
+   http.routes['/versions'] = (500, {}, b'', 0.0)
+   assert client.get(http.url('/versions'), ttl=0) == VERSIONS
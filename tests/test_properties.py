@@ -0,0 +1,51 @@
+import pytest
+
+import properties
+
+TEXT = '''#Minecraft server properties
+#Fri May 03 12:00:00 UTC 2024
+motd=A Minecraft Server
+server-port = 25565
+level-name\\:x=world
+empty=
+'''
+
+def test_round_trip_keeps_comments_and_order():
+   parsed = properties.Properties(TEXT)
+   assert parsed.dump() == TEXT
+   assert parsed.get('server-port') == '25565'
+   assert parsed.get('level-name:x') == 'world'
+   assert parsed.get('empty') == ''
+
+def test_set_rewrites_only_that_line():
+   parsed = properties.Properties(TEXT)
+   parsed.set('motd', 'Héllo = world')
+   parsed.set('pvp', 'false')
+   lines = parsed.dump().splitlines()
+   assert lines[2] == 'motd=H\\u00e9llo \\= world'
+   assert lines[3] == 'server-port = 25565'
+   assert lines[-1] == 'pvp=false'
+   assert properties.Properties(parsed.dump()).get('motd') == 'Héllo = world'
+
+@pytest.mark.parametrize('key, value, expected', [
+   ('pvp', 'TRUE', 'true'),
+   ('view-distance', ' 12 ', '12'),
+   ('difficulty', 'Hard', 'hard'),
+   ('motd', 'anything', 'anything'),
+])
+def test_validate_normalises(key, value, expected):
+   assert properties.validate(key, value) == expected
+
+@pytest.mark.parametrize('key, value', [('pvp', 'maybe'), ('view-distance', '64'), ('server-port', 'abc'), ('gamemode', 'god')])
+def test_validate_rejects(key, value):
+   with pytest.raises(ValueError):
+       properties.validate(key, value)
+
+def test_update_reports_every_error_and_writes_nothing(tmp_path):
+   (tmp_path / properties.FILENAME).write_text(TEXT, encoding='latin-1')
+   with pytest.raises(ValueError, match='pvp.*view-distance'):
+       properties.update(tmp_path, {'pvp': 'maybe', 'view-distance': '64', 'motd': 'new'})
+   assert (tmp_path / properties.FILENAME).read_text(encoding='latin-1') == TEXT
+
+   assert properties.update(tmp_path, {'motd': 'new', 'server-port': '25565'}) == {'motd': 'new'}
+   assert properties.load(tmp_path).get('motd') == 'new'
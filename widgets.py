@@ -0,0 +1,76 @@
+from PySide6.QtWidgets import QWidget, QLabel, QGridLayout, QSizePolicy
+from PySide6.QtCore import Qt, QPointF, QTimer
+from PySide6.QtGui import QPainter, QPen, QPolygonF, QColor
+
+METRICS = [
+   ('tps', 'TPS', '{:.1f}'),
+   ('mspt', 'MSPT', '{:.1f} ms'),
+   ('cpu', 'CPU', '{:.0f} %'),
+   ('rss', 'Memory (RSS)', '{:.0f} MB'),
+   ('heap', 'Heap after GC', '{:.0f} MB'),
+   ('gc_pause', 'GC pause', '{:.1f} ms'),
+   ('players', 'Players', '{:.0f}'),
+]
+
+class Sparkline(QWidget):
+   def __init__(self, series, parent=None):
+       super().__init__(parent)
+       self.series = series
+       self.setMinimumHeight(28)
+       self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+
+   def paintEvent(self, event):
+       values = self.series.values()
+       if len(values) < 2:
+           return
+
+       # Only the newest point per horizontal pixel is drawn, long series cost the same as short ones
+       width = max(self.width() - 2, 1)
+       height = max(self.height() - 4, 1)
+       values = values[-width:]
+       low = min(values)
+       high = max(values)
+       span = (high - low) or 1.0
+       step = width / max(len(values) - 1, 1)
+
+       line = QPolygonF([QPointF(1 + i * step, 2 + height - (value - low) / span * height) for i, value in enumerate(values)])
+       painter = QPainter(self)
+       painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+       painter.setPen(QPen(QColor(60, 140, 220), 1.5))
+       painter.drawPolyline(line)
+       painter.end()
+
+class MetricsPanel(QWidget):
+   def __init__(self, telemetry, interval=1000, parent=None):
+       super().__init__(parent)
+       self.telemetry = telemetry
+       self.values = {}
+       self.lines = []
+
+       layout = QGridLayout()
+       for row, (key, title, _) in enumerate(METRICS):
+           value = QLabel('-')
+           value.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+           line = Sparkline(telemetry.series[key])
+           layout.addWidget(QLabel(title), row, 0)
+           layout.addWidget(value, row, 1)
+           layout.addWidget(line, row, 2)
+           self.values[key] = value
+           self.lines.append(line)
+       layout.setColumnStretch(2, 1)
+       layout.setRowStretch(len(METRICS), 1)
+       self.setLayout(layout)
+
+       self.timer = QTimer(self)
+       self.timer.setInterval(interval)
+       self.timer.timeout.connect(self.refresh)
+       self.timer.start()
+
+   def refresh(self):
+       if not self.isVisible():
+           return
+       for key, _, text in METRICS:
+           last = self.telemetry.series[key].last()
+           self.values[key].setText('-' if last is None else text.format(last))
+       for line in self.lines:
+           line.update()